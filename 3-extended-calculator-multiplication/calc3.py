@@ -9,6 +9,9 @@ This version can handle expressions like:
 # Types of tokens
 INTEGER, SIGN, EOF = 'INTEGER', 'SIGN', 'EOF'
 
+import argparse
+import sys
+
 """
 class representing a token. In the calculator case, the tokens can
 only be numbers, the operation signs ('+', '-','*','/') or 'EOF'
@@ -210,7 +213,6 @@ class Interpreter(object):
         # op_type is '+' or '*', denoting an algebraic sum or multiplication
         # (i.e. + or -, OR * or /)
         result, op_type = self.parse_ISI()
-        print(result, op_type)
         term = Token(INTEGER, result)
         # if the first operation was an algebric sum, go on looking
         # for algebric sums. Otherwise, go on looking for algebraic
@@ -312,8 +314,103 @@ class Interpreter(object):
         return result
 # END INTERPRETER CLASS
 
+# size of the blocks read from stdin in pipe mode
+BLOCK_SIZE = 1 << 16
+# number of results buffered before writing them out in pipe mode
+WRITE_BATCH = 1024
+
+# reads the lines of a binary stream (as bytes, without the newlines),
+# in blocks of block_size bytes
+def read_lines(stream, block_size=BLOCK_SIZE):
+    # pieces of the current line, read in the previous blocks
+    pending = []
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = block.split(b'\n')
+        if len(lines) == 1:
+            pending.append(block)
+            continue
+        pending.append(lines[0])
+        yield b''.join(pending)
+        for line in lines[1:-1]:
+            yield line
+        pending = [lines[-1]]
+    last = b''.join(pending)
+    if last:
+        yield last
+
+# parses and interprets one expression
+def evaluate(text):
+    return Interpreter(text).expr()
+
+# non-interactive mode, used when stdin is not a terminal (e.g.
+# 'cat exprs.txt | python3 calc3.py'): no prompts, stdin is read in large
+# blocks, and the results are written out in batches.
+# Each result is written with args.format. args.on_error decides what
+# to do with an invalid expression: 'abort' (stop with the error),
+# 'skip' (write nothing) or 'report' (write args.error_format)
+def run_pipe(args, stdin, stdout):
+    pending = []
+    for number, line in enumerate(read_lines(stdin), 1):
+        # empty lines are ignored, like in the interactive mode
+        if not line:
+            continue
+        try:
+            # (a line that is not UTF-8 is an invalid expression too)
+            text = line.decode()
+            result = evaluate(text)
+        except Exception as error:
+            if args.on_error == 'abort':
+                stdout.write(''.join(pending))
+                stdout.flush()
+                sys.stderr.write('line {}: {}\n'.format(number, error))
+                return 1
+            if args.on_error == 'report':
+                # one output line per input line: only the first line
+                # of the error message is kept
+                message = str(error).split('\n')[0]
+                pending.append(args.error_format.format(
+                    line=number, expr=line.decode(errors='replace'),
+                    error=message) + '\n')
+            continue
+        pending.append(args.format.format(
+            line=number, expr=text, result=str(result)) + '\n')
+        if len(pending) >= WRITE_BATCH:
+            stdout.write(''.join(pending))
+            pending = []
+    stdout.write(''.join(pending))
+    stdout.flush()
+    return 0
+
+# options of the non-interactive (pipe) mode
+def add_pipe_arguments(parser):
+    parser.add_argument('--interactive', action='store_true',
+                        help="show the 'calc> ' prompt even if stdin "
+                             "is not a terminal")
+    parser.add_argument('--format', default='{result}',
+                        help="format of each output line, with the fields "
+                             "{line} (line number), {expr} and {result}")
+    parser.add_argument('--on-error', choices=['abort', 'skip', 'report'],
+                        default='abort',
+                        help="what to do with invalid expressions in pipe "
+                             "mode (default: abort)")
+    parser.add_argument('--error-format', default='error: {error}',
+                        help="output line for invalid expressions, with "
+                             "--on-error=report (fields {line}, {expr}, {error})")
+
+# command line options of the 'calc> ' interpreter
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="calculator for chains of sums or multiplications")
+    add_pipe_arguments(parser)
+    return parser.parse_args(argv)
+
 # main loop function
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+    if not args.interactive and not sys.stdin.isatty():
+        return run_pipe(args, sys.stdin.buffer, sys.stdout)
     while True:
         try:
             # waits for an input text from the client
@@ -339,4 +436,4 @@ if __name__ == '__main__':
     just a module containing the class definition for the
     calculator Interpreter
     """
-    main()
+    sys.exit(main())
@@ -52,7 +52,7 @@ class Lexer:
     def lexing_error(self):
         raise Exception(f"Error lexing input. Position {self.pos}.\n"
                         f"Character {self.current_char} in context:\n"
-                        f"{self.text[min(self.pos-10,0):max(self.pos+10,self.last_idx)]}")
+                        f"{self.text[max(self.pos-10,0):min(self.pos+10,self.last_idx+1)]}")
 
     def advance(self):
         self.pos += 1
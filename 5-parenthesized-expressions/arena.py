@@ -0,0 +1,198 @@
+"""
+AST of the calc5 grammar stored as a struct of arrays.
+
+tree.py allocates one Python object per node, plus an int or float
+object per number: 60 to 100 bytes per node. An Arena stores
+the same tree in parallel typed arrays, indexed by node number:
+* kinds:    1 byte, SMALL (an INTEGER that fits in 64 bits, stored in
+            literals), POOLED (a number stored in the literal pool),
+            VAR (a placeholder, its name is in the pool) or BINOP
+* ops:      1 byte, the operator code of the BINOP nodes
+* left, right: 4 bytes each, the node numbers of the operands
+* literals: 8 bytes, the value of the SMALL nodes, or the index in the
+            pool of the POOLED and VAR nodes
+The pool is a list of the big integers, the reals and the names.
+That is 18 bytes per node (plus the pooled objects).
+
+The nodes are appended in postfix order (the operands before the
+operation), so the subtree of a node is a contiguous range of node
+numbers, ending with the node itself: evaluate() walks the arrays
+from left to right with a stack of values, without recursion.
+
+Usage:
+    arena, root = parse('3 * (x + 2)')
+    arena.evaluate(root, {'x': 5})      # 21
+"""
+from array import array
+from itertools import islice
+
+from calc5 import Lexer, INTEGER, REAL, ID, S_SIGN, M_SIGN, int_div
+from tree import Parser, Num, Var, BinOp
+
+# kinds of nodes
+SMALL, POOLED, VAR, BINOP = range(4)
+# operator codes
+OP_CODES = {'+': 0, '-': 1, '*': 2, '/': 3, 'DIV': 4}
+OPERATORS = {code: op for op, code in OP_CODES.items()}
+ADD, SUB, MUL, TRUEDIV, DIV = range(5)
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+class Arena(object):
+    """
+    the nodes of one or more trees, in parallel arrays
+    """
+    def __init__(self):
+        self.kinds = bytearray()
+        self.ops = bytearray()
+        # 'I' items are 4 bytes long on all the common platforms
+        self.left = array('I')
+        self.right = array('I')
+        self.literals = array('q')
+        self.pool = []
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def _append(self, kind, op, left, right, literal):
+        self.kinds.append(kind)
+        self.ops.append(op)
+        self.left.append(left)
+        self.right.append(right)
+        self.literals.append(literal)
+        return len(self.kinds) - 1
+
+    def number(self, value):
+        if type(value) is int and INT64_MIN <= value <= INT64_MAX:
+            return self._append(SMALL, 0, 0, 0, value)
+        self.pool.append(value)
+        return self._append(POOLED, 0, 0, 0, len(self.pool) - 1)
+
+    def var(self, name):
+        self.pool.append(name)
+        return self._append(VAR, 0, 0, 0, len(self.pool) - 1)
+
+    def binop(self, left, op, right):
+        return self._append(BINOP, OP_CODES[op], left, right, 0)
+
+    def nbytes(self):
+        """
+        size of the arrays (without the pooled objects)
+        """
+        return (len(self.kinds) + len(self.ops)
+                + self.left.itemsize * len(self.left)
+                + self.right.itemsize * len(self.right)
+                + self.literals.itemsize * len(self.literals))
+
+    def subtree_start(self, node):
+        """
+        first node number of the subtree of node (its leftmost leaf)
+        """
+        kinds, left = self.kinds, self.left
+        while kinds[node] == BINOP:
+            node = left[node]
+        return node
+
+    def evaluate(self, node=None, params=None):
+        """
+        value of the subtree of node (by default, the last node added),
+        with the placeholders replaced by their values in params
+        """
+        if node is None:
+            node = len(self.kinds) - 1
+        start = self.subtree_start(node)
+        nodes = zip(self.kinds, self.ops, self.literals)
+        if start or node + 1 < len(self.kinds):
+            nodes = islice(nodes, start, node + 1)
+        pool = self.pool
+        stack = []
+        push, pop = stack.append, stack.pop
+        for kind, op, literal in nodes:
+            if kind == SMALL:
+                push(literal)
+            elif kind == BINOP:
+                right = pop()
+                if op == ADD:
+                    stack[-1] += right
+                elif op == SUB:
+                    stack[-1] -= right
+                elif op == MUL:
+                    stack[-1] *= right
+                elif op == TRUEDIV:
+                    stack[-1] /= right
+                else:
+                    stack[-1] = int_div(stack[-1], right)
+            elif kind == POOLED:
+                push(pool[literal])
+            else:
+                name = pool[literal]
+                if params is None or name not in params:
+                    raise TypeError('missing value for: ' + name)
+                push(params[name])
+        return stack[-1]
+
+    def to_tree(self, node=None):
+        """
+        the subtree of node as tree.py objects
+        """
+        if node is None:
+            node = len(self.kinds) - 1
+        nodes = []
+        for i in range(self.subtree_start(node), node + 1):
+            kind = self.kinds[i]
+            if kind == SMALL:
+                nodes.append(Num(self.literals[i]))
+            elif kind == POOLED:
+                nodes.append(Num(self.pool[self.literals[i]]))
+            elif kind == VAR:
+                nodes.append(Var(self.pool[self.literals[i]]))
+            else:
+                right = nodes.pop()
+                nodes[-1] = BinOp(nodes[-1], OPERATORS[self.ops[i]], right)
+        return nodes[-1]
+
+
+class ArenaParser(Parser):
+    """
+    tree.Parser that appends the nodes to an arena: each grammar
+    method returns a node number instead of a node object
+    """
+    def __init__(self, lexer, arena=None):
+        super().__init__(lexer)
+        self.arena = Arena() if arena is None else arena
+
+    def factor(self):
+        token = self.current_token
+        if token.type == ID:
+            self.eat(ID)
+            return self.arena.var(token.value)
+        if token.type == REAL:
+            self.eat(REAL)
+        else:
+            self.eat(INTEGER)
+        return self.arena.number(token.value)
+
+    def m_expr(self):
+        node = self.p_term()
+        while self.current_token.type == M_SIGN:
+            op = self.current_token.value
+            self.eat(M_SIGN)
+            node = self.arena.binop(node, op, self.p_term())
+        return node
+
+    def expr(self):
+        node = self.m_expr()
+        while self.current_token.type == S_SIGN:
+            op = self.current_token.value
+            self.eat(S_SIGN)
+            node = self.arena.binop(node, op, self.m_expr())
+        return node
+
+
+def parse(text, arena=None):
+    """
+    (arena, root node number) of text. The nodes are appended to the
+    given arena, if any
+    """
+    parser = ArenaParser(Lexer(text), arena)
+    return parser.arena, parser.parse()
@@ -0,0 +1,222 @@
+"""
+Batched evaluation of many small expressions, column-wise with NumPy.
+
+Evaluating '(12+7)*3-4' with the calc5 Interpreter costs thousands of
+bytecodes, most of them spent on parsing a structure that the next
+expressions of a batch share. evaluate_batch():
+1. groups the expressions by shape (their text with each literal
+   replaced by a '#' slot, found with one regex split): the expressions
+   of a group have the same postfix tape, and differ only by their
+   literals
+2. parses the first expression of each group into a postfix tape, with
+   the static INTEGER/REAL type of each step (see typecheck.py)
+3. converts the literals of the group into a matrix (one row per
+   expression, one column per slot: int64 for the INTEGERs, float64 for
+   the REALs), and runs the tape once on whole columns
+4. gives the results back in the order of the input
+
+NumPy integers wrap around silently, and the divisions by zero give
+inf or nan: the rows where an INTEGER literal or result does not fit
+in 53 bits (checked after each operation, on a float64 estimate for the
+products), or where a divisor is zero, are flagged, and evaluated again
+with the Interpreter (whose ints have no limit). A REAL operation on
+INTEGERs below 2**53 gives the same double as the Interpreter, as the
+conversions are exact. The groups that cannot be run as a tape
+(invalid expressions, placeholders, DIV on REALs, trailing tokens) and
+the groups of fewer than min_rows expressions are evaluated one by one
+with the Interpreter too, as are the rows whose literals are not of the
+same types (INTEGER or REAL) as the first row's, so the results, and
+the errors, are always the Interpreter's.
+
+NumPy is optional: without it, every expression is evaluated by a
+ShapeCache (see shapes.py), which compiles each shape once.
+
+Usage:
+    results = evaluate_batch(['(12+7)*3-4', '(1+2)*5-6', '2 DIV 0'])
+    # [53, 9, ZeroDivisionError('integer division or modulo by zero')]
+"""
+import re
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from calc5 import Lexer, Interpreter, INTEGER, REAL
+from shapes import ShapeCache
+from tree import parse, Num, BinOp
+
+# the INTEGERs are exact in int64, and convertible to float64, below
+LIMIT = 2 ** 53
+# longest literal that always fits in 53 bits
+SAFE_DIGITS = 15
+SLOT = None
+
+# the split gives the text between the literals, and the literals
+_LITERAL = re.compile(r'(\d+(?:\.\d+)?)')
+
+
+def _interpret(text):
+    """
+    value of text with the Interpreter, or the exception it raised
+    """
+    try:
+        return Interpreter(Lexer(text)).expr()
+    except Exception as error:
+        return error
+
+
+def tape_of(text):
+    """
+    postfix tape of the expression text: a list of (op, type) steps,
+    with op None for the slots (the literals, in the order of the
+    text), and type the static type of the step. None if the
+    expression cannot be run as a tape
+    """
+    try:
+        node = parse(text)
+    except Exception:
+        return None
+    tape = []
+    # postfix walk, with the types of the values on the stack
+    stack, types = [(node, False)], []
+    while stack:
+        node, visited = stack.pop()
+        if isinstance(node, Num):
+            type = INTEGER if isinstance(node.value, int) else REAL
+            tape.append((SLOT, type))
+            types.append(type)
+        elif not isinstance(node, BinOp):
+            return None
+        elif not visited:
+            stack.append((node, True))
+            stack.append((node.right, False))
+            stack.append((node.left, False))
+        else:
+            right, left = types.pop(), types.pop()
+            if node.op == 'DIV':
+                if left != INTEGER or right != INTEGER:
+                    return None
+                type = INTEGER
+            elif node.op == '/' or left == REAL or right == REAL:
+                type = REAL
+            else:
+                type = INTEGER
+            tape.append((node.op, type))
+            types.append(type)
+    return tape
+
+
+def _columns(literals, tape):
+    """
+    the columns of the literal matrix (rows x slots of str), converted
+    to int64 or float64, and the rows with too long INTEGER literals,
+    or with literals of another type than the tape's
+    """
+    matrix = numpy.array(literals)
+    slot_types = [type for op, type in tape if op is SLOT]
+    columns = []
+    bad = numpy.zeros(len(literals), dtype=bool)
+    for index, type in enumerate(slot_types):
+        column = matrix[:, index]
+        real = numpy.char.find(column, '.') >= 0
+        if type == REAL:
+            if not real.all():
+                bad |= ~real
+            columns.append(column.astype(numpy.float64))
+            continue
+        wrong = real | (numpy.char.str_len(column) > SAFE_DIGITS)
+        if wrong.any():
+            bad |= wrong
+            column = numpy.where(wrong, '0', column)
+        columns.append(column.astype(numpy.int64))
+    return columns, bad
+
+
+def run_tape(tape, literals):
+    """
+    runs the tape on the literals of a group (a list of rows of literal
+    strings). Returns (results as a list, rows to evaluate again)
+    """
+    columns, bad = _columns(literals, tape)
+    columns.reverse()
+    stack = []
+    with numpy.errstate(all='ignore'):
+        for op, type in tape:
+            if op is SLOT:
+                stack.append(columns.pop())
+                continue
+            right = stack.pop()
+            left = stack.pop()
+            if op == '/' or op == 'DIV':
+                zero = right == 0
+                if zero.any():
+                    bad |= zero
+                    right = numpy.where(zero, 1, right)
+            if type == REAL:
+                left = left.astype(numpy.float64, copy=False)
+                right = right.astype(numpy.float64, copy=False)
+            if op == '+':
+                value = left + right
+            elif op == '-':
+                value = left - right
+            elif op == '*':
+                if type == INTEGER:
+                    # the int64 product can wrap around: its size is
+                    # checked on the float64 product
+                    bad |= numpy.abs(left.astype(numpy.float64)
+                                     * right.astype(numpy.float64)) >= LIMIT
+                value = left * right
+            elif op == '/':
+                value = left / right
+            else:
+                # Pascal DIV: truncated towards zero
+                value = left // right
+                value += (value < 0) & (value * right != left)
+            if type == INTEGER:
+                bad |= numpy.abs(value) >= LIMIT
+            stack.append(value)
+    return stack[0].tolist(), numpy.flatnonzero(bad).tolist()
+
+
+def evaluate_batch(texts, min_rows=16):
+    """
+    values of the expressions texts (in order). The entries of the
+    expressions that raise an error are the exception instances
+    """
+    texts = list(texts)
+    if numpy is None:
+        cache = ShapeCache()
+        results = []
+        for text in texts:
+            try:
+                results.append(cache.evaluate(text))
+            except Exception as error:
+                results.append(error)
+        return results
+
+    # shape -> ([row numbers], [literal strings of each row])
+    groups = {}
+    split = _LITERAL.split
+    for row, text in enumerate(texts):
+        parts = split(text)
+        shape = '#'.join(parts[::2])
+        group = groups.get(shape)
+        if group is None:
+            group = groups[shape] = ([], [])
+        group[0].append(row)
+        group[1].append(parts[1::2])
+
+    results = [None] * len(texts)
+    for rows, literals in groups.values():
+        tape = tape_of(texts[rows[0]]) if len(rows) >= min_rows else None
+        if tape is None:
+            for row in rows:
+                results[row] = _interpret(texts[row])
+            continue
+        values, bad = run_tape(tape, literals)
+        for row, value in zip(rows, values):
+            results[row] = value
+        for index in bad:
+            results[rows[index]] = _interpret(texts[rows[index]])
+    return results
@@ -0,0 +1,223 @@
+"""
+Checkpointed batch evaluation of a file of expressions, one per line.
+
+calc5.py in pipe mode keeps no progress state: a batch interrupted
+halfway has to start over from the first line. run_job() evaluates
+the lines of an input file into an output file (with the output
+formats and the error handling of the pipe mode), and every `every`
+lines writes a checkpoint: the byte offset of the next input line, the
+size of the output written so far, and the counters. Before a
+checkpoint is written, the output is flushed and synced to the disk,
+and the checkpoint itself replaces the previous one atomically (it is
+written to a temporary file, synced, and renamed with os.replace()), so
+the checkpoint on the disk never refers to output that may be lost.
+
+After a crash, run_job() with the same checkpoint file resumes: the
+output is truncated back to the checkpointed size (dropping the lines
+written after the checkpoint, which will be written again), and the
+input is read from the checkpointed offset. Each line is evaluated
+again at most once (the ones after the last checkpoint), and appears
+exactly once in the output. A larger interval means less I/O, and more
+lines to evaluate again after a crash.
+
+Usage:
+    $ python3 batchjob.py exprs.txt results.txt --checkpoint job.json --every 100000
+(run the same command again to resume an interrupted job)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from calc5 import evaluate
+from bigint import int_to_str
+
+CHECKPOINT_VERSION = 1
+# number of results buffered before writing them out
+WRITE_BATCH = 1024
+
+
+class JobError(Exception):
+    pass
+
+
+class Progress(object):
+    """
+    state of a job, as saved in its checkpoint
+    """
+    def __init__(self, input_path, output_path, input_offset=0, output_offset=0,
+                 lines=0, results=0, errors=0, done=False):
+        self.input_path = input_path
+        self.output_path = output_path
+        # offset of the next line to read, size of the output written
+        self.input_offset = input_offset
+        self.output_offset = output_offset
+        # number of lines read, of results written, of invalid lines
+        self.lines = lines
+        self.results = results
+        self.errors = errors
+        self.done = done
+
+    def as_dict(self):
+        return {'version': CHECKPOINT_VERSION,
+                'input': os.path.abspath(self.input_path),
+                'output': os.path.abspath(self.output_path),
+                'input_offset': self.input_offset,
+                'output_offset': self.output_offset,
+                'lines': self.lines, 'results': self.results,
+                'errors': self.errors, 'done': self.done}
+
+    def __repr__(self):
+        return 'Progress(lines={}, results={}, errors={}, done={})'.format(
+            self.lines, self.results, self.errors, self.done)
+
+
+def save_checkpoint(path, progress):
+    """
+    replaces the checkpoint at path atomically
+    """
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as checkpoint:
+        json.dump(progress.as_dict(), checkpoint)
+        checkpoint.flush()
+        os.fsync(checkpoint.fileno())
+    os.replace(temporary, path)
+    # the rename itself is made durable by syncing the directory
+    if hasattr(os, 'O_DIRECTORY'):
+        directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_DIRECTORY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+
+def load_checkpoint(path, input_path, output_path):
+    """
+    Progress saved at path (a new one if there is no checkpoint). The
+    checkpoint must be of the same input and output files
+    """
+    try:
+        with open(path) as checkpoint:
+            saved = json.load(checkpoint)
+    except FileNotFoundError:
+        return Progress(input_path, output_path)
+    if saved.get('version') != CHECKPOINT_VERSION:
+        raise JobError('{}: unsupported checkpoint version'.format(path))
+    if (saved['input'] != os.path.abspath(input_path)
+            or saved['output'] != os.path.abspath(output_path)):
+        raise JobError('{}: checkpoint of another job ({} -> {})'.format(
+            path, saved['input'], saved['output']))
+    return Progress(input_path, output_path, saved['input_offset'],
+                    saved['output_offset'], saved['lines'], saved['results'],
+                    saved['errors'], saved['done'])
+
+
+def format_result(result):
+    return int_to_str(result) if isinstance(result, int) else str(result)
+
+
+def run_job(input_path, output_path, checkpoint_path, every=100000,
+            format='{result}', on_error='abort', error_format='error: {error}',
+            evaluate=evaluate):
+    """
+    evaluates the lines of input_path into output_path, with a
+    checkpoint every `every` lines (see the module documentation).
+    on_error is 'abort' (raise a JobError), 'skip' or 'report' (write
+    error_format), like in the pipe mode of calc5.py.
+    Returns the final Progress
+    """
+    progress = load_checkpoint(checkpoint_path, input_path, output_path)
+    if progress.done:
+        return progress
+    size = os.path.getsize(output_path) if os.path.exists(output_path) else 0
+    if size < progress.output_offset:
+        raise JobError('{}: shorter than in the checkpoint ({} < {} bytes)'.format(
+            output_path, size, progress.output_offset))
+    mode = 'r+b' if os.path.exists(output_path) else 'w+b'
+    with open(input_path, 'rb') as source, open(output_path, mode) as output:
+        # drops the output written after the checkpoint
+        output.truncate(progress.output_offset)
+        output.seek(progress.output_offset)
+        source.seek(progress.input_offset)
+        pending = []
+
+        def checkpoint(done=False):
+            output.write(''.join(pending).encode())
+            pending.clear()
+            output.flush()
+            os.fsync(output.fileno())
+            progress.output_offset = output.tell()
+            progress.done = done
+            save_checkpoint(checkpoint_path, progress)
+
+        since_checkpoint = 0
+        for raw in source:
+            line = raw.rstrip(b'\n')
+            number = progress.lines + 1
+            # empty lines are ignored, like in the pipe mode
+            if line:
+                try:
+                    # (a line that is not UTF-8 is an invalid line too)
+                    text = line.decode()
+                    result = evaluate(text)
+                except Exception as error:
+                    if on_error == 'abort':
+                        # the checkpoint is just before the invalid line
+                        checkpoint()
+                        raise JobError('line {}: {}'.format(number, error)) from error
+                    progress.errors += 1
+                    if on_error == 'report':
+                        message = str(error).split('\n')[0]
+                        pending.append(error_format.format(
+                            line=number, expr=line.decode(errors='replace'),
+                            error=message) + '\n')
+                else:
+                    pending.append(format.format(
+                        line=number, expr=text, result=format_result(result)) + '\n')
+                    progress.results += 1
+            progress.lines = number
+            progress.input_offset += len(raw)
+            if len(pending) >= WRITE_BATCH:
+                output.write(''.join(pending).encode())
+                pending.clear()
+            since_checkpoint += 1
+            if since_checkpoint >= every:
+                checkpoint()
+                since_checkpoint = 0
+        checkpoint(done=True)
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="evaluate a file of expressions, with checkpoints to "
+                    "resume after a crash")
+    parser.add_argument('input')
+    parser.add_argument('output')
+    parser.add_argument('--checkpoint', required=True, metavar='FILE',
+                        help="checkpoint file (the job resumes from it if it exists)")
+    parser.add_argument('--every', type=int, default=100000, metavar='LINES',
+                        help="lines between two checkpoints (default: 100000)")
+    parser.add_argument('--format', default='{result}',
+                        help="format of each output line, with the fields "
+                             "{line} (line number), {expr} and {result}")
+    parser.add_argument('--on-error', choices=['abort', 'skip', 'report'],
+                        default='abort')
+    parser.add_argument('--error-format', default='error: {error}')
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    try:
+        progress = run_job(args.input, args.output, args.checkpoint, args.every,
+                           args.format, args.on_error, args.error_format)
+    except JobError as error:
+        sys.stderr.write('{}\n'.format(error))
+        return 1
+    sys.stderr.write('{} lines, {} results, {} errors ({:.2f} s)\n'.format(
+        progress.lines, progress.results, progress.errors,
+        time.perf_counter() - start))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,98 @@
+"""
+Benchmark: the struct-of-arrays AST (see arena.py) against the tree of
+objects (see tree.py). Reports the bytes per node of each, and the
+speed of their evaluation.
+
+Usage:
+    $ python3 bench_arena.py --depth 17
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from calc5 import int_div, evaluate
+from tree import parse as parse_tree, BinOp
+import arena
+
+
+def random_expression(rng, depth):
+    """
+    random balanced expression with 2 ** depth numbers (the divisors
+    are positive sums, so that there is no division by zero)
+    """
+    if depth == 0:
+        if rng.random() < 0.05:
+            return str(rng.randint(10 ** 20, 10 ** 21))
+        return str(rng.randint(1, 10 ** 6))
+    op = rng.choice(['+', '-', '*', 'DIV'])
+    left = random_expression(rng, depth - 1)
+    right = random_expression(rng, depth - 1)
+    if op == 'DIV':
+        right = '({} * {} + 1)'.format(right, right)
+    return '({} {} {})'.format(left, op, right)
+
+
+def evaluate_tree(node):
+    if not isinstance(node, BinOp):
+        return node.value
+    left = evaluate_tree(node.left)
+    right = evaluate_tree(node.right)
+    if node.op == '+':
+        return left + right
+    elif node.op == '-':
+        return left - right
+    elif node.op == '*':
+        return left * right
+    elif node.op == '/':
+        return left / right
+    return int_div(left, right)
+
+
+def measure(build):
+    """
+    (result of build(), bytes allocated by it and still in use)
+    """
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--depth', type=int, default=17)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    # the numbers are kept small, so that the arithmetic does not hide
+    # the cost of the walk
+    text = random_expression(random.Random(0), args.depth).replace('*', '+')
+    tree, tree_bytes = measure(lambda: parse_tree(text))
+    (nodes, root), arena_bytes = measure(lambda: arena.parse(text))
+    count = len(nodes)
+    print(f'{count:,} nodes')
+    print(f'tree:  {tree_bytes / count:8.1f} bytes/node')
+    print(f'arena: {arena_bytes / count:8.1f} bytes/node '
+          f'({nodes.nbytes() / count:.1f} in the arrays)')
+
+    expected = evaluate(text)
+    result, tree_time = timed(lambda: evaluate_tree(tree), args.repeat)
+    assert result == expected
+    result, arena_time = timed(lambda: nodes.evaluate(root), args.repeat)
+    assert result == expected
+    print(f'tree walk:   {count / tree_time:12,.0f} nodes/s')
+    print(f'arena stack: {count / arena_time:12,.0f} nodes/s '
+          f'({tree_time / arena_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
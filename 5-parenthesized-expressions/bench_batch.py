@@ -0,0 +1,100 @@
+"""
+Benchmark of the batched evaluation (see batch.py) on many small
+expressions of a few hundred shapes, against the calc5 Interpreter one
+expression at a time, and against the ShapeCache (see shapes.py).
+Reports the expressions per second, and how many rows were evaluated
+again by the Interpreter (overflows, divisions by zero).
+
+Usage:
+    $ python3 bench_batch.py --expressions 200000 --shapes 300
+"""
+import argparse
+import random
+import time
+
+import batch
+from calc5 import Lexer, Interpreter
+from shapes import ShapeCache
+
+
+def make_expressions(count, shapes, seed=0):
+    """
+    count random expressions like '(12+7)*3-4', from the given number
+    of shapes; a few have big numbers or divide by zero
+    """
+    rng = random.Random(seed)
+    templates = []
+    while len(templates) < shapes:
+        parts = ['{}']
+        for _ in range(rng.randint(1, 5)):
+            op = rng.choice(['+', '-', '*', '/', 'DIV'])
+            operand = rng.choice(['{}', '{}', '({} + {})', '{}.5'])
+            if op == 'DIV':
+                operand = '{}'
+            parts.append(' {} {}'.format(op, operand) if op == 'DIV' else op + operand)
+        template = ''.join(parts)
+        # (DIV on a REAL is an error for every expression of the shape)
+        if batch.tape_of(template.format(*[1] * template.count('{}'))) is not None:
+            templates.append(template)
+    expressions = []
+    for _ in range(count):
+        template = rng.choice(templates)
+        numbers = [rng.choice([rng.randint(1, 999), rng.randint(0, 9), 10 ** 18])
+                   if rng.random() < 0.01 else rng.randint(1, 999)
+                   for _ in range(template.count('{}'))]
+        expressions.append(template.format(*numbers))
+    return expressions
+
+
+def interpret_all(texts):
+    results = []
+    for text in texts:
+        try:
+            results.append(Interpreter(Lexer(text)).expr())
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+def cached_all(texts):
+    cache = ShapeCache()
+    results = []
+    for text in texts:
+        try:
+            results.append(cache.evaluate(text))
+        except Exception as error:
+            results.append(error)
+    return results
+
+
+def same(results, expected):
+    return all(repr(result) == repr(value) for result, value in zip(results, expected))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--expressions', type=int, default=200000)
+    parser.add_argument('--shapes', type=int, default=300)
+    parser.add_argument('--min-rows', type=int, default=16)
+    args = parser.parse_args()
+
+    texts = make_expressions(args.expressions, args.shapes)
+    print(f'{len(texts):,} expressions, {args.shapes} shapes, '
+          f'NumPy: {batch.numpy is not None}')
+    runs = [('Interpreter', interpret_all), ('ShapeCache', cached_all),
+            ('evaluate_batch', lambda texts: batch.evaluate_batch(texts, args.min_rows))]
+    expected = None
+    for name, function in runs:
+        start = time.perf_counter()
+        results = function(texts)
+        elapsed = time.perf_counter() - start
+        if expected is None:
+            expected = results
+        assert same(results, expected), name
+        print(f'{name:15} {len(texts) / elapsed:12,.0f} expressions/s ({elapsed:.2f} s)')
+    errors = sum(isinstance(result, Exception) for result in expected)
+    print(f'{errors:,} errors')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark for very large integer literals and results.
+
+For each size (number of digits) it measures:
+* lexing a literal with calc5.Lexer (linear collection + str_to_int)
+* writing a result with bigint.write_result
+and, up to --max-naive digits, the builtin int()/str() conversions
+(with the int/str digits limit lifted), for comparison.
+
+Usage:
+    $ python3 bench_bigint.py                  # 10^3 ... 10^6 digits
+    $ python3 bench_bigint.py --sizes 1000 100000
+"""
+import argparse
+import io
+import random
+import sys
+import time
+
+import bigint
+from calc5 import Lexer
+
+
+def timeit(function, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6])
+    parser.add_argument('--max-naive', type=int, default=10 ** 5,
+                        help='largest size timed with the builtins')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if hasattr(sys, 'set_int_max_str_digits'):
+        sys.set_int_max_str_digits(0)
+    rng = random.Random(0)
+    print(f"{'digits':>9} {'lex':>10} {'int()':>10} {'write':>10} {'str()':>10}")
+    for size in args.sizes:
+        text = str(rng.randint(1, 9)) + ''.join(
+            rng.choice('0123456789') for _ in range(size - 1))
+        number = Lexer(text).get_next_token().value
+        lex = timeit(lambda: Lexer(text).get_next_token(), args.repeat)
+        write = timeit(lambda: bigint.write_result(io.StringIO(), number), args.repeat)
+        if size <= args.max_naive:
+            naive_int = f'{timeit(lambda: int(text), args.repeat):10.4f}'
+            naive_str = f'{timeit(lambda: str(number), args.repeat):10.4f}'
+        else:
+            naive_int = naive_str = f"{'-':>10}"
+        print(f'{size:>9} {lex:10.4f} {naive_int} {write:10.4f} {naive_str}')
+
+
+if __name__ == '__main__':
+    main()
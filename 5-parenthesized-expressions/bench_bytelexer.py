@@ -0,0 +1,59 @@
+"""
+Benchmark: lexing binary input with ByteLexer, against decoding it to
+a str and lexing it with calc5.Lexer.
+
+Usage:
+    $ python3 bench_bytelexer.py --terms 200000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from calc5 import Lexer, EOF
+from bytelexer import ByteLexer
+
+
+def make_input(terms, seed=0):
+    rng = random.Random(seed)
+    parts = [str(rng.randint(0, 10 ** 6))]
+    for _ in range(terms - 1):
+        parts.append(rng.choice('+-*/'))
+        parts.append(str(rng.randint(1, 10 ** 6)))
+    return ' '.join(['('] + parts + [')']).encode('ascii')
+
+
+def count_tokens(lexer):
+    count = 0
+    while lexer.get_next_token().type != EOF:
+        count += 1
+    return count
+
+
+def run(name, function):
+    start = time.perf_counter()
+    count = function()
+    elapsed = time.perf_counter() - start
+    # second run, to measure the memory without slowing down the first
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{name:<16} {count:>9} tokens {elapsed:8.3f} s '
+          f'{count / elapsed:>12,.0f} tokens/s  peak {peak / 2 ** 20:8.2f} MiB')
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--terms', type=int, default=200000)
+    args = parser.parse_args()
+    data = make_input(args.terms)
+    print(f'input: {len(data) / 2 ** 20:.2f} MiB')
+    decoded = run('decode + Lexer', lambda: count_tokens(Lexer(data.decode('ascii'))))
+    direct = run('ByteLexer', lambda: count_tokens(ByteLexer(data)))
+    assert decoded == direct
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of the streaming parser (see events.py): events per second,
+with and without the streaming evaluation (against the calc5
+Interpreter), and the peak memory against building the tree (see
+tree.py), for two sizes of input.
+
+Usage:
+    $ python3 bench_events.py --terms 100000
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from collections import deque
+
+from calc5 import Lexer, Interpreter
+from bytelexer import ByteLexer
+from events import events, evaluate
+from tree import parse
+
+
+def make_input(terms, seed=0):
+    """
+    a long sum of nested terms
+    """
+    rng = random.Random(seed)
+    parts = ['0']
+    for _ in range(terms):
+        parts.append('+ ({} * ({} - {}) DIV ({} + 1))'.format(
+            rng.randint(0, 10 ** 6), rng.randint(0, 10 ** 6),
+            rng.randint(0, 10 ** 6), rng.randint(0, 999)))
+    return ' '.join(parts)
+
+
+def peak(function):
+    tracemalloc.start()
+    function()
+    result = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--terms', type=int, default=100000)
+    args = parser.parse_args()
+
+    text = make_input(args.terms)
+    count = sum(1 for _ in events(Lexer(text)))
+    start = time.perf_counter()
+    # consumes the events without keeping them
+    deque(events(Lexer(text)), maxlen=0)
+    parsing = time.perf_counter() - start
+    start = time.perf_counter()
+    result = evaluate(events(Lexer(text)))
+    streaming = time.perf_counter() - start
+    start = time.perf_counter()
+    expected = Interpreter(Lexer(text)).expr()
+    interpreter = time.perf_counter() - start
+    assert result == expected
+    print(f'{count:,} events')
+    print(f'events only:       {count / parsing:12,.0f} events/s')
+    print(f'events + evaluate: {count / streaming:12,.0f} events/s '
+          f'({streaming:.3f} s)')
+    print(f'Interpreter:       {interpreter:.3f} s')
+
+    # the input is kept out of the measures, as bytes
+    for terms in (args.terms // 10, args.terms):
+        data = make_input(terms).encode('ascii')
+        streamed = peak(lambda: evaluate(events(ByteLexer(data))))
+        tree = peak(lambda: parse(data.decode('ascii')))
+        print(f'{len(data):>12,} bytes: streaming peak {streamed / 1024:10,.1f} KiB, '
+              f'tree peak {tree / 1024:10,.1f} KiB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark of the table-driven LL(1) engine (see ll1.py) against the
+hand-written recursive descent: the calc5 Interpreter for the
+evaluation, and the tree.py Parser for building the AST. Each is
+measured on the text (lexing included), and on tokens lexed beforehand
+(replayed, to compare the parsers alone).
+
+Usage:
+    $ python3 bench_ll1.py --depth 14 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from calc5 import Lexer, Interpreter, EOF
+from ll1 import CALC5, evaluate, parse, OPERATIONS, ID, Num, Var, BinOp
+from tree import Parser
+from bench_visitor import random_expression
+
+
+class TokenReplay(object):
+    """
+    stands in for a Lexer, giving back tokens that were already lexed
+    (with the spans of the lexer, for the error positions)
+    """
+    def __init__(self, lexer, tokens):
+        self.text = lexer.text
+        self.starts = lexer.starts
+        self.tokens = iter(tokens)
+
+    def get_next_token(self):
+        return next(self.tokens)
+
+
+def lex(text):
+    lexer = Lexer(text)
+    tokens = [lexer.get_next_token()]
+    while tokens[-1].type != EOF:
+        tokens.append(lexer.get_next_token())
+    return lexer, tokens
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--depth', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    text = random_expression(random.Random(0), args.depth)
+    lexer, tokens = lex(text)
+    print(f'{len(tokens):,} tokens')
+
+    def leaf(terminal, value, lexer):
+        return value
+
+    def node(terminal, value, lexer):
+        return Var(value) if terminal == ID else Num(value)
+
+    cases = [
+        ('evaluate, from text', lambda: Interpreter(Lexer(text)).expr(),
+         lambda: evaluate(text)),
+        ('evaluate, from tokens', lambda: Interpreter(TokenReplay(lexer, tokens)).expr(),
+         lambda: CALC5.run(TokenReplay(lexer, tokens), leaf,
+                           lambda op, left, right: OPERATIONS[op](left, right))),
+        ('AST, from text', lambda: Parser(Lexer(text)).parse(), lambda: parse(text)),
+        ('AST, from tokens', lambda: Parser(TokenReplay(lexer, tokens)).parse(),
+         lambda: CALC5.run(TokenReplay(lexer, tokens), node,
+                           lambda op, left, right: BinOp(left, op, right))),
+    ]
+    for name, descent, table in cases:
+        expected, descent_time = timed(descent, args.repeat)
+        result, table_time = timed(table, args.repeat)
+        assert repr(result) == repr(expected), name
+        print(f'{name:22} descent {len(tokens) / descent_time:12,.0f} tokens/s, '
+              f'LL(1) table {len(tokens) / table_time:12,.0f} tokens/s '
+              f'({descent_time / table_time:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the evaluation policies (see numeric.py): the time of the
+EXACT, FLOAT and AUTO policies on small INTEGER expressions, on REAL
+expressions, and on a long chain of multiplications (where the exact
+integers grow to thousands of digits), with the modes of the AUTO
+results.
+
+Usage:
+    $ python3 bench_numeric.py --expressions 5000 --factors 50000
+"""
+import argparse
+import random
+import re
+import time
+
+from numeric import evaluate, POLICIES, AUTO
+from bench_visitor import random_expression
+
+
+def workloads(expressions, factors):
+    """
+    (name, list of expressions) of the benchmark
+    """
+    rng = random.Random(0)
+    # numbers below 1000
+    small = [re.sub(r'\d+', lambda match: str(int(match.group()) % 1000),
+                    random_expression(rng, 4).replace('/', 'DIV'))
+             for _ in range(expressions)]
+    real = [random_expression(rng, 4) for _ in range(expressions)]
+    chain = ' * '.join(str(rng.randint(2, 999999)) for _ in range(factors))
+    return [('small INTEGERs', small), ('REALs', real),
+            ('{} factors'.format(factors), [chain + ' DIV 7 + 1'])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--expressions', type=int, default=5000)
+    parser.add_argument('--factors', type=int, default=50000)
+    args = parser.parse_args()
+
+    for name, texts in workloads(args.expressions, args.factors):
+        print(f'{name}: {len(texts):,} expressions')
+        for policy in POLICIES:
+            start = time.perf_counter()
+            results = [evaluate(text, policy) for text in texts]
+            elapsed = time.perf_counter() - start
+            modes = {}
+            for result in results:
+                modes[result.mode] = modes.get(result.mode, 0) + 1
+            line = f'  {policy:6} {elapsed:9.3f} s'
+            if policy == AUTO:
+                line += '  ' + ', '.join(f'{count} {mode}' for mode, count in sorted(modes.items()))
+            if len(texts) == 1:
+                value = results[0].value
+                line += f'  result: {value if isinstance(value, float) else "int of %d bits" % value.bit_length()}'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of the parallel lexing (see parlex.py): lexes a generated
+expression file with an increasing number of worker processes, checks
+that the tokens are identical to the sequential ByteLexer ones, and
+reports the scaling (speedup over the first worker count).
+
+Usage:
+    $ python3 bench_parlex.py --megabytes 50 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from calc5 import Interpreter
+from bytelexer import ByteLexer
+from parlex import tokenize_file, same_tokens
+
+
+def write_input(path, megabytes, seed=0):
+    """
+    writes a random expression of about the given size
+    """
+    rng = random.Random(seed)
+    size = megabytes * 2 ** 20
+    with open(path, 'w') as file:
+        file.write('(0')
+        written = 2
+        while written < size:
+            part = ' + ({} * {} - {} DIV {})\n'.format(
+                rng.randint(0, 10 ** 6), rng.randint(0, 10 ** 6),
+                rng.randint(0, 10 ** 12), rng.randint(1, 999))
+            file.write(part)
+            written += len(part)
+        file.write(')')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--megabytes', type=int, default=50)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--no-check', action='store_true',
+                        help="skip the comparison with the sequential lexer")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.txt')
+        write_input(path, args.megabytes)
+        with open(path, 'rb') as file:
+            data = file.read()
+        print(f'{len(data):,} bytes, {os.cpu_count()} CPUs')
+        base = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            buffer = tokenize_file(path, workers)
+            elapsed = time.perf_counter() - start
+            if base is None:
+                base = elapsed
+            print(f'{workers:>3} workers {len(buffer):>12,} tokens {elapsed:8.3f} s '
+                  f'{len(buffer) / elapsed:>12,.0f} tokens/s '
+                  f'({base / elapsed:.2f}x)')
+        if not args.no_check:
+            identical = same_tokens(buffer, ByteLexer(data))
+            print('identical to the sequential lexer:', identical)
+            result = Interpreter(buffer.lexer(data)).expr()
+            print('same result:', result == Interpreter(ByteLexer(data)).expr())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark of the parallel evaluation of top-level sums (see
+parsum.py), against the sequential Interpreter. Checks that the
+results are identical (same type and same bits).
+
+Usage:
+    $ python3 bench_parsum.py --terms 200000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import parsum
+from calc5 import Interpreter
+from bytelexer import ByteLexer
+
+
+def write_input(path, terms, reals, seed=0):
+    """
+    writes a sum of parenthesized terms (a fraction of them REAL)
+    """
+    rng = random.Random(seed)
+    with open(path, 'w') as file:
+        file.write('0')
+        for _ in range(terms):
+            if rng.random() < reals:
+                term = '({} / {} - {})'.format(
+                    rng.randint(1, 10 ** 6), rng.randint(1, 999), rng.randint(0, 9))
+            else:
+                term = '({} * ({} - {}) DIV {})'.format(
+                    rng.randint(0, 10 ** 12), rng.randint(0, 10 ** 6),
+                    rng.randint(0, 10 ** 6), rng.randint(1, 999))
+            file.write(' {} {}\n'.format(rng.choice('+-'), term))
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--terms', type=int, default=200000)
+    parser.add_argument('--reals', type=float, default=0.1,
+                        help="fraction of REAL terms")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'input.txt')
+        write_input(path, args.terms, args.reals)
+        with open(path, 'rb') as file:
+            data = file.read()
+        print(f'{len(data):,} bytes, {args.terms:,} terms, {os.cpu_count()} CPUs, '
+              f'scan with {"NumPy" if parsum.numpy else "re"}')
+        _, scan = timed(lambda: parsum.split_points(data))
+        print(f'split points scan {scan:8.3f} s')
+        expected, sequential = timed(lambda: Interpreter(ByteLexer(data)).expr())
+        print(f'sequential        {sequential:8.3f} s')
+        for workers in args.workers:
+            result, elapsed = timed(lambda: parsum.evaluate_file(path, workers))
+            identical = type(result) is type(expected) and repr(result) == repr(expected)
+            print(f'{workers:>3} workers       {elapsed:8.3f} s '
+                  f'({sequential / elapsed:.2f}x)  identical: {identical}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark of the Pascal routine calls (see pascal.py), on recursive
+functions: Fibonacci and Ackermann. Reports the calls per second.
+
+Usage:
+    $ python3 bench_pascal.py --fib 22 --ackermann 2 300
+"""
+import argparse
+import io
+import time
+
+from pascal import compile_program
+
+SOURCE = """
+PROGRAM Bench;
+FUNCTION Fib(n : INTEGER) : INTEGER;
+BEGIN
+  IF n < 2 THEN Fib := n
+  ELSE Fib := Fib(n - 1) + Fib(n - 2)
+END;
+FUNCTION Ack(m, n : INTEGER) : INTEGER;
+BEGIN
+  IF m = 0 THEN Ack := n + 1
+  ELSE IF n = 0 THEN Ack := Ack(m - 1, 1)
+  ELSE Ack := Ack(m - 1, Ack(m, n - 1))
+END;
+BEGIN
+  WRITELN({call})
+END.
+"""
+
+
+def fib_calls(n):
+    """
+    number of calls made by the recursive Fib(n)
+    """
+    a, b = 1, 1
+    for _ in range(n):
+        a, b = b, a + b + 1
+    return a
+
+
+def ackermann_calls(m, n):
+    """
+    number of calls made by the recursive Ack(m, n) (iterative count)
+    """
+    calls = 0
+    stack = [m]
+    while stack:
+        m = stack.pop()
+        calls += 1
+        if m == 0:
+            n += 1
+        elif n == 0:
+            n = 1
+            stack.append(m - 1)
+        else:
+            n -= 1
+            stack.append(m - 1)
+            stack.append(m)
+    return calls
+
+
+def bench(name, call, calls, max_depth):
+    program = compile_program(SOURCE.replace('{call}', call), max_depth=max_depth)
+    output = io.StringIO()
+    start = time.perf_counter()
+    program.run(output)
+    elapsed = time.perf_counter() - start
+    print(f'{name:<16} = {output.getvalue().strip():>8}  {calls:>10} calls '
+          f'{elapsed:8.3f} s {calls / elapsed:>12,.0f} calls/s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--fib', type=int, default=22)
+    parser.add_argument('--ackermann', type=int, nargs=2, default=[2, 300])
+    parser.add_argument('--max-depth', type=int, default=5000)
+    args = parser.parse_args()
+    m, n = args.ackermann
+    bench(f'fib({args.fib})', f'Fib({args.fib})', fib_calls(args.fib), args.max_depth)
+    bench(f'ackermann({m}, {n})', f'Ack({m}, {n})', ackermann_calls(m, n), args.max_depth)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark of the Pascal arrays (see pascal.py): a bulk fill and a sum
+over an ARRAY OF INTEGER, with the bounds checks hoisted out of the
+loops (the default), and with a check at every access. Also reports the
+memory of the array, against a list of the same ints.
+
+Usage:
+    $ python3 bench_pascal_arrays.py --size 10000000
+"""
+import argparse
+import io
+import sys
+import time
+
+from pascal import compile_program
+
+SOURCE = """
+PROGRAM Arrays;
+CONST N = {size};
+VAR a : ARRAY[1..N] OF INTEGER;
+    i, s : INTEGER;
+BEGIN
+  FOR i := 1 TO N DO a[i] := i;
+  FOR i := 1 TO N DO s := s + a[i];
+  WRITELN(s)
+END.
+"""
+
+
+def bench(name, size, hoist_bounds):
+    program = compile_program(SOURCE.replace('{size}', str(size)),
+                              hoist_bounds=hoist_bounds)
+    output = io.StringIO()
+    start = time.perf_counter()
+    program.run(output)
+    elapsed = time.perf_counter() - start
+    assert int(output.getvalue()) == size * (size + 1) // 2
+    print(f'{name:<8} {elapsed:8.3f} s {2 * size / elapsed:>14,.0f} accesses/s')
+    return program
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--size', type=int, default=10 ** 7)
+    args = parser.parse_args()
+    bench('checked', args.size, hoist_bounds=False)
+    program = bench('hoisted', args.size, hoist_bounds=True)
+    elements = program.globals[0]
+    array_bytes = sys.getsizeof(elements)
+    # a list of the same values: the pointers, and one int object per
+    # element (the small ints are shared, but they are few here)
+    list_bytes = sys.getsizeof(list(range(0))) + 8 * args.size + sum(
+        sys.getsizeof(value) for value in range(257, 257 + min(args.size, 1000))
+    ) * args.size // min(args.size, 1000)
+    print(f'array("q"): {array_bytes:>14,} bytes')
+    print(f'list:       {list_bytes:>14,} bytes ({list_bytes / array_bytes:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
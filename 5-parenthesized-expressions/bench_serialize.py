@@ -0,0 +1,69 @@
+"""
+Benchmark of the binary encoding of the trees (see serialize.py),
+against pickle and against sending the source text and parsing it
+again: encoded size, and encoding and decoding throughput in nodes per
+second, for trees with small numbers, with big numbers, and with
+placeholders.
+
+Usage:
+    $ python3 bench_serialize.py --depth 12 --repeat 5
+"""
+import argparse
+import pickle
+import random
+import re
+import time
+
+from serialize import dumps, loads
+from tree import parse
+from bench_visitor import random_expression, count_nodes
+
+
+def make_inputs(depth):
+    """
+    (name, source text) of the benchmarked expressions
+    """
+    rng = random.Random(0)
+    small = random_expression(rng, depth)
+    big = random_expression(rng, depth)
+    big = re.sub(r'\d+', lambda match: match.group() + '0' * 30, big)
+    names = random_expression(rng, depth)
+    names = re.sub(r'\d+', lambda match: 'x{}'.format(int(match.group()) % 100), names)
+    return [('small numbers', small), ('big numbers', big), ('placeholders', names)]
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--depth', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    for name, text in make_inputs(args.depth):
+        tree = parse(text)
+        nodes = count_nodes(tree)
+        print(f'{name}: {nodes:,} nodes')
+        data, encode = timed(lambda: dumps(tree), args.repeat)
+        decoded, decode = timed(lambda: loads(data), args.repeat)
+        assert repr(decoded) == repr(tree)
+        pickled, pickle_encode = timed(
+            lambda: pickle.dumps(tree, pickle.HIGHEST_PROTOCOL), args.repeat)
+        _, pickle_decode = timed(lambda: pickle.loads(pickled), args.repeat)
+        source, text_encode = timed(lambda: text.encode('utf-8'), args.repeat)
+        _, reparse = timed(lambda: parse(source.decode('utf-8')), args.repeat)
+        print(f'  {"":10}{"bytes":>12}{"encode nodes/s":>18}{"decode nodes/s":>18}')
+        for label, size, encoding, decoding in (
+                ('binary', len(data), encode, decode),
+                ('pickle', len(pickled), pickle_encode, pickle_decode),
+                ('text', len(source), text_encode, reparse)):
+            print(f'  {label:10}{size:12,}{nodes / encoding:18,.0f}{nodes / decoding:18,.0f}')
+
+
+if __name__ == '__main__':
+    main()
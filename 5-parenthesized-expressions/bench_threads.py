@@ -0,0 +1,108 @@
+"""
+Benchmark of the thread scaling of the evaluation: the same batch of
+expressions is split between 1, 2, 4, ... threads, evaluated with the
+reentrant evaluate() (see reentrant.py), with calc5.evaluate() (a new
+Lexer and Interpreter per expression), and with a ShapeCache shared by
+all the threads (see shapes.py). Reports the throughput and the speedup
+over one thread, and checks the results against calc5.
+
+With the GIL, the threads take turns and the speedup stays around 1x;
+on a free-threaded build (python3.13t and later, with the GIL disabled)
+the evaluations run in parallel, up to the number of cores.
+
+Usage:
+    $ python3 bench_threads.py --expressions 20000 --threads 1 2 4 8
+"""
+import argparse
+import os
+import random
+import sys
+import sysconfig
+import threading
+import time
+
+import calc5
+import reentrant
+from shapes import ShapeCache
+
+
+def make_expressions(count, seed=0):
+    """
+    random expressions, from a few hundred shapes
+    """
+    rng = random.Random(seed)
+    shapes = []
+    for _ in range(300):
+        terms = ['{}']
+        for _ in range(rng.randint(2, 12)):
+            op = rng.choice(['+', '-', '*', 'DIV'])
+            term = '{}' if rng.random() < 0.6 else '({} + {})'
+            terms.append('{} {}'.format(op, term))
+        shapes.append(' '.join(terms))
+    expressions = []
+    for _ in range(count):
+        shape = rng.choice(shapes)
+        numbers = [rng.randint(1, 10 ** 6) for _ in range(shape.count('{}'))]
+        expressions.append(shape.format(*numbers))
+    return expressions
+
+
+def run_threads(evaluate, expressions, threads):
+    """
+    evaluates the expressions split in contiguous parts between the
+    threads. Returns the results (in order) and the elapsed time
+    """
+    results = [None] * len(expressions)
+    size = -(-len(expressions) // threads)
+
+    def work(start):
+        for i in range(start, min(start + size, len(expressions))):
+            results[i] = evaluate(expressions[i])
+
+    workers = [threading.Thread(target=work, args=(start,))
+               for start in range(0, len(expressions), size)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - start
+
+
+def gil_enabled():
+    # sys._is_gil_enabled() exists since 3.13
+    return getattr(sys, '_is_gil_enabled', lambda: True)()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--expressions', type=int, default=20000)
+    parser.add_argument('--threads', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    expressions = make_expressions(args.expressions)
+    expected = [calc5.evaluate(text) for text in expressions]
+    free_threaded = bool(sysconfig.get_config_var('Py_GIL_DISABLED'))
+    print(f'Python {sys.version.split()[0]}, free-threaded build: {free_threaded}, '
+          f'GIL enabled: {gil_enabled()}, {os.cpu_count()} CPUs')
+    print(f'{len(expressions):,} expressions')
+    cache = ShapeCache()
+    evaluations = [('reentrant', reentrant.evaluate),
+                   ('calc5', calc5.evaluate),
+                   ('shared ShapeCache', cache.evaluate)]
+    for name, evaluate in evaluations:
+        # warm-up (fills the shared cache)
+        run_threads(evaluate, expressions, 1)
+        base = None
+        for threads in args.threads:
+            results, elapsed = run_threads(evaluate, expressions, threads)
+            assert results == expected, name
+            if base is None:
+                base = elapsed
+            print(f'{name:18} {threads:3} threads: {len(expressions) / elapsed:12,.0f} '
+                  f'expressions/s ({base / elapsed:.2f}x)')
+    print(cache.format_report())
+
+
+if __name__ == '__main__':
+    main()
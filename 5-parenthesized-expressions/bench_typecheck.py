@@ -0,0 +1,107 @@
+"""
+Benchmark: evaluation of parsed expressions with dynamic dispatch,
+against the code specialized by the static type inference.
+
+* dynamic: walks the AST, choosing the operation by comparing the
+  operator strings, and checking the operand types of DIV at run time
+  (what the calc5 Interpreter does)
+* typed: calls the function compiled by typecheck.compile_typed()
+
+Usage:
+    $ python3 bench_typecheck.py --expressions 2000 --depth 5
+"""
+import argparse
+import random
+import time
+
+from calc5 import int_div
+from tree import parse, Num, BinOp
+from typecheck import compile_typed
+
+
+def evaluate_dynamic(node):
+    if isinstance(node, Num):
+        return node.value
+    left = evaluate_dynamic(node.left)
+    right = evaluate_dynamic(node.right)
+    if node.op == '+':
+        return left + right
+    elif node.op == '-':
+        return left - right
+    elif node.op == '*':
+        return left * right
+    elif node.op == '/':
+        return left / right
+    elif node.op == 'DIV':
+        return int_div(left, right)
+
+
+def random_expression(rng, depth):
+    """
+    random well-typed expression (no DIV with REAL operands, no
+    division by zero: the right operands of divisions are sums of
+    positive numbers)
+    """
+    if depth == 0:
+        if rng.random() < 0.3:
+            return '{}.{}'.format(rng.randint(1, 99), rng.randint(0, 9)), True
+        return str(rng.randint(1, 99)), False
+    left, left_real = random_expression(rng, depth - 1)
+    right, right_real = random_expression(rng, depth - 1)
+    op = rng.choice(['+', '-', '*', '/', 'DIV'])
+    if op == 'DIV' and (left_real or right_real):
+        op = '*'
+    if op in ('/', 'DIV'):
+        right = '({} + {})'.format(rng.randint(1, 9), rng.randint(1, 9))
+        right_real = False
+    return '({} {} {})'.format(left, op, right), left_real or right_real or op == '/'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--expressions', type=int, default=2000)
+    parser.add_argument('--depth', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    trees = [parse(random_expression(rng, args.depth)[0])
+             for _ in range(args.expressions)]
+    # the literals are passed as arguments, so that CPython cannot fold
+    # the constant expressions at compile time
+    compiled = []
+    for tree in trees:
+        values = []
+
+        def slot(node):
+            values.append(node.value)
+            return 'a{}'.format(len(values) - 1)
+        names = ['a{}'.format(i) for i in range(_count_literals(tree))]
+        compiled.append((compile_typed(tree, slot, names)[0], values))
+    assert all(function(*values) == evaluate_dynamic(tree)
+               for (function, values), tree in zip(compiled, trees))
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for tree in trees:
+            evaluate_dynamic(tree)
+    dynamic = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        for function, values in compiled:
+            function(*values)
+    typed = time.perf_counter() - start
+    evaluations = args.repeat * len(trees)
+    print(f'dynamic: {evaluations / dynamic:12,.0f} evaluations/s')
+    print(f'typed:   {evaluations / typed:12,.0f} evaluations/s '
+          f'({dynamic / typed:.1f}x)')
+
+
+def _count_literals(node):
+    if isinstance(node, BinOp):
+        return _count_literals(node.left) + _count_literals(node.right)
+    return 1
+
+
+if __name__ == '__main__':
+    main()
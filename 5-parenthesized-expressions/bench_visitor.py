@@ -0,0 +1,87 @@
+"""
+Benchmark of the tree-walking evaluation with cached dispatch (see
+visitor.py), against the getattr() dispatch by name, and against the
+calc5 Interpreter (which evaluates while parsing). Reports the node
+visits per second.
+
+Usage:
+    $ python3 bench_visitor.py --depth 14 --repeat 5
+"""
+import argparse
+import random
+import time
+
+from calc5 import Lexer, Interpreter
+from prepared import OPERATIONS
+from tree import parse, BinOp
+from visitor import Evaluator
+
+
+class NaiveEvaluator(object):
+    """
+    the same evaluation, dispatching by name at every node
+    """
+    def visit(self, node):
+        return getattr(self, 'visit_' + type(node).__name__)(node)
+
+    def visit_Num(self, node):
+        return node.value
+
+    def visit_BinOp(self, node):
+        return OPERATIONS[node.op](self.visit(node.left), self.visit(node.right))
+
+
+def random_expression(rng, depth):
+    """
+    random balanced expression with 2 ** depth numbers
+    """
+    if depth == 0:
+        return str(rng.randint(1, 10 ** 6))
+    op = rng.choice(['+', '-', '*', '/'])
+    left = random_expression(rng, depth - 1)
+    right = random_expression(rng, depth - 1)
+    if op == '/':
+        right = '({} + 1)'.format(right.replace('-', '+'))
+    return '({} {} {})'.format(left, op, right)
+
+
+def count_nodes(node):
+    count, stack = 0, [node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        if isinstance(node, BinOp):
+            stack.append(node.left)
+            stack.append(node.right)
+    return count
+
+
+def timed(function, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--depth', type=int, default=14)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    text = random_expression(random.Random(0), args.depth).replace('*', '+')
+    tree = parse(text)
+    nodes = count_nodes(tree)
+    expected, interpreter = timed(lambda: Interpreter(Lexer(text)).expr(), args.repeat)
+    result, naive = timed(lambda: NaiveEvaluator().visit(tree), args.repeat)
+    assert result == expected
+    result, cached = timed(lambda: Evaluator().visit(tree), args.repeat)
+    assert result == expected
+    print(f'{nodes:,} nodes')
+    print(f'getattr dispatch: {nodes / naive:12,.0f} visits/s')
+    print(f'cached dispatch:  {nodes / cached:12,.0f} visits/s ({naive / cached:.2f}x)')
+    print(f'Interpreter:      {nodes / interpreter:12,.0f} nodes/s (parsing included)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""
+Conversions between decimal digit strings and very large integers.
+
+The builtin int(text) and str(number) are quadratic in the number of
+digits, and (since Python 3.11) refuse to convert numbers with more
+than sys.get_int_max_str_digits() digits. The functions in this module
+split the numbers with a divide and conquer strategy, so that the
+builtins only ever see small pieces:
+* str_to_int(): digits -> int, halving the digit string and
+  recombining the halves with (Karatsuba) multiplications by cached
+  powers of ten
+* int_to_str(): int -> digits, halving the binary representation and
+  recombining the halves as decimal.Decimal numbers (libmpdec has fast
+  multiplication, and Decimal -> str is linear)
+* write_int() / write_result(): write a result on a stream in blocks,
+  without building the whole output line in memory a second time
+"""
+import decimal
+
+# numbers with at most this many digits go directly through int()/str().
+# It must stay below the smallest int/str digits limit that can be
+# configured (640)
+LEAF_DIGITS = 600
+# numbers with at most this many bits go directly through str()
+LEAF_BITS = 1900
+# size of the blocks written by write_int()
+WRITE_BLOCK = 1 << 16
+
+# cache of powers of ten used by str_to_int(), keyed by exponent.
+# It is shared by the threads without a lock: a single get or set of a
+# dict is atomic (with or without the GIL), and two threads missing the
+# same power both compute it and store the same value
+_pow10_cache = {}
+
+
+def _pow10(k):
+    """
+    10**k, cached. The exponents used by str_to_int() are all of the
+    form LEAF_DIGITS * 2**j, so each power is computed by squaring
+    the previous one
+    """
+    result = _pow10_cache.get(k)
+    if result is None:
+        if k <= LEAF_DIGITS or k % 2:
+            result = 10 ** k
+        else:
+            half = _pow10(k // 2)
+            result = half * half
+        _pow10_cache[k] = result
+    return result
+
+
+def _leaf_to_int(digits, start, end):
+    """
+    converts the (short) digits slice [start:end) with the builtin int()
+    """
+    return int(digits[start:end])
+
+
+def _str_to_int(digits, start, end):
+    length = end - start
+    if length <= LEAF_DIGITS:
+        return _leaf_to_int(digits, start, end)
+    # the low half has a power-of-two multiple of LEAF_DIGITS digits,
+    # so that the power of ten can be found in the cache
+    low_length = LEAF_DIGITS
+    while 2 * low_length < length:
+        low_length *= 2
+    mid = end - low_length
+    high = _str_to_int(digits, start, mid)
+    low = _str_to_int(digits, mid, end)
+    return high * _pow10(low_length) + low
+
+
+def str_to_int(digits, start=0, end=None):
+    """
+    converts the decimal digits in digits[start:end] (a str, or any
+    bytes-like object accepted by int()) to an integer.
+    Only unsigned numbers are accepted (the lexer reads the digits,
+    signs are operators).
+    """
+    if end is None:
+        end = len(digits)
+    if end - start <= LEAF_DIGITS:
+        return _leaf_to_int(digits, start, end)
+    return _str_to_int(digits, start, end)
+
+
+def _int_to_decimal(number):
+    """
+    converts a non-negative integer to an exact decimal.Decimal,
+    splitting its bits in halves: number = high * 2**w + low
+    """
+    D = decimal.Decimal
+    # cache of the powers of two, as Decimals
+    pow2_cache = {}
+
+    def pow2(w):
+        result = pow2_cache.get(w)
+        if result is None:
+            result = pow2_cache[w] = D(2) ** w
+        return result
+
+    def inner(n, w):
+        if w <= LEAF_BITS:
+            return D(n)
+        w2 = w >> 1
+        high = n >> w2
+        low = n - (high << w2)
+        return inner(high, w - w2) * pow2(w2) + inner(low, w2)
+
+    with decimal.localcontext() as ctx:
+        # exact arithmetic: any rounding would be a bug
+        ctx.prec = decimal.MAX_PREC
+        ctx.Emax = decimal.MAX_EMAX
+        ctx.Emin = decimal.MIN_EMIN
+        ctx.traps[decimal.Inexact] = True
+        return inner(number, number.bit_length())
+
+
+def int_to_str(number):
+    """
+    converts an integer (of any size) to its decimal representation
+    """
+    if -(1 << LEAF_BITS) < number < (1 << LEAF_BITS):
+        return str(number)
+    digits = str(_int_to_decimal(abs(number)))
+    return '-' + digits if number < 0 else digits
+
+
+def write_int(stream, number):
+    """
+    writes the decimal representation of number on a text stream,
+    in blocks of WRITE_BLOCK characters
+    """
+    digits = int_to_str(number)
+    if len(digits) <= WRITE_BLOCK:
+        stream.write(digits)
+        return
+    for start in range(0, len(digits), WRITE_BLOCK):
+        stream.write(digits[start:start + WRITE_BLOCK])
+
+
+def write_result(stream, result):
+    """
+    writes a result of the interpreter (an int or a float) on a text
+    stream, followed by a newline. It replaces print(result), which
+    fails for integers above the str digits limit.
+    """
+    if isinstance(result, int):
+        write_int(stream, result)
+        stream.write('\n')
+    else:
+        stream.write(str(result))
+        stream.write('\n')
@@ -0,0 +1,221 @@
+"""
+Evaluation budgets: limits on the work of a single evaluation.
+
+A Budget can limit:
+* max_operations: the number of arithmetic operations
+* max_bits: the bit length of the integers (literals and intermediate
+  results). A multiplication is refused before it is computed if the
+  bit lengths of its operands add up to more than max_bits + 1 (a
+  product has at least that sum minus one bits): a long '*' chain
+  cannot build a huge integer first and be stopped afterwards
+* max_depth: the nesting depth of the parentheses
+* deadline: the wall-clock time of the evaluation, in seconds (checked
+  at each operation and each parenthesis)
+The limits that are None are not checked. Going over a limit raises
+BudgetExceeded, with the usage counters at that point.
+
+estimate() gives the static cost of an expression before evaluating
+it: the exact numbers of operations and the depth, and an upper bound
+of the bit length of the integers (computed from the bit lengths of
+the literals, without doing the arithmetic). evaluate() can refuse an
+expression on its estimate, before doing any arithmetic.
+
+Usage:
+    budget = Budget(max_operations=10000, max_bits=4096, max_depth=100,
+                    deadline=0.1)
+    evaluate('2 * 3 * (4 + 5)', budget)
+"""
+import time
+
+from calc5 import Lexer, Interpreter, M_SIGN, S_SIGN, int_div
+from events import events, LITERAL, PLACEHOLDER, OPERATOR, ENTER_PAREN, EXIT_PAREN
+
+
+class Budget(object):
+    """
+    limits of an evaluation (None: no limit)
+    """
+    def __init__(self, max_operations=None, max_bits=None, max_depth=None,
+                 deadline=None):
+        self.max_operations = max_operations
+        self.max_bits = max_bits
+        self.max_depth = max_depth
+        self.deadline = deadline
+
+
+class BudgetExceeded(Exception):
+    """
+    raised when an evaluation goes over a limit of its budget. limit is
+    the name of the limit ('operations', 'bits', 'depth' or 'deadline'),
+    and usage the counters of the evaluation
+    """
+    def __init__(self, limit, value, usage):
+        super().__init__('{} budget exceeded ({}): {}'.format(
+            limit, value, ', '.join('{}={}'.format(name, count)
+                                    for name, count in usage.items())))
+        self.limit = limit
+        self.value = value
+        self.usage = usage
+
+
+class Cost(object):
+    """
+    static cost of an expression (see estimate())
+    """
+    def __init__(self, operations, multiplications, depth, max_bits):
+        self.operations = operations
+        self.multiplications = multiplications
+        self.depth = depth
+        # upper bound of the bit length of the integers
+        self.max_bits = max_bits
+
+    def __repr__(self):
+        return 'Cost(operations={}, multiplications={}, depth={}, max_bits={})'.format(
+            self.operations, self.multiplications, self.depth, self.max_bits)
+
+
+def estimate(text):
+    """
+    Cost of the expression, from its parse events (nothing is
+    computed). The bit length bound of a sum is one more than its
+    largest operand, of a product the sum of its operands', of a DIV
+    its left operand's; '/' and the REAL literals give REALs (0 bits),
+    the placeholders are not counted
+    """
+    bits = []
+    operations = multiplications = depth = max_depth = max_bits = 0
+    for kind, value in events(Lexer(text)):
+        if kind == LITERAL:
+            bits.append(value.bit_length() if isinstance(value, int) else 0)
+            max_bits = max(max_bits, bits[-1])
+        elif kind == OPERATOR:
+            operations += 1
+            right = bits.pop()
+            left = bits[-1]
+            if value == '*':
+                multiplications += 1
+                bits[-1] = left + right
+            elif value == '/':
+                bits[-1] = 0
+            elif value in ('+', '-'):
+                bits[-1] = max(left, right) + 1
+            max_bits = max(max_bits, bits[-1])
+        elif kind == PLACEHOLDER:
+            bits.append(0)
+        elif kind == ENTER_PAREN:
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif kind == EXIT_PAREN:
+            depth -= 1
+    return Cost(operations, multiplications, max_depth, max_bits)
+
+
+class BudgetInterpreter(Interpreter):
+    """
+    calc5 Interpreter that counts its work, and stops when it goes over
+    the budget
+    """
+    def __init__(self, lexer, budget):
+        self.budget = budget
+        self.operations = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.max_bits = 0
+        self.start = time.monotonic()
+        super().__init__(lexer)
+
+    def usage(self):
+        return {'operations': self.operations, 'max_bits': self.max_bits,
+                'max_depth': self.max_depth,
+                'elapsed': round(time.monotonic() - self.start, 6)}
+
+    def exceeded(self, limit, value):
+        raise BudgetExceeded(limit, value, self.usage())
+
+    def check_deadline(self):
+        deadline = self.budget.deadline
+        if deadline is not None and time.monotonic() - self.start > deadline:
+            self.exceeded('deadline', deadline)
+
+    def check_bits(self, value):
+        if isinstance(value, int):
+            bits = value.bit_length()
+            if bits > self.max_bits:
+                self.max_bits = bits
+                if self.budget.max_bits is not None and bits > self.budget.max_bits:
+                    self.exceeded('bits', self.budget.max_bits)
+        return value
+
+    def operate(self, op, left, right):
+        """
+        one arithmetic operation, within the budget
+        """
+        self.operations += 1
+        budget = self.budget
+        if budget.max_operations is not None and self.operations > budget.max_operations:
+            self.exceeded('operations', budget.max_operations)
+        self.check_deadline()
+        if op == '*':
+            # cheap bound, checked before the multiplication
+            if (budget.max_bits is not None and isinstance(left, int)
+                    and isinstance(right, int)
+                    and left.bit_length() + right.bit_length() > budget.max_bits + 1):
+                self.exceeded('bits', budget.max_bits)
+            return self.check_bits(left * right)
+        if op == '/':
+            return left / right
+        if op == 'DIV':
+            return int_div(left, right)
+        if op == '+':
+            return self.check_bits(left + right)
+        return self.check_bits(left - right)
+
+    def factor(self):
+        return self.check_bits(super().factor())
+
+    def paren(self):
+        self.depth += 1
+        if self.depth > self.max_depth:
+            self.max_depth = self.depth
+            if self.budget.max_depth is not None and self.depth > self.budget.max_depth:
+                self.exceeded('depth', self.budget.max_depth)
+        self.check_deadline()
+        value = super().paren()
+        self.depth -= 1
+        return value
+
+    def m_expr(self):
+        result = self.p_term()
+        while self.current_token.type == M_SIGN:
+            op = self.current_token.value
+            self.eat(M_SIGN)
+            result = self.operate(op, result, self.p_term())
+        return result
+
+    def expr(self):
+        result = self.m_expr()
+        while self.current_token.type == S_SIGN:
+            op = self.current_token.value
+            self.eat(S_SIGN)
+            result = self.operate(op, result, self.m_expr())
+        return result
+
+
+def evaluate(text, budget, precheck=True):
+    """
+    value of the expression, computed within the budget. With precheck,
+    the expressions whose estimate goes over the operations or depth
+    limits are refused before the evaluation (the bit length estimate
+    is only an upper bound, so the bits are checked during the
+    evaluation)
+    """
+    if precheck and (budget.max_operations is not None or budget.max_depth is not None):
+        cost = estimate(text)
+        usage = {'operations': 0, 'max_bits': 0, 'max_depth': 0, 'elapsed': 0.0,
+                 'estimated_operations': cost.operations,
+                 'estimated_depth': cost.depth}
+        if budget.max_operations is not None and cost.operations > budget.max_operations:
+            raise BudgetExceeded('operations', budget.max_operations, usage)
+        if budget.max_depth is not None and cost.depth > budget.max_depth:
+            raise BudgetExceeded('depth', budget.max_depth, usage)
+    return BudgetInterpreter(Lexer(text), budget).expr()
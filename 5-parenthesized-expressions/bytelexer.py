@@ -0,0 +1,123 @@
+"""
+Lexer for binary input (bytes, bytearray, memoryview, mmap).
+
+ByteLexer produces the same tokens as calc5.Lexer, without decoding
+the input to a str first: the buffer is wrapped in a memoryview (no
+copy), every byte is classified with a precomputed 256-entry table,
+and integer literals are converted directly from memoryview slices of
+the buffer (no intermediate digit string is created).
+
+Usage:
+    with open('exprs.bin', 'rb') as f, mmap.mmap(f.fileno(), 0,
+                                                 access=mmap.ACCESS_READ) as m:
+        result = Interpreter(ByteLexer(m)).expr()
+"""
+from array import array
+
+from calc5 import Lexer, INTEGER, REAL, S_SIGN, M_SIGN, PAR, ID, EOF
+from bigint import str_to_int
+
+# classes of bytes
+OTHER, SPACE, DIGIT, SUM, MUL, PAREN, ALPHA = range(7)
+
+
+def _classify(byte):
+    char = chr(byte)
+    # only ASCII is accepted. The whitespace class matches str.isspace()
+    # on the same characters, so that the tokens are the same as with
+    # the decode-then-lex path
+    if byte >= 128:
+        return OTHER
+    if char.isspace():
+        return SPACE
+    if char.isdigit():
+        return DIGIT
+    if char in Lexer.summation_signs:
+        return SUM
+    if char in Lexer.multiplication_signs:
+        return MUL
+    if char in Lexer.parentheses_simbols:
+        return PAREN
+    if char.isalpha() or char == '_':
+        return ALPHA
+    return OTHER
+
+# class of each byte value
+CHAR_CLASS = bytes(_classify(byte) for byte in range(256))
+# token value (a one character str) of the symbols, by byte value
+SYMBOL = [chr(byte) if CHAR_CLASS[byte] in (SUM, MUL, PAREN) else None
+          for byte in range(256)]
+# token type of the symbols, by class
+SYMBOL_TYPE = {SUM: S_SIGN, MUL: M_SIGN, PAREN: PAR}
+DOT = ord('.')
+
+
+class ByteLexer(Lexer):
+    """
+    calc5 Lexer reading a bytes-like object. It can be passed to the
+    calc5 Interpreter like a Lexer.
+    """
+    def __init__(self, data):
+        # zero-copy view over the input, one unsigned byte per item
+        self.data = memoryview(data).cast('B')
+        self.end = len(self.data)
+        self.pos = 0
+        # the source, for the error messages
+        self.text = self.data
+        # spans of the tokens (see calc5.Lexer)
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def parse_integer(self, start, end):
+        """
+        value of the digits in data[start:end]
+        """
+        # slicing a memoryview does not copy, and int() reads the
+        # digits straight from the buffer
+        return str_to_int(self.data, start, end)
+
+    def get_next_token(self):
+        data, end, classes = self.data, self.end, CHAR_CLASS
+        pos = self.pos
+        while pos < end:
+            char_class = classes[data[pos]]
+            # skip whitespaces
+            if char_class == SPACE:
+                pos += 1
+                continue
+            # read all digits and return an integer, or a real if the
+            # digits are followed by a dot and more digits
+            if char_class == DIGIT:
+                start = pos
+                pos += 1
+                while pos < end and classes[data[pos]] == DIGIT:
+                    pos += 1
+                if (pos + 1 < end and data[pos] == DOT
+                        and classes[data[pos + 1]] == DIGIT):
+                    pos += 2
+                    while pos < end and classes[data[pos]] == DIGIT:
+                        pos += 1
+                    self.pos = pos
+                    return self.make_token(REAL, float(data[start:pos]), start)
+                self.pos = pos
+                return self.make_token(INTEGER, self.parse_integer(start, pos), start)
+            # identifiers: letters, digits and '_'
+            if char_class == ALPHA:
+                start = pos
+                pos += 1
+                while pos < end and classes[data[pos]] in (ALPHA, DIGIT):
+                    pos += 1
+                self.pos = pos
+                name = bytes(data[start:pos]).decode('ascii')
+                if name.upper() in self.multiplication_keywords:
+                    return self.make_token(M_SIGN, name.upper(), start)
+                return self.make_token(ID, name, start)
+            # signs and parentheses are one byte long
+            if char_class != OTHER:
+                self.pos = pos + 1
+                return self.make_token(SYMBOL_TYPE[char_class], SYMBOL[data[pos]], pos)
+            # lexing error if no known token was found
+            self.pos = pos
+            self.error()
+        self.pos = pos
+        return self.make_token(EOF, None, pos)
@@ -3,16 +3,30 @@ Interpreter for arithmetic expressions. (i.e. calculator)
 This version can handle arithmetic expressions, with parentheses,
 from grammar:
 expr    : m_expr ((+|-) m_expr)*
-m_expr  : p_term ((*|/) p_term)*
+m_expr  : p_term ((*|/|DIV) p_term)*
 p_term  : paren | factor
 paren   : LEFTPAR expr RIGHTPAR
-factor: INTEGER
+factor  : INTEGER | REAL | ID
+Like in Pascal, '/' is the real division, and DIV the integer division
+(truncated towards zero, only between INTEGERs). A REAL is written with
+digits on both sides of the dot (e.g. 3.14).
+An ID is a named placeholder (see prepared.py): the Interpreter cannot
+evaluate expressions that contain them.
 """
 
 # Types of tokens:
-# numbers, summation signs (+,-), multiplication signs (*,/),
-# parentheses ( ), EOF
+# numbers (integer and real), summation signs (+,-), multiplication
+# signs (*,/,DIV), parentheses ( ), identifiers, EOF
 INTEGER, S_SIGN, M_SIGN, EOF, PAR = 'INTEGER', '+|-', '*|/', 'EOF', '(|)'
+REAL, ID = 'REAL', 'ID'
+
+import argparse
+import re
+import sys
+from array import array
+from bisect import bisect_right
+# conversions for very large integers (literals and results)
+from bigint import str_to_int, int_to_str, write_result
 
 """
 class representing a token.
@@ -60,6 +74,81 @@ class Token(object):
     def __repr__(self):
         return self.__str__()
 
+"""
+Pascal DIV: integer division, truncated towards zero (Python's //
+rounds towards minus infinity). Both operands must be integers.
+trunc_div does not check them (for the callers that know their types).
+"""
+def trunc_div(a, b):
+    quotient = a // b
+    if quotient < 0 and quotient * b != a:
+        quotient += 1
+    return quotient
+
+def int_div(a, b):
+    if not (isinstance(a, int) and isinstance(b, int)):
+        raise TypeError("DIV needs INTEGER operands")
+    return trunc_div(a, b)
+
+"""
+Index of the offsets where the lines of a text start. It maps an offset
+of the text to a (line, column) pair (both starting from 1) with a
+binary search. The text can be a str or a bytes-like object.
+"""
+class LineIndex(object):
+    def __init__(self, text):
+        newline = '\n' if isinstance(text, str) else b'\n'
+        self.text = text
+        self.starts = array('q', [0])
+        self.starts.extend(match.end() for match in re.finditer(newline, text))
+    # (line, column) of the character at offset
+    def position(self, offset):
+        line = bisect_right(self.starts, offset) - 1
+        return line + 1, offset - self.starts[line] + 1
+    # text of a line (without the newline), as a str
+    def line_text(self, line):
+        start = self.starts[line - 1]
+        end = self.starts[line] - 1 if line < len(self.starts) else len(self.text)
+        text = self.text[start:end]
+        if not isinstance(text, str):
+            text = bytes(text).decode('ascii', 'replace')
+        return text.rstrip('\r')
+
+"""
+Error at an offset of the source text. Only the offset is stored when
+the error is raised: the line, column and context are computed when
+the error is reported (i.e. converted to str).
+"""
+class SourceError(Exception):
+    def __init__(self, message, text=None, offset=None):
+        super().__init__(message)
+        self.message = message
+        self.text = text
+        self.offset = offset
+    # (line, column) of the error, or None if the offset is unknown
+    def position(self):
+        if self.text is None or self.offset is None:
+            return None
+        return LineIndex(self.text).position(self.offset)
+    def __str__(self):
+        if self.text is None or self.offset is None:
+            return self.message
+        index = LineIndex(self.text)
+        line, column = index.position(self.offset)
+        context = index.line_text(line)
+        # show at most 30 characters around the error
+        start = max(column - 31, 0)
+        return '{} at line {}, column {}:\n{}\n{}^'.format(
+            self.message, line, column,
+            context[start:column + 30], ' ' * (column - 1 - start))
+
+# errors of the lexer (invalid characters) and of the parser (invalid syntax)
+class LexingError(SourceError):
+    pass
+
+class ParsingError(SourceError):
+    pass
+
 """
 Lexer (or scanner), class that reads the input, and is able to
 recognize and parse and get tokens, ignoring whitespaces.
@@ -68,13 +157,28 @@ class Lexer(object):
     summation_signs = ['+','-']
     multiplication_signs = ['*','/']
     parentheses_simbols = ['(',')']
+    # reserved words (case insensitive) that are multiplication signs
+    multiplication_keywords = ['DIV']
     def __init__(self, text):
         # client string input
         self.text = text
         self.pos = 0
         self.current_char = self.text[self.pos]
+        # spans of the tokens, as parallel arrays of offsets: the i-th
+        # token returned by get_next_token() is text[starts[i]:ends[i]]
+        self.starts = array('q')
+        self.ends = array('q')
     def error(self):
-        raise Exception("Invalid character")
+        raise LexingError("Invalid character", self.text, self.pos)
+    # creates a token, and records its span (from start to the current
+    # position) in the offsets arrays
+    def make_token(self, type, value, start):
+        self.starts.append(start)
+        self.ends.append(self.pos)
+        return Token(type, value)
+    # span (start, end) of the i-th token
+    def span(self, i):
+        return self.starts[i], self.ends[i]
     def advance(self):
         self.pos += 1
         if self.pos > len(self.text) - 1:
@@ -85,13 +189,35 @@ class Lexer(object):
     def skip_whitespace(self):
         while self.current_char is not None and self.current_char.isspace():
             self.advance()
-    # parse all consecutive digits until a non-digit is found
+    # parse all consecutive digits until a non-digit is found.
+    # The digits are sliced out of the text in one go (instead of
+    # being concatenated one by one), and converted with str_to_int,
+    # which handles numbers of any length
     def parse_integer(self):
-        result = ''
+        start = self.pos
         while self.current_char is not None and self.current_char.isdigit():
-            result += self.current_char
             self.advance()
-        return int(result)
+        return str_to_int(self.text, start, self.pos)
+    # parse a number: either an INTEGER (digits) or a REAL (digits, a
+    # dot and more digits). Returns the token type and the value
+    def parse_number(self):
+        start = self.pos
+        value = self.parse_integer()
+        if (self.current_char == '.' and self.pos + 1 < len(self.text)
+                and self.text[self.pos + 1].isdigit()):
+            self.advance()
+            while self.current_char is not None and self.current_char.isdigit():
+                self.advance()
+            return REAL, float(self.text[start:self.pos])
+        return INTEGER, value
+    # parse an identifier (a letter or '_', followed by letters, digits
+    # or '_') and return its name
+    def parse_identifier(self):
+        start = self.pos
+        while self.current_char is not None and (
+                self.current_char.isalnum() or self.current_char == '_'):
+            self.advance()
+        return self.text[start:self.pos]
     # parse the current sign and return it
     def parse_sign(self):
         sign = self.current_char
@@ -115,22 +241,30 @@ class Lexer(object):
             if self.current_char.isspace():
                 self.skip_whitespace()
                 continue
-            # if it finds a digit, read all digits and store an integer
+            # offset of the first character of the token
+            start = self.pos
+            # if it finds a digit, read the whole number
             if self.current_char.isdigit():
-                return Token(INTEGER, self.parse_integer())
+                return self.make_token(*self.parse_number(), start)
             # sum or difference
             if self.current_char in self.summation_signs:
-                return Token(S_SIGN, self.parse_sign())
+                return self.make_token(S_SIGN, self.parse_sign(), start)
             # multiplication or division
             if self.current_char in self.multiplication_signs:
-                return Token(M_SIGN, self.parse_sign())
+                return self.make_token(M_SIGN, self.parse_sign(), start)
             # parentheses symbols
             if self.current_char in self.parentheses_simbols:
-                return Token(PAR, self.parse_parenthesis())
+                return self.make_token(PAR, self.parse_parenthesis(), start)
+            # reserved words, and identifiers (placeholders)
+            if self.current_char.isalpha() or self.current_char == '_':
+                name = self.parse_identifier()
+                if name.upper() in self.multiplication_keywords:
+                    return self.make_token(M_SIGN, name.upper(), start)
+                return self.make_token(ID, name, start)
             # parsing error if no known token was found
             self.error()
         # end of file reached if current_char is None
-        return Token(EOF, None)
+        return self.make_token(EOF, None, self.pos)
 # END LEXER
 
 """
@@ -143,9 +277,13 @@ class Interpreter(object):
         self.lexer = lexer
         # initialize token to first token
         self.current_token = self.lexer.get_next_token()
-    # Syntax error - error in the interpretation
-    def error(self):
-        raise Exception("Invalid syntax")
+    # Syntax error - error in the interpretation. The error is located
+    # at the current token, which is the last one read from the lexer
+    # (lexers that do not record the spans give no position)
+    def error(self, message="Invalid syntax"):
+        starts = getattr(self.lexer, 'starts', None)
+        offset = starts[-1] if starts else None
+        raise ParsingError(message, getattr(self.lexer, 'text', None), offset)
     # check for validity of token (optionally checks for a custom
     # range of values), and if the test passes, get next token
     def eat(self, token_type, token_values=[]):
@@ -158,12 +296,17 @@ class Interpreter(object):
             self.error()
     """
     method referring to 'factor' term in grammar (see at the beginning)
-    factor : INTEGER
-    OUTPUT: an INTEGER token
+    factor : INTEGER | REAL | ID
+    OUTPUT: the value of the number token (placeholders have no value)
     """
     def factor(self):
         token = self.current_token
-        self.eat(INTEGER)
+        if token.type == ID:
+            self.error("Placeholder '{}' has no value".format(token.value))
+        if token.type == REAL:
+            self.eat(REAL)
+        else:
+            self.eat(INTEGER)
         return token.value
     """
     method referring to 'paren' term in grammar
@@ -192,17 +335,17 @@ class Interpreter(object):
     """
     def p_term(self):
         # either return the number (if this element is an integer)
-        if self.current_token.type == INTEGER:
+        if self.current_token.type in (INTEGER, REAL, ID):
             return self.factor()
         # or return the expression between the parentheses (if
         # the current_char is an open parenthesis)
         elif self.current_token.type == PAR:
             return self.paren()
         else:
-            raise Exception("Expecting either a number or an open parenthesis")
+            self.error("Expecting either a number or an open parenthesis")
     """
     method referring to 'm_expr' in the grammar (multiplication expression)
-    m_expr  : p_term ((*|/) p_term)*
+    m_expr  : p_term ((*|/|DIV) p_term)*
     OUTPUT: a number with the result of the chain of multiplications/divisions
     """
     def m_expr(self):
@@ -216,6 +359,8 @@ class Interpreter(object):
                 result = result * self.p_term()
             elif token.value == '/':
                 result = result / self.p_term()
+            elif token.value == 'DIV':
+                result = int_div(result, self.p_term())
         # returns the result of the expression
         return result
     """
@@ -246,8 +391,124 @@ class Interpreter(object):
         return result
 # END INTERPRETER
 
+# size of the blocks read from stdin in pipe mode
+BLOCK_SIZE = 1 << 16
+# number of results buffered before writing them out in pipe mode
+WRITE_BATCH = 1024
+
+# reads the lines of a binary stream (as bytes, without the newlines),
+# in blocks of block_size bytes
+def read_lines(stream, block_size=BLOCK_SIZE):
+    # pieces of the current line, read in the previous blocks
+    pending = []
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = block.split(b'\n')
+        if len(lines) == 1:
+            pending.append(block)
+            continue
+        pending.append(lines[0])
+        yield b''.join(pending)
+        for line in lines[1:-1]:
+            yield line
+        pending = [lines[-1]]
+    last = b''.join(pending)
+    if last:
+        yield last
+
+# parses and interprets one expression
+def evaluate(text):
+    return Interpreter(Lexer(text)).expr()
+
+# non-interactive mode, used when stdin is not a terminal (e.g.
+# 'cat exprs.txt | python3 calc5.py'): no prompts, stdin is read in large
+# blocks, and the results are written out in batches.
+# Each result is written with args.format. args.on_error decides what
+# to do with an invalid expression: 'abort' (stop with the error),
+# 'skip' (write nothing) or 'report' (write args.error_format).
+# evaluate is the function used to evaluate each line
+def run_pipe(args, stdin, stdout, evaluate=evaluate):
+    pending = []
+    for number, line in enumerate(read_lines(stdin), 1):
+        # empty lines are ignored, like in the interactive mode
+        if not line:
+            continue
+        try:
+            # (a line that is not UTF-8 is an invalid expression too)
+            text = line.decode()
+            result = evaluate(text)
+        except Exception as error:
+            if args.on_error == 'abort':
+                stdout.write(''.join(pending))
+                stdout.flush()
+                sys.stderr.write('line {}: {}\n'.format(number, error))
+                return 1
+            if args.on_error == 'report':
+                # one output line per input line: only the first line
+                # of the error message is kept
+                message = str(error).split('\n')[0]
+                pending.append(args.error_format.format(
+                    line=number, expr=line.decode(errors='replace'),
+                    error=message) + '\n')
+            continue
+        pending.append(args.format.format(
+            line=number, expr=text, result=int_to_str(result) if isinstance(result, int) else str(result)) + '\n')
+        if len(pending) >= WRITE_BATCH:
+            stdout.write(''.join(pending))
+            pending = []
+    stdout.write(''.join(pending))
+    stdout.flush()
+    return 0
+
+# options of the non-interactive (pipe) mode
+def add_pipe_arguments(parser):
+    parser.add_argument('--interactive', action='store_true',
+                        help="show the 'calc> ' prompt even if stdin "
+                             "is not a terminal")
+    parser.add_argument('--format', default='{result}',
+                        help="format of each output line, with the fields "
+                             "{line} (line number), {expr} and {result}")
+    parser.add_argument('--on-error', choices=['abort', 'skip', 'report'],
+                        default='abort',
+                        help="what to do with invalid expressions in pipe "
+                             "mode (default: abort)")
+    parser.add_argument('--error-format', default='error: {error}',
+                        help="output line for invalid expressions, with "
+                             "--on-error=report (fields {line}, {expr}, {error})")
+
+# command line options of the 'calc> ' interpreter
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="calculator for arithmetic expressions with parentheses")
+    parser.add_argument('--memprofile', action='store_true',
+                        help="report the memory allocated by lexing, parsing "
+                             "and evaluation of each expression (on stderr)")
+    parser.add_argument('--memo', type=int, metavar='ENTRIES', default=0,
+                        help="in pipe mode, remember the values of up to "
+                             "ENTRIES parenthesized subexpressions across "
+                             "the lines (see memo.py), and report the hit "
+                             "rate on stderr")
+    add_pipe_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.memo < 0:
+        parser.error('--memo: the number of entries cannot be negative')
+    return args
+
 # main loop function
-def main():
+def main(argv=None):
+    args = parse_args(argv)
+    # (the memory profile is only available in the interactive loop)
+    if not args.interactive and not args.memprofile and not sys.stdin.isatty():
+        if not args.memo:
+            return run_pipe(args, sys.stdin.buffer, sys.stdout)
+        import memo
+        table = memo.ParenMemo(max_entries=args.memo)
+        status = run_pipe(args, sys.stdin.buffer, sys.stdout,
+                          lambda text: memo.evaluate(text, table))
+        sys.stderr.write(table.format_report() + '\n')
+        return status
     while True:
         try:
             # waits for an input text from the client
@@ -258,6 +519,14 @@ def main():
         # and wait for an input text
         if not text:
             continue
+        # with --memprofile the expression is run under tracemalloc
+        # (see memprofile.py), and the report goes to stderr
+        if args.memprofile:
+            from memprofile import profile_memory
+            report = profile_memory(text)
+            write_result(sys.stdout, report.result)
+            sys.stderr.write(report.format() + '\n')
+            continue
         # Constructs and Lexer object
         # The Lexer reads and store the written text
         lexer = Lexer(text)
@@ -268,8 +537,9 @@ def main():
         interpreter = Interpreter(lexer)
         # parse and interpret the expression
         result = interpreter.expr()
-        # give the result (if any)
-        print(result)
+        # give the result (if any). write_result streams very
+        # large integers, that print() could not convert
+        write_result(sys.stdout, result)
 
 if __name__ == '__main__':
     """
@@ -278,4 +548,4 @@ if __name__ == '__main__':
     just a module containing the class definition for the
     calculator Interpreter
     """
-    main()
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+Streaming (event based) parser for the calc5 grammar.
+
+events() is a generator: it pulls the tokens from a lexer one at a
+time, and yields parse events, as (kind, value) pairs:
+* ('enter_paren', None) and ('exit_paren', None) around the contents of
+  each pair of parentheses
+* ('literal', number) for an INTEGER or a REAL
+* ('placeholder', name) for an ID
+* ('operator', op) after the two operands of the operation (postfix
+  order: '1 + 2 * 3' gives 1, 2, 3, '*', '+')
+The parser is not recursive: it keeps a stack with the pending
+operators of each open parenthesis, so its memory is proportional to
+the nesting depth, not to the length of the input (the lexer only
+keeps the span of the last token). The events of a valid prefix of the
+input are yielded before a syntax error is raised.
+
+The consumers of the events (evaluate(), statistics()) are streaming
+too: thanks to the postfix order, evaluate() only needs a stack of
+values, whose size is also proportional to the depth.
+
+Usage:
+    evaluate(events(Lexer('3 * (1 + 2)')))             # 9
+    statistics(events(ByteLexer(mapped_file)))
+"""
+from calc5 import (ParsingError, INTEGER, REAL, ID, S_SIGN, M_SIGN, PAR, EOF,
+                   int_div)
+
+ENTER_PAREN, EXIT_PAREN = 'enter_paren', 'exit_paren'
+LITERAL, PLACEHOLDER, OPERATOR = 'literal', 'placeholder', 'operator'
+
+
+def _error(lexer, message="Invalid syntax"):
+    starts = getattr(lexer, 'starts', None)
+    offset = starts[-1] if starts else None
+    return ParsingError(message, getattr(lexer, 'text', None), offset)
+
+
+def events(lexer):
+    """
+    generator of the parse events of the text of the lexer (a calc5
+    Lexer, or one of its variants)
+    """
+    starts = getattr(lexer, 'starts', None)
+    ends = getattr(lexer, 'ends', None)
+
+    def next_token():
+        token = lexer.get_next_token()
+        # only the span of the current token is kept (for the errors)
+        if starts is not None and len(starts) > 1:
+            del starts[:-1], ends[:-1]
+        return token
+
+    token = next_token()
+    # pending [sum operator, multiplication operator] of each level
+    # (the top level, and each open parenthesis)
+    levels = [[None, None]]
+    while True:
+        # operand (p_term): a parenthesis opens a level, and another
+        # operand is expected
+        type = token.type
+        if type == PAR and token.value == '(':
+            yield ENTER_PAREN, None
+            levels.append([None, None])
+            token = next_token()
+            continue
+        if type == INTEGER or type == REAL:
+            yield LITERAL, token.value
+        elif type == ID:
+            yield PLACEHOLDER, token.value
+        else:
+            raise _error(lexer, "Expecting either a number or an open parenthesis")
+        token = next_token()
+        # after an operand: end of the operations that it closes
+        while True:
+            level = levels[-1]
+            if level[1] is not None:
+                yield OPERATOR, level[1]
+                level[1] = None
+            if token.type == M_SIGN:
+                level[1] = token.value
+                break
+            if level[0] is not None:
+                yield OPERATOR, level[0]
+                level[0] = None
+            if token.type == S_SIGN:
+                level[0] = token.value
+                break
+            # end of an expr: of a parenthesis, or of the whole text
+            if len(levels) == 1:
+                if token.type != EOF:
+                    raise _error(lexer)
+                return
+            if token.type != PAR or token.value != ')':
+                raise _error(lexer)
+            levels.pop()
+            yield EXIT_PAREN, None
+            token = next_token()
+        token = next_token()
+
+
+def evaluate(stream, params=None):
+    """
+    value of the expression of the events (with the placeholders
+    replaced by their values in params), computed like the calc5
+    Interpreter does
+    """
+    stack = []
+    push, pop = stack.append, stack.pop
+    for kind, value in stream:
+        if kind == LITERAL:
+            push(value)
+        elif kind == OPERATOR:
+            right = pop()
+            if value == '+':
+                stack[-1] = stack[-1] + right
+            elif value == '-':
+                stack[-1] = stack[-1] - right
+            elif value == '*':
+                stack[-1] = stack[-1] * right
+            elif value == '/':
+                stack[-1] = stack[-1] / right
+            else:
+                stack[-1] = int_div(stack[-1], right)
+        elif kind == PLACEHOLDER:
+            if params is None or value not in params:
+                raise TypeError('missing value for: ' + value)
+            push(params[value])
+    return stack[-1]
+
+
+def statistics(stream):
+    """
+    counts of the events and of the operators, and the maximum depth of
+    the parentheses
+    """
+    counts = {ENTER_PAREN: 0, EXIT_PAREN: 0, LITERAL: 0, PLACEHOLDER: 0,
+              OPERATOR: 0}
+    operators = {}
+    depth = max_depth = 0
+    for kind, value in stream:
+        counts[kind] += 1
+        if kind == OPERATOR:
+            operators[value] = operators.get(value, 0) + 1
+        elif kind == ENTER_PAREN:
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif kind == EXIT_PAREN:
+            depth -= 1
+    return {'events': counts, 'operators': operators, 'max_depth': max_depth}
@@ -0,0 +1,366 @@
+"""
+Table-driven LL(1) parser, generated from the grammar written in a
+module docstring (by default, the one of calc5).
+
+The grammar lines have the form 'name : definition', where the
+definition uses '|' between the alternatives, '( ... )' to group and
+')*' to repeat a group. The names defined by a line are the
+nonterminals, the other words are terminals:
+* INTEGER, REAL and ID match the tokens of that type, and give their
+  value to the semantic actions (they are the operands)
+* LEFTPAR and RIGHTPAR match the parentheses, and any other terminal
+  ('+', '*', 'DIV', ...) the token with that value
+Grammar generates the equivalent BNF grammar (a new nonterminal for
+each group and repetition), its FIRST and FOLLOW sets and the LL(1)
+parse table, and checks that there are no conflicts. The symbols of
+the productions and the tokens are integer codes, and the productions
+are stored reversed, ready to be pushed on the stack of the engine.
+
+The semantic actions are postfix: the operands are given to leaf()
+when they are matched, and in a repetition that starts with a terminal,
+like ((+|-) m_expr)*, that terminal is an operator, applied with
+apply(operator, left, right) to the two values on top of the stack
+after the rest of the repetition is parsed (so the operators are left
+associative, like in the Interpreter). A grammar extension that fits
+this scheme (e.g. a new level of operators) only needs a new docstring.
+
+Unlike calc5.evaluate(), the whole text must be an expression (the
+engine stops at EOF, like tree.parse()).
+
+Usage:
+    evaluate('3 * (1 + 2)')                 # 9
+    grammar = Grammar(calc5.__doc__)
+    grammar.run(Lexer(text), leaf, apply)
+"""
+import re
+
+import calc5
+from calc5 import Lexer, ParsingError, INTEGER, REAL, ID, EOF
+from prepared import OPERATIONS
+from tree import Num, Var, BinOp
+
+# terminals that match the tokens of a type (and carry their value)
+TYPE_TERMINALS = {INTEGER: INTEGER, REAL: REAL, ID: ID}
+# terminals that stand for a symbol
+ALIASES = {'LEFTPAR': '(', 'RIGHTPAR': ')'}
+END = '$'
+# codes of the apply() action, and of the terminals whose token is
+# kept for it (the terminal code t is encoded as DEFERRED - t)
+APPLY = -1
+DEFERRED = -2
+
+_RULE = re.compile(r'^(\w+)\s*:\s*(.+)$', re.MULTILINE)
+_SYMBOL = re.compile(r'\)\*|[()|]|[^\s()|]+')
+
+
+class GrammarError(Exception):
+    pass
+
+
+class Grammar(object):
+    """
+    LL(1) parse table of the grammar in text, and the engine that
+    runs it
+    """
+    def __init__(self, text):
+        rules = [(name, _SYMBOL.findall(definition))
+                 for name, definition in _RULE.findall(text)]
+        if not rules:
+            raise GrammarError('no grammar rules found')
+        self.start = rules[0][0]
+        # name -> list of productions (lists of symbols: names,
+        # ('defer', terminal), or APPLY)
+        self.rules = {}
+        defined = {name for name, _ in rules}
+        for name, symbols in rules:
+            if name in self.rules:
+                raise GrammarError('{} is defined twice'.format(name))
+            self.rules[name] = []
+            alternatives = self._read(symbols, name)
+            self.rules[name] = [self._sequence(items, name, defined)
+                                for items in alternatives]
+        self._number_symbols()
+        self._first_sets()
+        self._follow_sets()
+        self._build_table()
+
+    # parsing of the definitions (EBNF): a definition is a list of
+    # alternatives, an alternative a list of items, an item a name,
+    # ('group', alternatives) or ('repeat', alternatives)
+    def _read(self, symbols, name):
+        position = 0
+
+        def alternatives():
+            nonlocal position
+            result = [sequence()]
+            while position < len(symbols) and symbols[position] == '|':
+                position += 1
+                result.append(sequence())
+            return result
+
+        def sequence():
+            nonlocal position
+            items = []
+            while position < len(symbols) and symbols[position] not in ('|', ')', ')*'):
+                symbol = symbols[position]
+                position += 1
+                if symbol != '(':
+                    items.append(symbol)
+                    continue
+                inner = alternatives()
+                if position == len(symbols):
+                    raise GrammarError('unclosed group in {}'.format(name))
+                kind = 'repeat' if symbols[position] == ')*' else 'group'
+                position += 1
+                items.append((kind, inner))
+            return items
+
+        result = alternatives()
+        if position != len(symbols):
+            raise GrammarError('unexpected {!r} in {}'.format(symbols[position], name))
+        return result
+
+    def _new_rule(self, owner, productions):
+        name = '{}_{}'.format(owner, len(self.rules))
+        self.rules[name] = productions
+        return name
+
+    def _sequence(self, items, owner, defined):
+        """
+        BNF symbols of a list of items (new rules for the groups and
+        repetitions)
+        """
+        symbols = []
+        for item in items:
+            if isinstance(item, str):
+                symbols.append(item)
+            elif item[0] == 'group':
+                rule = self._new_rule(owner, [])
+                self.rules[rule] = [self._sequence(alternative, owner, defined)
+                                    for alternative in item[1]]
+                symbols.append(rule)
+            else:
+                rule = self._new_rule(owner, [])
+                productions = []
+                for alternative in item[1]:
+                    operators = self._operators(alternative, defined)
+                    if operators is None:
+                        productions.append(
+                            self._sequence(alternative, owner, defined) + [rule])
+                        continue
+                    # one production per operator: the operator token is
+                    # kept, and applied after the right operand
+                    rest = self._sequence(alternative[1:], owner, defined)
+                    for operator in operators:
+                        productions.append([('defer', operator)] + rest + [APPLY, rule])
+                productions.append([])
+                self.rules[rule] = productions
+                symbols.append(rule)
+        return symbols
+
+    @staticmethod
+    def _operators(items, defined):
+        """
+        the terminals that start the repeated items, if they are an
+        operator followed by an operand (None otherwise)
+        """
+        if len(items) < 2:
+            return None
+        first = items[0]
+        if isinstance(first, str):
+            return None if first in defined else [first]
+        if first[0] == 'group' and all(
+                len(alternative) == 1 and isinstance(alternative[0], str)
+                and alternative[0] not in defined for alternative in first[1]):
+            return [alternative[0] for alternative in first[1]]
+        return None
+
+    def _number_symbols(self):
+        terminals = [END]
+        for productions in self.rules.values():
+            for production in productions:
+                for symbol in production:
+                    if isinstance(symbol, tuple):
+                        symbol = symbol[1]
+                    if symbol != APPLY and symbol not in self.rules and symbol not in terminals:
+                        terminals.append(symbol)
+        self.terminals = terminals
+        self.nonterminals = list(self.rules)
+        self.codes = {symbol: code for code, symbol in enumerate(terminals + self.nonterminals)}
+        self.first_nonterminal = len(terminals)
+        # token -> terminal code: by type for the operands and EOF, by
+        # value for the symbols
+        self.type_codes = {EOF: self.codes[END]}
+        self.value_codes = {}
+        for terminal in terminals[1:]:
+            if terminal in TYPE_TERMINALS:
+                self.type_codes[TYPE_TERMINALS[terminal]] = self.codes[terminal]
+            else:
+                self.value_codes[ALIASES.get(terminal, terminal)] = self.codes[terminal]
+        self.operands = [terminal in TYPE_TERMINALS for terminal in terminals]
+
+    def _first(self, symbols):
+        """
+        FIRST set of a sequence of symbols (with None for the empty
+        sequence)
+        """
+        result = set()
+        for symbol in symbols:
+            if symbol == APPLY:
+                continue
+            if isinstance(symbol, tuple):
+                symbol = symbol[1]
+            if symbol not in self.rules:
+                result.add(symbol)
+                return result
+            result |= self.first[symbol] - {None}
+            if None not in self.first[symbol]:
+                return result
+        result.add(None)
+        return result
+
+    def _first_sets(self):
+        self.first = {name: set() for name in self.rules}
+        changed = True
+        while changed:
+            changed = False
+            for name, productions in self.rules.items():
+                for production in productions:
+                    first = self._first(production)
+                    if not first <= self.first[name]:
+                        self.first[name] |= first
+                        changed = True
+
+    def _follow_sets(self):
+        self.follow = {name: set() for name in self.rules}
+        self.follow[self.start].add(END)
+        changed = True
+        while changed:
+            changed = False
+            for name, productions in self.rules.items():
+                for production in productions:
+                    for i, symbol in enumerate(production):
+                        if not isinstance(symbol, str) or symbol not in self.rules:
+                            continue
+                        follow = self._first(production[i + 1:])
+                        if None in follow:
+                            follow = (follow - {None}) | self.follow[name]
+                        if not follow <= self.follow[symbol]:
+                            self.follow[symbol] |= follow
+                            changed = True
+
+    def _encode(self, symbol):
+        if symbol == APPLY:
+            return APPLY
+        if isinstance(symbol, tuple):
+            return DEFERRED - self.codes[symbol[1]]
+        return self.codes[symbol]
+
+    def _build_table(self):
+        """
+        table[nonterminal code - first_nonterminal][terminal code]: the
+        reversed production to push, or None
+        """
+        self.table = []
+        for name in self.nonterminals:
+            row = [None] * len(self.terminals)
+            for production in self.rules[name]:
+                first = self._first(production)
+                if None in first:
+                    first = (first - {None}) | self.follow[name]
+                encoded = tuple(self._encode(symbol) for symbol in reversed(production))
+                for terminal in first:
+                    code = self.codes[terminal]
+                    if row[code] is not None and row[code] != encoded:
+                        raise GrammarError('LL(1) conflict in {} on {}'.format(name, terminal))
+                    row[code] = encoded
+            self.table.append(row)
+
+    def name(self, terminal):
+        name = self.terminals[terminal]
+        return 'EOF' if name == END else ALIASES.get(name, name)
+
+    def expected(self, row):
+        return ', '.join(self.name(code) for code, entry in enumerate(row)
+                         if entry is not None)
+
+    def run(self, lexer, leaf, apply):
+        """
+        parses the tokens of lexer (until EOF). Calls leaf(terminal,
+        value, lexer) for each operand (the lexer is on its token), and
+        apply(operator, left, right) for each operation, and returns the
+        value left on the stack
+        """
+        table = self.table
+        type_codes = self.type_codes
+        value_codes = self.value_codes
+        operands = self.operands
+        first_nonterminal = self.first_nonterminal
+        end = self.codes[END]
+        values = []
+        pending = []
+        stack = [end, self.codes[self.start]]
+        token = lexer.get_next_token()
+        code = type_codes.get(token.type)
+        if code is None:
+            code = value_codes.get(token.value)
+        while True:
+            symbol = stack.pop()
+            if symbol >= first_nonterminal:
+                production = table[symbol - first_nonterminal][code] if code is not None else None
+                if production is None:
+                    self._error(lexer, 'Expecting ' + self.expected(table[symbol - first_nonterminal]))
+                stack.extend(production)
+            elif symbol == APPLY:
+                right = values.pop()
+                values[-1] = apply(pending.pop(), values[-1], right)
+            else:
+                terminal = symbol if symbol >= 0 else DEFERRED - symbol
+                if terminal != code:
+                    self._error(lexer, 'Expecting ' + self.name(terminal))
+                if terminal == end:
+                    return values[0]
+                if symbol < 0:
+                    pending.append(token.value)
+                elif operands[terminal]:
+                    values.append(leaf(self.terminals[terminal], token.value, lexer))
+                token = lexer.get_next_token()
+                code = type_codes.get(token.type)
+                if code is None:
+                    code = value_codes.get(token.value)
+
+    @staticmethod
+    def _error(lexer, message):
+        starts = getattr(lexer, 'starts', None)
+        raise ParsingError(message, getattr(lexer, 'text', None),
+                           starts[-1] if starts else None)
+
+
+# the grammar of calc5
+CALC5 = Grammar(calc5.__doc__)
+
+
+def evaluate(text, params=None, grammar=CALC5):
+    """
+    value of the expression, with the placeholders replaced by their
+    values in params
+    """
+    params = params or {}
+
+    def leaf(terminal, value, lexer):
+        if terminal != ID:
+            return value
+        if value not in params:
+            Grammar._error(lexer, "Placeholder '{}' has no value".format(value))
+        return params[value]
+
+    return grammar.run(Lexer(text), leaf, lambda op, left, right: OPERATIONS[op](left, right))
+
+
+def parse(text, grammar=CALC5):
+    """
+    AST of text (see tree.py)
+    """
+    return grammar.run(Lexer(text),
+                       lambda terminal, value, lexer: Var(value) if terminal == ID else Num(value),
+                       lambda op, left, right: BinOp(left, op, right))
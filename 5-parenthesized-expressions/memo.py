@@ -0,0 +1,235 @@
+"""
+Memoization of parenthesized subexpressions across a batch of
+expressions.
+
+A ParenMemo maps the canonical form of a parenthesized subexpression
+(its text without the whitespace that does not separate two numbers)
+to its value. MemoInterpreter looks up every parenthesized
+subexpression before evaluating it: on a hit the lexer jumps right
+after the closing parenthesis, so shared fragments are computed once
+per batch instead of once per line.
+
+The table has a bounded number of entries. When it is full, the entry
+with the lowest priority is evicted (GreedyDual-Size policy): the
+priority of an entry is its cost (the length of the subexpression)
+plus an 'inflation' value, which grows with each eviction, so that
+large subexpressions are kept longer, and old entries eventually go.
+The subexpressions shorter than min_length or longer than max_length
+characters are not memoized.
+
+Usage:
+    memo = ParenMemo(max_entries=10000)
+    results = list(evaluate_batch(lines, memo))
+    print(memo.format_report())
+"""
+import heapq
+import re
+import threading
+
+from calc5 import Lexer, Interpreter
+
+# returned by ParenMemo.get() when the key is not in the table
+MISSING = object()
+
+# whitespace runs, and the whitespace around the symbols
+_WHITESPACE = re.compile(r'\s+')
+_AROUND_SYMBOLS = re.compile(r' ?([-+*/()]) ?')
+_PARENTHESES = re.compile(r'[()]')
+
+
+def canonical(text):
+    """
+    canonical form of an expression: whitespace is removed, but for a
+    single space between two numbers (so that the invalid '(1 2)' does
+    not become the valid '(12)')
+    """
+    return _AROUND_SYMBOLS.sub(r'\1', _WHITESPACE.sub(' ', text)).strip()
+
+
+def match_parentheses(text):
+    """
+    dict mapping the offset of each '(' of text to the offset of the
+    matching ')'. Unmatched parentheses are left out.
+    """
+    matches = {}
+    stack = []
+    for match in _PARENTHESES.finditer(text):
+        if match.group() == '(':
+            stack.append(match.start())
+        elif stack:
+            matches[stack.pop()] = match.start()
+    return matches
+
+
+def paren_keys(text, min_length, max_length):
+    """
+    dict mapping the offset of each '(' of text to the offset of the
+    matching ')' and the canonical form of the subexpression, for the
+    subexpressions of min_length to max_length characters.
+
+    canonical() leaves the parentheses in place and in order, and only
+    looks at the characters around each one, so the canonical form of a
+    subexpression is the slice of the canonical form of the whole text
+    between its parentheses: the text is canonicalized once, instead of
+    once per nesting level (which costs the square of the depth)
+    """
+    matches = {start: end for start, end in match_parentheses(text).items()
+                if min_length <= end - start + 1 <= max_length}
+    if not matches:
+        return {}
+    canonical_text = canonical(text)
+    # the n-th parenthesis of text is the n-th of canonical_text
+    offsets = dict(zip((match.start() for match in _PARENTHESES.finditer(text)),
+                       (match.start() for match in _PARENTHESES.finditer(canonical_text))))
+    return {start: (end, canonical_text[offsets[start]:offsets[end] + 1])
+            for start, end in matches.items()}
+
+
+class ParenMemo(object):
+    """
+    bounded memo table of subexpression values, with cost-aware eviction.
+    The table can be shared by several threads (get, put and clear are
+    made under a lock)
+    """
+    def __init__(self, max_entries=4096, min_length=8, max_length=4096):
+        if max_entries < 1:
+            raise ValueError('max_entries must be at least 1, not {}'.format(max_entries))
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        # shorter subexpressions are cheaper to compute than to look up
+        self.min_length = min_length
+        # longer ones are seldom repeated, and their keys cost as much
+        # memory as their text
+        self.max_length = max_length
+        # key -> [priority, value]
+        self.entries = {}
+        # (priority, key) pairs. Entries whose priority changed are
+        # left in the heap, and skipped when popped
+        self.heap = []
+        self.inflation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """
+        value stored for key (and renews its priority), or MISSING
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            self.hits += 1
+            priority = self.inflation + len(key)
+            if priority != entry[0]:
+                entry[0] = priority
+                self.push(priority, key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self.lock:
+            if key in self.entries:
+                return
+            while len(self.entries) >= self.max_entries and self.evict():
+                pass
+            priority = self.inflation + len(key)
+            self.entries[key] = [priority, value]
+            self.push(priority, key)
+
+    def push(self, priority, key):
+        heapq.heappush(self.heap, (priority, key))
+        # drop the stale heap items when they are the majority
+        if len(self.heap) > 2 * self.max_entries + 16:
+            self.heap = [(entry[0], key) for key, entry in self.entries.items()]
+            heapq.heapify(self.heap)
+
+    def evict(self):
+        """
+        removes the entry with the lowest priority. Returns False if
+        there was none
+        """
+        while self.heap:
+            priority, key = heapq.heappop(self.heap)
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] == priority:
+                del self.entries[key]
+                self.inflation = priority
+                self.evictions += 1
+                return True
+        return False
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.heap = []
+            self.inflation = 0
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate(), 'entries': len(self.entries),
+                'evictions': self.evictions}
+
+    def format_report(self):
+        return ('memo: {hits} hits, {misses} misses ({rate:.1%}), '
+                '{entries} entries, {evictions} evictions').format(
+                    rate=self.hit_rate(), **self.report())
+
+
+class MemoInterpreter(Interpreter):
+    """
+    calc5 Interpreter that looks up the parenthesized subexpressions in
+    a ParenMemo before evaluating them
+    """
+    def __init__(self, lexer, memo):
+        super().__init__(lexer)
+        self.memo = memo
+        self.keys = paren_keys(lexer.text, memo.min_length, memo.max_length)
+
+    def skip_to(self, offset):
+        """
+        moves the lexer to offset, and reads the token found there
+        """
+        lexer = self.lexer
+        lexer.pos = offset
+        lexer.current_char = lexer.text[offset] if offset < len(lexer.text) else None
+        self.current_token = lexer.get_next_token()
+
+    def paren(self):
+        # offset of the open parenthesis (the current token)
+        start = self.lexer.starts[-1]
+        match = self.keys.get(start)
+        if match is None:
+            return super().paren()
+        end, key = match
+        value = self.memo.get(key)
+        if value is not MISSING:
+            self.skip_to(end + 1)
+            return value
+        value = super().paren()
+        # the Interpreter takes any parenthesis as the closing one: the
+        # value is only the span's if the ')' at end closed it (the
+        # token before the current one)
+        if self.lexer.starts[-2] == end:
+            self.memo.put(key, value)
+        return value
+
+
+def evaluate(text, memo):
+    return MemoInterpreter(Lexer(text), memo).expr()
+
+
+def evaluate_batch(lines, memo=None):
+    """
+    evaluates each expression of lines (empty lines are skipped),
+    sharing the memo table. Yields the results.
+    """
+    if memo is None:
+        memo = ParenMemo()
+    for text in lines:
+        if text:
+            yield evaluate(text, memo)
@@ -0,0 +1,206 @@
+"""
+Opt-in memory profiling of the calculator, built on tracemalloc.
+
+The calc5 Interpreter lexes, parses and evaluates at the same time, so
+to measure the phases separately the expression is run three times:
+* lexing: Lexer.get_next_token() is called until EOF, and the tokens
+  are kept in a list (the net allocation is the cost of the tokens)
+* parsing: the recorded tokens are replayed through a recognizer, that
+  walks the same grammar as the Interpreter without doing arithmetic
+* evaluation: the recorded tokens are replayed through the Interpreter
+  (the net allocation is the result, the peak includes the
+  intermediate integers)
+For each phase the report contains the peak and the net allocated
+bytes, and the top allocation sites (file:line) by net size.
+
+Usage:
+    report = profile_memory('3 * (10 + 2)')
+    print(report.result)
+    print(report.format())
+    report.as_dict()    # structured report
+"""
+import tracemalloc
+
+from calc5 import Lexer, Interpreter, Token, EOF, M_SIGN, S_SIGN
+
+PHASES = ('lexing', 'parsing', 'evaluation')
+
+
+class AllocationSite(object):
+    """
+    a line of code that allocated memory during a phase
+    """
+    def __init__(self, filename, lineno, size, count):
+        self.filename = filename
+        self.lineno = lineno
+        # net allocated bytes, and net number of allocated blocks
+        self.size = size
+        self.count = count
+
+    def as_dict(self):
+        return {'filename': self.filename, 'lineno': self.lineno,
+                'size': self.size, 'count': self.count}
+
+    def __repr__(self):
+        return 'AllocationSite({}:{}, size={}, count={})'.format(
+            self.filename, self.lineno, self.size, self.count)
+
+
+class PhaseReport(object):
+    """
+    memory used by one phase: peak and net allocated bytes (relative to
+    the start of the phase), and the top allocation sites
+    """
+    def __init__(self, name, peak, net, top):
+        self.name = name
+        self.peak = peak
+        self.net = net
+        self.top = top
+
+    def as_dict(self):
+        return {'peak': self.peak, 'net': self.net,
+                'top': [site.as_dict() for site in self.top]}
+
+    def __repr__(self):
+        return 'PhaseReport({}, peak={}, net={})'.format(
+            self.name, self.peak, self.net)
+
+
+class MemoryReport(object):
+    """
+    result of profile_memory(): the value of the expression, the number
+    of tokens, and a PhaseReport for each phase (see PHASES)
+    """
+    def __init__(self, result, token_count, phases):
+        self.result = result
+        self.token_count = token_count
+        self.phases = phases
+
+    def bytes_per_token(self):
+        """
+        net cost of a Token (including its value), in bytes
+        """
+        if not self.token_count:
+            return 0.0
+        return self.phases['lexing'].net / self.token_count
+
+    def as_dict(self):
+        return {'token_count': self.token_count,
+                'bytes_per_token': self.bytes_per_token(),
+                'phases': {name: phase.as_dict()
+                           for name, phase in self.phases.items()}}
+
+    def format(self):
+        """
+        human readable version of the report
+        """
+        lines = ['{:<12}{:>12}{:>12}'.format('phase', 'peak (B)', 'net (B)')]
+        for phase in self.phases.values():
+            lines.append('{:<12}{:>12}{:>12}'.format(
+                phase.name, phase.peak, phase.net))
+        lines.append('tokens: {} ({:.1f} B/token)'.format(
+            self.token_count, self.bytes_per_token()))
+        for phase in self.phases.values():
+            if not phase.top:
+                continue
+            lines.append('top allocation sites ({}):'.format(phase.name))
+            for site in phase.top:
+                lines.append('  {}:{}: {} B in {} blocks'.format(
+                    site.filename, site.lineno, site.size, site.count))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return 'MemoryReport(result={!r}, tokens={})'.format(
+            self.result, self.token_count)
+
+
+class TokenReplay(object):
+    """
+    stands in for a Lexer, giving back tokens that were already lexed
+    """
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+
+    def get_next_token(self):
+        return next(self.tokens, None) or Token(EOF, None)
+
+
+class Recognizer(Interpreter):
+    """
+    Interpreter that only checks the syntax: it consumes the tokens
+    following the same grammar, but does not compute anything
+    """
+    def m_expr(self):
+        self.p_term()
+        while self.current_token.type == M_SIGN:
+            self.eat(M_SIGN)
+            self.p_term()
+
+    def expr(self):
+        self.m_expr()
+        while self.current_token.type == S_SIGN:
+            self.eat(S_SIGN)
+            self.m_expr()
+
+
+def _lex(text):
+    lexer = Lexer(text)
+    tokens = []
+    token = lexer.get_next_token()
+    while token.type != EOF:
+        tokens.append(token)
+        token = lexer.get_next_token()
+    return tokens
+
+
+# the allocations of tracemalloc itself are left out of the reports
+_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__)]
+
+
+def _measure(name, function, top):
+    """
+    runs function() and measures its allocations.
+    Returns (value returned by function, PhaseReport)
+    """
+    before = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    value = function()
+    current, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    sites = [AllocationSite(stat.traceback[0].filename,
+                            stat.traceback[0].lineno,
+                            stat.size_diff, stat.count_diff)
+             for stat in after.compare_to(before, 'lineno')
+             if stat.size_diff > 0][:top]
+    return value, PhaseReport(name, peak - base, current - base, sites)
+
+
+def profile_memory(text, top=5):
+    """
+    lexes, parses and evaluates text under tracemalloc.
+    top: number of allocation sites kept for each phase.
+    Returns a MemoryReport.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    # the first filter_traces() that tests a trace compiles the
+    # patterns of the filters (with fnmatch and re): done here, on a
+    # snapshot with at least one trace (traced is one), so that the
+    # compiled patterns are already in the 'before' snapshot of the
+    # first phase
+    traced = [None]
+    tracemalloc.take_snapshot().filter_traces(_FILTERS)
+    del traced
+    try:
+        tokens, lexing = _measure('lexing', lambda: _lex(text), top)
+        _, parsing = _measure(
+            'parsing', lambda: Recognizer(TokenReplay(tokens)).expr(), top)
+        result, evaluation = _measure(
+            'evaluation', lambda: Interpreter(TokenReplay(tokens)).expr(), top)
+    finally:
+        if started:
+            tracemalloc.stop()
+    phases = {phase.name: phase for phase in (lexing, parsing, evaluation)}
+    return MemoryReport(result, len(tokens), phases)
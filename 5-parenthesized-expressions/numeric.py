@@ -0,0 +1,167 @@
+"""
+Evaluation policies: exact integers, machine floats, or automatic.
+
+The calc5 Interpreter computes exactly: the INTEGERs are Python ints,
+and a long chain of multiplications builds integers of thousands of
+digits, when a double-precision answer would often do. evaluate()
+takes a policy:
+* EXACT: the Interpreter (ints of any size, the current behavior)
+* FLOAT: every number is a float64. The result is approximate (and
+  inf when the magnitudes go over the float range), but each operation
+  costs the same whatever the size of the numbers
+* AUTO: the FLOAT evaluation, with checks: while every INTEGER value
+  (literal or intermediate) is below 2**53, the floats are exactly the
+  ints of the exact evaluation, and the REAL operations get the same
+  operands, so the result is exact. The first INTEGER that reaches
+  2**53 (where a float64 can lose precision) stops the float
+  evaluation, and the expression is evaluated again with EXACT
+The static types of the values (INTEGER or REAL, with the rules of
+typecheck.py) are tracked alongside the floats, so that DIV still
+refuses REAL operands, and the AUTO results have the type of the exact
+ones.
+
+Each result is a Result, which tells the mode that produced it
+('exact' or 'float').
+
+Usage:
+    evaluate('2 * 3.5 + 7 DIV 2')           # Result(10.0, 'float')
+    evaluate('99999999 * 99999999 * 3')     # Result(29999999400000003, 'exact')
+    evaluate('99999999 * 99999999 * 3', FLOAT)
+"""
+import math
+
+from calc5 import Lexer, Interpreter, INTEGER, REAL, M_SIGN, S_SIGN, int_div
+
+EXACT, FLOAT, AUTO = 'exact', 'float', 'auto'
+POLICIES = (EXACT, FLOAT, AUTO)
+# float64 integers are exact below
+SAFE_LIMIT = 2 ** 53
+
+
+class PrecisionLoss(Exception):
+    """
+    raised by the checked FloatInterpreter on an INTEGER that a float
+    cannot hold exactly
+    """
+
+
+class Result(object):
+    """
+    value of an expression, and the mode ('exact' or 'float') of the
+    arithmetic that computed it
+    """
+    __slots__ = ('value', 'mode')
+
+    def __init__(self, value, mode):
+        self.value = value
+        self.mode = mode
+
+    def __eq__(self, other):
+        return (isinstance(other, Result) and self.value == other.value
+                and self.mode == other.mode)
+
+    def __repr__(self):
+        return 'Result({!r}, {!r})'.format(self.value, self.mode)
+
+
+class FloatInterpreter(Interpreter):
+    """
+    calc5 Interpreter computing with floats. self.type is the static
+    type of the last value returned by a grammar method. With checked,
+    an INTEGER value at or above 2**53 raises PrecisionLoss
+    """
+    def __init__(self, lexer, checked=False):
+        self.checked = checked
+        self.type = INTEGER
+        super().__init__(lexer)
+
+    # an INTEGER result: checked, and without the sign of the float
+    # zeros (-0.0 is the int 0)
+    def integer(self, value):
+        if self.checked and abs(value) >= SAFE_LIMIT:
+            raise PrecisionLoss(value)
+        return value or 0.0
+
+    def factor(self):
+        value = super().factor()
+        if isinstance(value, int):
+            self.type = INTEGER
+            self.integer(value)
+            try:
+                return float(value)
+            except OverflowError:
+                return math.inf
+        self.type = REAL
+        return value
+
+    def m_expr(self):
+        result = self.p_term()
+        while self.current_token.type == M_SIGN:
+            op = self.current_token.value
+            self.eat(M_SIGN)
+            left_type = self.type
+            right = self.p_term()
+            integers = left_type == INTEGER and self.type == INTEGER
+            if op == '*':
+                result = result * right
+                self.type = INTEGER if integers else REAL
+            elif op == '/':
+                if right == 0:
+                    # the messages of the exact evaluation
+                    raise ZeroDivisionError(
+                        'division by zero' if integers else 'float division by zero')
+                result = result / right
+                self.type = REAL
+            else:
+                if not integers:
+                    raise TypeError("DIV needs INTEGER operands")
+                if self.checked:
+                    # (exact ints below 2**53: cheap)
+                    result = float(int_div(int(result), int(right)))
+                elif right == 0:
+                    raise ZeroDivisionError('integer division or modulo by zero')
+                else:
+                    # (inf and nan, from overflows, stay as they are)
+                    quotient = result / right
+                    result = float(math.trunc(quotient)) if math.isfinite(quotient) else quotient
+            if self.type == INTEGER:
+                result = self.integer(result)
+        return result
+
+    def expr(self):
+        result = self.m_expr()
+        while self.current_token.type == S_SIGN:
+            op = self.current_token.value
+            self.eat(S_SIGN)
+            left_type = self.type
+            right = self.m_expr()
+            if op == '+':
+                result = result + right
+            else:
+                result = result - right
+            self.type = INTEGER if left_type == INTEGER and self.type == INTEGER else REAL
+            if self.type == INTEGER:
+                result = self.integer(result)
+        return result
+
+
+def evaluate(text, policy=AUTO):
+    """
+    Result of the expression text, computed with the policy (EXACT,
+    FLOAT or AUTO)
+    """
+    if policy == FLOAT:
+        return Result(FloatInterpreter(Lexer(text)).expr(), FLOAT)
+    if policy == AUTO:
+        interpreter = FloatInterpreter(Lexer(text), checked=True)
+        try:
+            value = interpreter.expr()
+        except PrecisionLoss:
+            pass
+        else:
+            if interpreter.type == INTEGER:
+                value = int(value)
+            return Result(value, FLOAT)
+    elif policy != EXACT:
+        raise ValueError('unknown policy: {!r}'.format(policy))
+    return Result(Interpreter(Lexer(text)).expr(), EXACT)
@@ -0,0 +1,251 @@
+"""
+Parallel lexing of a single huge expression.
+
+No token contains whitespace, and the signs and parentheses are one
+character long: the input can be cut anywhere next to a whitespace, a
+sign or a parenthesis without changing the tokens. tokenize() cuts the
+input into chunks at such boundaries, lexes the chunks in a pool of
+processes (each worker runs a ByteLexer over its chunk, see
+bytelexer.py), and joins the results in order.
+
+The tokens of a chunk travel back from the worker as a TokenBuffer: a
+few typed arrays instead of a list of Token objects (1 byte for the
+type, 8 bytes for the value and 16 for the span of each token; only
+the identifiers, the reals and the integers that do not fit in 64 bits
+are kept as Python objects, in a dict).
+
+The workers of tokenize_file() map the file themselves, so the input
+is never copied between the processes; tokenize() shares a bytes
+object with the workers (inherited when they are forked).
+
+Usage:
+    buffer = tokenize_file('huge.txt', workers=8)
+    result = Interpreter(buffer.lexer()).expr()
+"""
+import mmap
+import re
+from array import array
+from multiprocessing import Pool
+
+from calc5 import (Token, LexingError, INTEGER, REAL, ID, S_SIGN, M_SIGN,
+                   PAR, EOF)
+from bytelexer import ByteLexer, CHAR_CLASS, SPACE, SUM, MUL, PAREN
+
+# token codes of the TokenBuffers, and the (type, value) of each code
+# (None for the values kept in the buffer)
+CODES = {(INTEGER, None): 0, (REAL, None): 1, (ID, None): 2,
+         (S_SIGN, '+'): 3, (S_SIGN, '-'): 4, (M_SIGN, '*'): 5,
+         (M_SIGN, '/'): 6, (M_SIGN, 'DIV'): 7, (PAR, '('): 8, (PAR, ')'): 9}
+TOKENS = {code: key for key, code in CODES.items()}
+INTEGER_CODE, REAL_CODE, ID_CODE = 0, 1, 2
+INT64_MIN, INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# the bytes next to which the input can be cut
+_BOUNDARY = re.compile(b'[' + re.escape(bytes(
+    byte for byte in range(256)
+    if CHAR_CLASS[byte] in (SPACE, SUM, MUL, PAREN))) + b']')
+
+
+class TokenBuffer(object):
+    """
+    tokens of a part of the input, in parallel arrays
+    """
+    def __init__(self):
+        self.codes = bytearray()
+        self.values = array('q')
+        self.starts = array('q')
+        self.ends = array('q')
+        # token index -> value, for the values that are not in values
+        self.extras = {}
+        # offset of the invalid character, if the lexing failed
+        self.error = None
+
+    def __len__(self):
+        return len(self.codes)
+
+    def append(self, token, start, end):
+        index = len(self.codes)
+        value = token.value
+        if token.type == INTEGER:
+            code = INTEGER_CODE
+            if not INT64_MIN <= value <= INT64_MAX:
+                self.extras[index] = value
+                value = 0
+        elif token.type in (REAL, ID):
+            code = REAL_CODE if token.type == REAL else ID_CODE
+            self.extras[index] = value
+            value = 0
+        else:
+            code = CODES[token.type, value]
+            value = 0
+        self.codes.append(code)
+        self.values.append(value)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(self, other):
+        """
+        appends the tokens of the buffer of the following chunk
+        """
+        offset = len(self.codes)
+        self.codes += other.codes
+        self.values += other.values
+        self.starts += other.starts
+        self.ends += other.ends
+        for index, value in other.extras.items():
+            self.extras[index + offset] = value
+
+    def token(self, index):
+        type, value = TOKENS[self.codes[index]]
+        if value is None:
+            value = self.extras.get(index)
+            if value is None:
+                value = self.values[index]
+        return Token(type, value)
+
+    def tokens(self):
+        for index in range(len(self.codes)):
+            yield self.token(index)
+
+    def lexer(self, text=None):
+        return BufferLexer(self, text)
+
+
+class BufferLexer(object):
+    """
+    stands in for a Lexer (e.g. for the Interpreter), giving back the
+    tokens of a TokenBuffer, followed by EOF. text is the source, for
+    the error messages
+    """
+    def __init__(self, buffer, text=None):
+        self.buffer = buffer
+        self.text = text
+        self.index = 0
+        self.starts = array('q')
+        self.ends = array('q')
+
+    def get_next_token(self):
+        buffer, index = self.buffer, self.index
+        if index >= len(buffer):
+            end = buffer.ends[-1] if len(buffer) else 0
+            self.starts.append(end)
+            self.ends.append(end)
+            return Token(EOF, None)
+        self.index = index + 1
+        self.starts.append(buffer.starts[index])
+        self.ends.append(buffer.ends[index])
+        return buffer.token(index)
+
+
+def lex_range(data, start, end):
+    """
+    TokenBuffer of the tokens of data[start:end], with their offsets in
+    data
+    """
+    lexer = ByteLexer(data)
+    lexer.pos, lexer.end = start, end
+    buffer = TokenBuffer()
+    starts, ends = lexer.starts, lexer.ends
+    try:
+        while True:
+            token = lexer.get_next_token()
+            if token.type == EOF:
+                break
+            buffer.append(token, starts[-1], ends[-1])
+            # the spans are moved to the buffer as they are produced
+            del starts[:], ends[:]
+    except LexingError as error:
+        buffer.error = error.offset
+    return buffer
+
+
+def split(data, chunks):
+    """
+    (start, end) ranges of about len(data) / chunks bytes, cut before a
+    whitespace, a sign or a parenthesis
+    """
+    size = len(data)
+    bounds = [0]
+    for i in range(1, chunks):
+        target = max(size * i // chunks, bounds[-1])
+        match = _BOUNDARY.search(data, target)
+        if match is None:
+            break
+        if match.start() > bounds[-1]:
+            bounds.append(match.start())
+    bounds.append(size)
+    return list(zip(bounds, bounds[1:]))
+
+
+# data of the worker processes (set by _init_worker)
+_data = None
+
+
+def _init_worker(source):
+    global _data
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            _data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        _data = source
+
+
+def _lex_chunk(bounds):
+    return lex_range(_data, *bounds)
+
+
+def _join(buffers, data):
+    result = TokenBuffer()
+    for buffer in buffers:
+        if buffer.error is not None:
+            # the first invalid character, as for the sequential lexer
+            raise LexingError("Invalid character", data, buffer.error)
+        result.extend(buffer)
+    return result
+
+
+def _tokenize(source, data, workers, chunks_per_worker):
+    if workers <= 1 or len(data) == 0:
+        return _join([lex_range(data, 0, len(data))], data)
+    ranges = split(data, workers * chunks_per_worker)
+    with Pool(workers, _init_worker, (source,)) as pool:
+        # imap keeps the order of the chunks
+        return _join(pool.imap(_lex_chunk, ranges), data)
+
+
+def tokenize(data, workers=4, chunks_per_worker=4):
+    """
+    TokenBuffer of all the tokens of data (bytes), lexed by a pool of
+    workers. Raises the same LexingError as the sequential lexer
+    """
+    return _tokenize(data, data, workers, chunks_per_worker)
+
+
+def tokenize_file(path, workers=4, chunks_per_worker=4):
+    """
+    TokenBuffer of all the tokens of a file, lexed by a pool of workers
+    """
+    with open(path, 'rb') as file:
+        if not file.seek(0, 2):
+            return TokenBuffer()
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return _tokenize(path, data, workers, chunks_per_worker)
+            except LexingError as error:
+                # the message is formatted while the file is mapped
+                raise LexingError(str(error)) from None
+
+
+def same_tokens(buffer, lexer):
+    """
+    whether the buffer has the same tokens (types, values and spans)
+    as the given (sequential) lexer
+    """
+    for index in range(len(buffer)):
+        token = lexer.get_next_token()
+        expected = buffer.token(index)
+        if (token.type, token.value) != (expected.type, expected.value):
+            return False
+        if (lexer.starts[-1], lexer.ends[-1]) != (buffer.starts[index],
+                                                  buffer.ends[index]):
+            return False
+    return lexer.get_next_token().type == EOF
@@ -0,0 +1,206 @@
+"""
+Parallel evaluation of a huge top-level sum.
+
+An expression like '(...) + (...) - ... + (...)' is a chain of terms
+separated by the signs at parenthesis depth 0. split_points() finds
+those signs with a prefix sum of the parenthesis depth over the bytes
+of the input: with NumPy, it is a vectorized cumulative sum (over
+blocks of the input, to bound the memory); without NumPy, a regular
+expression scan of the signs and parentheses. The terms are then
+evaluated by a pool of worker processes (with the calc5 Interpreter
+over a ByteLexer, see bytelexer.py), and the parent process combines
+their values in order.
+
+The result is the same as the sequential Interpreter's, bit for bit:
+the terms are combined left to right, as expr() does. A worker sends
+back the values of its terms (a term after a '-' negated: a - b and
+a + (-b) are the same operation, also for floats), and their sum when
+they are all INTEGERs; that sum is used only while the running total
+is an INTEGER, since the integer additions are exact in any order.
+If anything goes wrong (unbalanced parentheses, syntax errors,
+division by zero, ...), the whole input is evaluated again by the
+sequential Interpreter, which raises the same error.
+
+Usage:
+    result = evaluate_file('huge.txt', workers=8)
+"""
+import mmap
+import re
+from array import array
+from multiprocessing import Pool
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from calc5 import Interpreter, SourceError, EOF
+from bytelexer import ByteLexer
+
+OPEN, CLOSE, PLUS, MINUS = b'()+-'
+# size of the blocks scanned at once by NumPy (about 6 bytes of
+# temporary arrays per byte of the block: the depths are int32, which
+# cannot overflow within a block of 2**24 bytes)
+SCAN_BLOCK = 1 << 24
+_SIGNS_AND_PARENTHESES = re.compile(rb'[-+()]')
+
+
+def _split_points_numpy(data, block):
+    bytes_ = numpy.frombuffer(data, dtype=numpy.uint8)
+    points = array('q')
+    depth = 0
+    for start in range(0, len(bytes_), block):
+        chunk = bytes_[start:start + block]
+        # depths relative to the start of the block (the depth before
+        # it is added to the comparisons, not to the array)
+        depths = (chunk == OPEN).astype(numpy.int32)
+        depths -= chunk == CLOSE
+        numpy.cumsum(depths, dtype=numpy.int32, out=depths)
+        if depths.min() < -depth:
+            return None
+        signs = numpy.flatnonzero(((chunk == PLUS) | (chunk == MINUS))
+                                  & (depths == -depth))
+        signs += start
+        points.frombytes(signs.astype(numpy.int64).tobytes())
+        depth += int(depths[-1])
+    return points if depth == 0 else None
+
+
+def _split_points_python(data):
+    points = array('q')
+    depth = 0
+    for match in _SIGNS_AND_PARENTHESES.finditer(data):
+        char = data[match.start()]
+        if char == OPEN:
+            depth += 1
+        elif char == CLOSE:
+            depth -= 1
+            if depth < 0:
+                return None
+        elif depth == 0:
+            points.append(match.start())
+    return points if depth == 0 else None
+
+
+def split_points(data, block=SCAN_BLOCK):
+    """
+    offsets of the '+' and '-' at parenthesis depth 0, or None if the
+    parentheses are not balanced
+    """
+    if numpy is not None:
+        return _split_points_numpy(data, block)
+    return _split_points_python(data)
+
+
+def evaluate_terms(data, points, first, last):
+    """
+    values of the terms first..last-1 (the term i is between the
+    points i-1 and i), with the terms after a '-' negated. Returns
+    (sum of the values if they are all INTEGERs, else None, values),
+    or None if a term cannot be evaluated on its own
+    """
+    lexer = ByteLexer(data)
+    values = []
+    try:
+        for i in range(first, last):
+            lexer.pos = 0 if i == 0 else points[i - 1] + 1
+            lexer.end = points[i] if i < len(points) else len(data)
+            del lexer.starts[:], lexer.ends[:]
+            interpreter = Interpreter(lexer)
+            value = interpreter.m_expr()
+            if interpreter.current_token.type != EOF:
+                return None
+            if i > 0 and data[points[i - 1]] == MINUS:
+                value = -value
+            values.append(value)
+    except Exception:
+        return None
+    if not all(type(value) is int for value in values):
+        return None, values
+    try:
+        # compact transfer from the workers
+        packed = array('q', values)
+    except OverflowError:
+        packed = values
+    return sum(values), packed
+
+
+def combine(results):
+    """
+    left to right combination of the results of evaluate_terms(), or
+    None if one of them failed
+    """
+    total = None
+    for result in results:
+        if result is None:
+            return None
+        partial, values = result
+        if partial is not None and (total is None or type(total) is int):
+            total = partial if total is None else total + partial
+            continue
+        values = iter(values)
+        if total is None:
+            total = next(values)
+        for value in values:
+            total = total + value
+    return total
+
+
+# data and split points of the worker processes (set by _init_worker)
+_data = _points = None
+
+
+def _init_worker(source, points):
+    global _data, _points
+    if isinstance(source, str):
+        with open(source, 'rb') as file:
+            _data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        _data = source
+    _points = points
+
+
+def _evaluate_job(bounds):
+    return evaluate_terms(_data, _points, *bounds)
+
+
+def _evaluate(source, data, workers, jobs_per_worker):
+    points = split_points(data)
+    if points is not None:
+        terms = len(points) + 1
+        jobs = max(1, min(terms, workers * jobs_per_worker))
+        bounds = [terms * i // jobs for i in range(jobs + 1)]
+        ranges = list(zip(bounds, bounds[1:]))
+        if workers <= 1 or jobs == 1:
+            total = combine(evaluate_terms(data, points, *bounds)
+                            for bounds in ranges)
+        else:
+            with Pool(workers, _init_worker, (source, points)) as pool:
+                # imap keeps the order of the jobs
+                total = combine(pool.imap(_evaluate_job, ranges))
+        if total is not None:
+            return total
+    # sequential evaluation (and its errors)
+    return Interpreter(ByteLexer(data)).expr()
+
+
+def evaluate(data, workers=4, jobs_per_worker=4):
+    """
+    value of the expression in data (bytes), as calc5.evaluate() gives
+    """
+    return _evaluate(data, data, workers, jobs_per_worker)
+
+
+def evaluate_file(path, workers=4, jobs_per_worker=4):
+    """
+    value of the expression in a file
+    """
+    with open(path, 'rb') as file:
+        if not file.seek(0, 2):
+            return evaluate(b'', workers, jobs_per_worker)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                return _evaluate(path, data, workers, jobs_per_worker)
+            except SourceError as error:
+                # the message is formatted while the file is mapped
+                raise type(error)(str(error)) from None
@@ -0,0 +1,1192 @@
+"""
+A small Pascal subset on top of the calc5 expressions: variables,
+statements, and PROCEDURE/FUNCTION declarations and calls.
+
+program      : (PROGRAM ID SEMI)? block DOT
+block        : declarations compound
+declarations : (CONST (ID EQUAL expr SEMI)+)?
+               (VAR (id_list COLON type SEMI)+)?
+               (routine SEMI)*
+routine      : PROCEDURE ID params? SEMI declarations compound
+             | FUNCTION ID params? COLON type SEMI declarations compound
+params       : LEFTPAR id_list COLON type (SEMI id_list COLON type)* RIGHTPAR
+id_list      : ID (COMMA ID)*
+type         : INTEGER | REAL | array
+array        : ARRAY LBRACKET expr RANGE expr RBRACKET OF (INTEGER | REAL)
+compound     : BEGIN statement (SEMI statement)* END
+statement    : compound | assignment | call | if | while | for | empty
+assignment   : ID (LBRACKET expr RBRACKET)? ASSIGN expr
+call         : ID (LEFTPAR expr (COMMA expr)* RIGHTPAR)?
+if           : IF condition THEN statement (ELSE statement)?
+while        : WHILE condition DO statement
+for          : FOR ID ASSIGN expr (TO|DOWNTO) expr DO statement
+condition    : expr (EQUAL|NOT_EQUAL|LESS|LESS_EQUAL|GREATER|GREATER_EQUAL) expr
+factor       : INTEGER | REAL | ID | call | ID LBRACKET expr RBRACKET
+(expr, m_expr, p_term and paren are the calc5 ones, see calc5.py)
+Routines are declared at the program level (they cannot be nested).
+A function returns the value assigned to its name. WRITELN(expr, ...)
+writes its arguments on the output.
+The bounds of the arrays are constant expressions, and the arrays can
+only be declared in VAR sections (not as parameters or results).
+
+The source is parsed into an AST, and then compiled into nested
+closures. The names are resolved at compile time: every parameter and
+local variable of a routine gets a slot in its activation frame (a
+list), and the globals get a slot in the global frame. The frames of
+each routine are reused: a call takes a frame from the routine's pool
+(or allocates one if the pool is empty, e.g. in a recursion) and gives
+it back on return. An optional limit on the depth of the calls turns a
+runaway recursion into a PascalError.
+
+The arrays are stored in typed arrays of the array module ('q' for
+INTEGER, 'd' for REAL: 8 bytes per element, instead of a pointer and a
+boxed number per element in a list), so an INTEGER element is limited
+to 64 bits. Every element access checks the bounds, except where the
+index is provably in bounds: inside a FOR loop with constant limits,
+whose variable is not assigned in its body, the range of the loop
+variable is known at compile time, and the accesses indexed by it
+(or by it plus or minus a constant) that are within the array bounds
+for the whole range are compiled without the check (the check is
+hoisted out of the loop, to compile time).
+
+Usage:
+    $ python3 pascal.py program.pas
+or
+    run(source)                     # writes on stdout
+    program = compile_program(source)
+    program.run()
+"""
+import argparse
+import sys
+from array import array
+
+from calc5 import Lexer, SourceError, int_div, INTEGER, REAL, ID, PAR, EOF
+from bigint import int_to_str
+from tree import Parser, Num, Var, BinOp
+
+# reserved words -> type of their tokens. The names of the types
+# get their own token types, distinct from the numbers' ones
+KEYWORDS = {keyword: keyword for keyword in [
+    'PROGRAM', 'CONST', 'VAR', 'PROCEDURE', 'FUNCTION', 'BEGIN', 'END',
+    'IF', 'THEN', 'ELSE', 'WHILE', 'DO', 'FOR', 'TO', 'DOWNTO', 'ARRAY',
+    'OF']}
+INTEGER_TYPE, REAL_TYPE = 'INTEGER_TYPE', 'REAL_TYPE'
+KEYWORDS.update(INTEGER=INTEGER_TYPE, REAL=REAL_TYPE)
+# types of the variables, by token type
+TYPES = {INTEGER_TYPE: INTEGER, REAL_TYPE: REAL}
+# symbols (also the type of their tokens), the longest first
+SYMBOLS = [':=', '<=', '>=', '<>', '..', ';', ':', ',', '.', '=', '<', '>',
+           '[', ']']
+RELATIONS = ['=', '<>', '<', '<=', '>', '>=']
+# typecodes of the arrays, by element type
+TYPECODES = {INTEGER: 'q', REAL: 'd'}
+# built-in procedures
+BUILTINS = ['WRITE', 'WRITELN']
+
+
+class PascalError(Exception):
+    """
+    errors of the compiled programs (at compile time or at run time)
+    """
+    pass
+
+
+class PascalLexer(Lexer):
+    """
+    calc5 Lexer, extended with the Pascal symbols, the reserved words
+    and the comments ({ ... })
+    """
+    def skip_comment(self):
+        start = self.pos
+        while self.current_char is not None and self.current_char != '}':
+            self.advance()
+        if self.current_char is None:
+            self.pos = start
+            self.error()
+        self.advance()
+
+    def get_next_token(self):
+        while self.current_char is not None and (
+                self.current_char.isspace() or self.current_char == '{'):
+            if self.current_char == '{':
+                self.skip_comment()
+            else:
+                self.skip_whitespace()
+        if self.current_char is not None and self.current_char in ':;,.=<>[]':
+            start = self.pos
+            for symbol in SYMBOLS:
+                if self.text.startswith(symbol, start):
+                    for _ in symbol:
+                        self.advance()
+                    return self.make_token(symbol, symbol, start)
+        token = super().get_next_token()
+        if token.type == ID and token.value.upper() in KEYWORDS:
+            token.value = token.value.upper()
+            token.type = KEYWORDS[token.value]
+        return token
+
+
+# Nodes of the AST, besides the Num, Var and BinOp of the expressions
+class Call(object):
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+
+
+class Compare(object):
+    def __init__(self, left, op, right):
+        self.left = left
+        self.op = op
+        self.right = right
+
+
+class Assign(object):
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+
+class Index(object):
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+
+class AssignIndex(object):
+    def __init__(self, name, index, value):
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class ArrayType(object):
+    def __init__(self, low, high, element):
+        # bound expressions (constant)
+        self.low = low
+        self.high = high
+        # INTEGER or REAL
+        self.element = element
+
+
+class If(object):
+    def __init__(self, condition, then, otherwise):
+        self.condition = condition
+        self.then = then
+        self.otherwise = otherwise
+
+
+class While(object):
+    def __init__(self, condition, body):
+        self.condition = condition
+        self.body = body
+
+
+class For(object):
+    def __init__(self, name, start, stop, step, body):
+        self.name = name
+        self.start = start
+        self.stop = stop
+        # +1 for TO, -1 for DOWNTO
+        self.step = step
+        self.body = body
+
+
+class Compound(object):
+    def __init__(self, statements):
+        self.statements = statements
+
+
+class Declarations(object):
+    def __init__(self):
+        # name -> expression
+        self.constants = {}
+        # (name, type) pairs, in order
+        self.variables = []
+        self.routines = []
+
+
+class RoutineDecl(object):
+    def __init__(self, name, params, result_type, declarations, body):
+        self.name = name
+        # (name, type) pairs
+        self.params = params
+        # None for the procedures
+        self.result_type = result_type
+        self.declarations = declarations
+        self.body = body
+
+
+class PascalParser(Parser):
+    """
+    parser of the Pascal subset (see the grammar above). The expression
+    methods (expr, m_expr, p_term, paren) are the calc5 ones
+    """
+    def program(self):
+        if self.current_token.type == 'PROGRAM':
+            self.eat('PROGRAM')
+            self.eat(ID)
+            self.eat(';')
+        declarations = self.declarations(routines=True)
+        body = self.compound()
+        self.eat('.')
+        if self.current_token.type != EOF:
+            self.error()
+        return declarations, body
+
+    def declarations(self, routines):
+        result = Declarations()
+        if self.current_token.type == 'CONST':
+            self.eat('CONST')
+            while self.current_token.type == ID:
+                name = self.current_token.value
+                self.eat(ID)
+                self.eat('=')
+                result.constants[name.upper()] = self.expr()
+                self.eat(';')
+        if self.current_token.type == 'VAR':
+            self.eat('VAR')
+            while self.current_token.type == ID:
+                result.variables.extend(self.typed_names(arrays=True))
+                self.eat(';')
+        while self.current_token.type in ('PROCEDURE', 'FUNCTION'):
+            if not routines:
+                self.error("Routines cannot be nested")
+            result.routines.append(self.routine())
+            self.eat(';')
+        return result
+
+    def typed_names(self, arrays=False):
+        names = [self.current_token.value]
+        self.eat(ID)
+        while self.current_token.type == ',':
+            self.eat(',')
+            names.append(self.current_token.value)
+            self.eat(ID)
+        self.eat(':')
+        type = self.type_spec(arrays)
+        return [(name.upper(), type) for name in names]
+
+    def type_spec(self, arrays=False):
+        token_type = self.current_token.type
+        if token_type == 'ARRAY':
+            if not arrays:
+                self.error("Arrays can only be declared as variables")
+            self.eat('ARRAY')
+            self.eat('[')
+            low = self.expr()
+            self.eat('..')
+            high = self.expr()
+            self.eat(']')
+            self.eat('OF')
+            return ArrayType(low, high, self.type_spec())
+        if token_type not in TYPES:
+            self.error("Expecting a type")
+        self.eat(token_type)
+        return TYPES[token_type]
+
+    def routine(self):
+        kind = self.current_token.type
+        self.eat(kind)
+        name = self.current_token.value.upper()
+        self.eat(ID)
+        params = []
+        if self.current_token.value == '(':
+            self.eat(PAR)
+            params.extend(self.typed_names())
+            while self.current_token.type == ';':
+                self.eat(';')
+                params.extend(self.typed_names())
+            self.close_paren()
+        result_type = None
+        if kind == 'FUNCTION':
+            self.eat(':')
+            result_type = self.type_spec()
+        self.eat(';')
+        declarations = self.declarations(routines=False)
+        body = self.compound()
+        return RoutineDecl(name, params, result_type, declarations, body)
+
+    def close_paren(self):
+        if self.current_token.value != ')':
+            self.error()
+        self.eat(PAR)
+
+    def compound(self):
+        self.eat('BEGIN')
+        statements = [self.statement()]
+        while self.current_token.type == ';':
+            self.eat(';')
+            statements.append(self.statement())
+        self.eat('END')
+        return Compound([s for s in statements if s is not None])
+
+    def statement(self):
+        type = self.current_token.type
+        if type == 'BEGIN':
+            return self.compound()
+        if type == 'IF':
+            self.eat('IF')
+            condition = self.condition()
+            self.eat('THEN')
+            then = self.statement()
+            otherwise = None
+            if self.current_token.type == 'ELSE':
+                self.eat('ELSE')
+                otherwise = self.statement()
+            return If(condition, then, otherwise)
+        if type == 'WHILE':
+            self.eat('WHILE')
+            condition = self.condition()
+            self.eat('DO')
+            return While(condition, self.statement())
+        if type == 'FOR':
+            return self.for_statement()
+        if type == ID:
+            name = self.current_token.value.upper()
+            self.eat(ID)
+            if self.current_token.type == '[':
+                index = self.index()
+                self.eat(':=')
+                return AssignIndex(name, index, self.expr())
+            if self.current_token.type == ':=':
+                self.eat(':=')
+                return Assign(name, self.expr())
+            return Call(name, self.call_args())
+        # empty statement
+        return None
+
+    def for_statement(self):
+        self.eat('FOR')
+        name = self.current_token.value.upper()
+        self.eat(ID)
+        self.eat(':=')
+        start = self.expr()
+        step = 1 if self.current_token.type == 'TO' else -1
+        self.eat('TO' if step == 1 else 'DOWNTO')
+        stop = self.expr()
+        self.eat('DO')
+        return For(name, start, stop, step, self.statement())
+
+    def condition(self):
+        left = self.expr()
+        op = self.current_token.type
+        if op not in RELATIONS:
+            self.error("Expecting a comparison")
+        self.eat(op)
+        return Compare(left, op, self.expr())
+
+    def call_args(self):
+        args = []
+        if self.current_token.value == '(':
+            self.eat(PAR)
+            args.append(self.expr())
+            while self.current_token.type == ',':
+                self.eat(',')
+                args.append(self.expr())
+            self.close_paren()
+        return args
+
+    def factor(self):
+        token = self.current_token
+        if token.type != ID:
+            return super().factor()
+        self.eat(ID)
+        name = token.value.upper()
+        if self.current_token.value == '(':
+            return Call(name, self.call_args())
+        if self.current_token.type == '[':
+            return Index(name, self.index())
+        return Var(name)
+
+    def index(self):
+        self.eat('[')
+        index = self.expr()
+        self.eat(']')
+        return index
+
+
+# operations of the expressions and of the conditions
+def _add(left, right):
+    return lambda frame: left(frame) + right(frame)
+
+def _sub(left, right):
+    return lambda frame: left(frame) - right(frame)
+
+def _mul(left, right):
+    return lambda frame: left(frame) * right(frame)
+
+def _truediv(left, right):
+    return lambda frame: left(frame) / right(frame)
+
+def _div(left, right):
+    return lambda frame: int_div(left(frame), right(frame))
+
+def _eq(left, right):
+    return lambda frame: left(frame) == right(frame)
+
+def _ne(left, right):
+    return lambda frame: left(frame) != right(frame)
+
+def _lt(left, right):
+    return lambda frame: left(frame) < right(frame)
+
+def _le(left, right):
+    return lambda frame: left(frame) <= right(frame)
+
+def _gt(left, right):
+    return lambda frame: left(frame) > right(frame)
+
+def _ge(left, right):
+    return lambda frame: left(frame) >= right(frame)
+
+OPERATIONS = {'+': _add, '-': _sub, '*': _mul, '/': _truediv, 'DIV': _div,
+              '=': _eq, '<>': _ne, '<': _lt, '<=': _le, '>': _gt, '>=': _ge}
+
+# the same operations, between a slot of the frame and a constant
+# (e.g. 'n - 1', 'n < 2'): the most common case in the routines
+def _slot_operations():
+    return {
+        '+': lambda i, c: lambda frame: frame[i] + c,
+        '-': lambda i, c: lambda frame: frame[i] - c,
+        '*': lambda i, c: lambda frame: frame[i] * c,
+        '=': lambda i, c: lambda frame: frame[i] == c,
+        '<>': lambda i, c: lambda frame: frame[i] != c,
+        '<': lambda i, c: lambda frame: frame[i] < c,
+        '<=': lambda i, c: lambda frame: frame[i] <= c,
+        '>': lambda i, c: lambda frame: frame[i] > c,
+        '>=': lambda i, c: lambda frame: frame[i] >= c,
+    }
+
+SLOT_OPERATIONS = _slot_operations()
+
+# initial value of the variables
+DEFAULTS = {INTEGER: 0, REAL: 0.0}
+
+
+class ArraySpec(object):
+    """
+    an array variable in a frame template: the frames get a new array
+    of zeros in its slot
+    """
+    def __init__(self, element, low, high):
+        if not isinstance(low, int) or not isinstance(high, int):
+            raise PascalError("The bounds of an array must be INTEGER")
+        if high < low:
+            raise PascalError("Empty array [{}..{}]".format(low, high))
+        self.element = element
+        self.typecode = TYPECODES[element]
+        self.low = low
+        self.high = high
+
+    def zeros(self):
+        return array(self.typecode, [0]) * (self.high - self.low + 1)
+
+
+def new_frame(template):
+    """
+    a frame initialized from the template
+    """
+    return [value.zeros() if isinstance(value, ArraySpec) else value
+            for value in template]
+
+
+def _type_of(value):
+    """
+    type of a value (or of the initial value of a variable)
+    """
+    if isinstance(value, ArraySpec):
+        return value.element
+    return INTEGER if isinstance(value, int) else REAL
+
+
+def _to_real(value):
+    """
+    an INTEGER value stored into a REAL
+    """
+    try:
+        return float(value)
+    except OverflowError:
+        raise PascalError("INTEGER too large for a REAL") from None
+
+
+class Routine(object):
+    """
+    a compiled PROCEDURE or FUNCTION
+    """
+    def __init__(self, decl, initial):
+        self.name = decl.name
+        self.is_function = decl.result_type is not None
+        self.nparams = len(decl.params)
+        # frame layout: parameters, local variables, result
+        self.slots = {}
+        template = []
+        for name, type in decl.params + decl.declarations.variables:
+            self.slots[name] = len(template)
+            template.append(initial(type))
+        self.result_slot = len(template)
+        template.append(DEFAULTS.get(decl.result_type))
+        # initial content of the frames
+        self.template = template
+        # (slot, ArraySpec) of the local arrays
+        self.arrays = [(slot, value) for slot, value in enumerate(template)
+                       if isinstance(value, ArraySpec)]
+        # frames that are not in use
+        self.pool = []
+        # compiled body (set by the Compiler)
+        self.body = None
+
+
+class Program(object):
+    """
+    a compiled program. run() executes it
+    """
+    def __init__(self, body, global_template, output=None, max_depth=None):
+        self.body = body
+        self.global_template = global_template
+        # the global frame: the closures keep a reference to it
+        self.globals = new_frame(global_template)
+        self.output = output
+        self.max_depth = max_depth
+        # current depth of the calls (a cell shared with the closures)
+        self.depth = [0]
+
+    def run(self, output=None):
+        if output is not None:
+            self.output = output
+        elif self.output is None:
+            self.output = sys.stdout
+        self.globals[:] = new_frame(self.global_template)
+        self.depth[0] = 0
+        # every Pascal call takes a few Python frames
+        limit = sys.getrecursionlimit()
+        if self.max_depth is not None:
+            sys.setrecursionlimit(max(limit, 20 * self.max_depth + 1000))
+        try:
+            self.body(self.globals)
+        finally:
+            sys.setrecursionlimit(limit)
+        return self
+
+
+class Compiler(object):
+    """
+    compiles the AST of a program into closures. Each closure takes the
+    current frame (the frame of the running routine, or the global
+    frame in the main program)
+    """
+    def __init__(self, program, hoist_bounds=True):
+        self.program = program
+        # False to check the bounds of every array access
+        self.hoist_bounds = hoist_bounds
+        # loop variable -> (min, max) in the FOR loops being compiled,
+        # when known at compile time
+        self.loop_ranges = {}
+        self.constants = {}
+        # constants of the routine being compiled
+        self.local_constants = {}
+        self.globals = {}
+        self.routines = {}
+        # routine being compiled (None in the main program)
+        self.routine = None
+
+    def compile(self, declarations, body):
+        template = self.declare_globals(declarations)
+        self.program.global_template = template
+        self.program.globals = new_frame(template)
+        names = set()
+        for decl in declarations.routines:
+            if decl.name in names:
+                raise PascalError("Duplicate routine " + decl.name)
+            names.add(decl.name)
+        for decl in declarations.routines:
+            # the local constants can be used in the bounds of the
+            # local arrays
+            self.local_constants = {}
+            for name, value in decl.declarations.constants.items():
+                self.local_constants[name] = self.constant(value)
+            self.routines[decl.name] = Routine(decl, self.initial)
+            self.routines[decl.name].local_constants = self.local_constants
+        for decl in declarations.routines:
+            self.routine = self.routines[decl.name]
+            self.local_constants = self.routine.local_constants
+            self.routine.body = self.statement(decl.body)
+        self.routine = None
+        self.local_constants = {}
+        self.program.body = self.statement(body)
+        return self.program
+
+    def declare_globals(self, declarations):
+        for name, value in declarations.constants.items():
+            self.constants[name] = self.constant(value)
+        template = []
+        for name, type in declarations.variables:
+            self.globals[name] = len(template)
+            template.append(self.initial(type))
+        return template
+
+    def initial(self, type):
+        """
+        initial value of a variable (an ArraySpec for the arrays)
+        """
+        if isinstance(type, ArrayType):
+            return ArraySpec(type.element, self.constant(type.low),
+                             self.constant(type.high))
+        return DEFAULTS[type]
+
+    def constant(self, node):
+        """
+        value of a constant expression (known at compile time)
+        """
+        function = self.expression(node)
+        if not getattr(function, 'constant', False):
+            raise PascalError("Constant expression expected")
+        return function(None)
+
+    # name resolution: a closure reading the variable, and (for the
+    # local variables) the slot in the frame
+    def lookup(self, name):
+        routine = self.routine
+        if self.array_variable(name) is not None:
+            raise PascalError("Array {} needs an index".format(name))
+        if routine is not None and name in routine.slots:
+            slot = routine.slots[name]
+            return (lambda frame: frame[slot]), slot
+        if name in self.local_constants:
+            return self.const(self.local_constants[name]), None
+        if name in self.constants:
+            return self.const(self.constants[name]), None
+        if name in self.globals:
+            slot, frame = self.globals[name], self.program.globals
+            if routine is None:
+                return (lambda frame: frame[slot]), slot
+            return (lambda _: frame[slot]), None
+        raise PascalError("Unknown name " + name)
+
+    def store(self, name, *values):
+        """
+        closure storing a value into the variable (or function result).
+        values are the expressions assigned to it, whose types are
+        checked (a REAL cannot be stored into an INTEGER, and an
+        INTEGER is converted when stored into a REAL)
+        """
+        routine = self.routine
+        if self.array_variable(name) is not None:
+            raise PascalError("Cannot assign to the array " + name)
+        # frame of the variable, when it is not the current one
+        frame = None
+        if routine is not None and name in routine.slots:
+            slot = routine.slots[name]
+            template = routine.template
+        elif routine is not None and routine.is_function and name == routine.name:
+            slot = routine.result_slot
+            template = routine.template
+        elif name in self.globals:
+            slot = self.globals[name]
+            template = self.program.global_template
+            if routine is not None:
+                frame = self.program.globals
+        else:
+            raise PascalError("Cannot assign to " + name)
+        type = _type_of(template[slot])
+        for value in values:
+            self.check_type(value, type, name)
+        if type == REAL and any(self.value_type(value) == INTEGER for value in values):
+            if frame is not None:
+                def assign(_, value):
+                    frame[slot] = _to_real(value)
+                return assign
+
+            def assign(frame, value):
+                frame[slot] = _to_real(value)
+            return assign
+
+        if frame is not None:
+            def assign(_, value):
+                frame[slot] = value
+            return assign
+
+        def assign(frame, value):
+            frame[slot] = value
+        return assign
+
+    def converted(self, function, node, type):
+        """
+        closure of the expression node (compiled into function), with
+        its value converted to a REAL if it is stored into a REAL
+        """
+        if type != REAL or self.value_type(node) != INTEGER:
+            return function
+        if getattr(function, 'constant', False):
+            return self.const(_to_real(function(None)))
+        return lambda frame: _to_real(function(frame))
+
+    def check_type(self, node, type, name):
+        """
+        raises a PascalError if the expression cannot be stored into
+        name, of the given type
+        """
+        if type == INTEGER and self.value_type(node) == REAL:
+            raise PascalError("Cannot assign a REAL value to the INTEGER " + name)
+
+    def value_type(self, node):
+        """
+        static type (INTEGER or REAL) of an expression, with the typing
+        rules of typecheck.py
+        """
+        if isinstance(node, Num):
+            return _type_of(node.value)
+        if isinstance(node, Var) and node.name not in self.routines:
+            return _type_of(self.lookup_value(node.name))
+        if isinstance(node, (Var, Call)):
+            routine = self.routines[node.name]
+            return _type_of(routine.template[routine.result_slot])
+        if isinstance(node, Index):
+            return self.array_access(node.name)[0].element
+        left, right = self.value_type(node.left), self.value_type(node.right)
+        if node.op == 'DIV':
+            if left != INTEGER or right != INTEGER:
+                raise PascalError("DIV needs INTEGER operands")
+            return INTEGER
+        if node.op == '/' or left == REAL or right == REAL:
+            return REAL
+        return INTEGER
+
+    def lookup_value(self, name):
+        """
+        value of a constant, or initial value of a variable (with the
+        name resolution of lookup())
+        """
+        routine = self.routine
+        if routine is not None and name in routine.slots:
+            return routine.template[routine.slots[name]]
+        if name in self.local_constants:
+            return self.local_constants[name]
+        if name in self.constants:
+            return self.constants[name]
+        return self.program.global_template[self.globals[name]]
+
+    def array_variable(self, name):
+        """
+        (ArraySpec, slot, frame) of an array variable, where frame is
+        the global frame for a global array used in a routine, and None
+        if the array is in the current frame. None if name is not an
+        array
+        """
+        routine = self.routine
+        if routine is not None and name in routine.slots:
+            slot = routine.slots[name]
+            spec = routine.template[slot]
+            frame = None
+        elif (name in self.globals and name not in self.local_constants
+              and name not in self.constants):
+            slot = self.globals[name]
+            spec = self.program.global_template[slot]
+            frame = None if routine is None else self.program.globals
+        else:
+            return None
+        if not isinstance(spec, ArraySpec):
+            return None
+        return spec, slot, frame
+
+    def array_access(self, name):
+        variable = self.array_variable(name)
+        if variable is None:
+            raise PascalError("{} is not an array".format(name))
+        return variable
+
+    def array_index(self, node):
+        """
+        closure of the index of an array access (an INTEGER)
+        """
+        index = self.expression(node.index)
+        if self.value_type(node.index) != INTEGER:
+            raise PascalError("The index of {} must be INTEGER".format(node.name))
+        return index
+
+    def in_bounds(self, node, spec):
+        """
+        whether the index expression is within the bounds of the array
+        for every value of the enclosing FOR loops' variables
+        """
+        if not self.hoist_bounds:
+            return False
+        bounds = self.value_range(node)
+        return bounds is not None and spec.low <= bounds[0] and bounds[1] <= spec.high
+
+    def value_range(self, node):
+        """
+        (min, max) of an INTEGER expression, when known at compile
+        time: constants, variables of the enclosing FOR loops, and their
+        sums and differences
+        """
+        if isinstance(node, Var) and node.name in self.loop_ranges:
+            return self.loop_ranges[node.name]
+        if isinstance(node, BinOp) and node.op in ('+', '-'):
+            left = self.value_range(node.left)
+            right = self.value_range(node.right)
+            if left is None or right is None:
+                return None
+            if node.op == '+':
+                return left[0] + right[0], left[1] + right[1]
+            return left[0] - right[1], left[1] - right[0]
+        if isinstance(node, (Num, Var, BinOp)):
+            try:
+                value = self.constant(node)
+            except PascalError:
+                return None
+            if isinstance(value, int):
+                return value, value
+        return None
+
+    def index_slot(self, node):
+        """
+        slot of the index, if it is a variable of the current frame
+        """
+        if isinstance(node, Var) and node.name not in self.routines:
+            return self.lookup(node.name)[1]
+        return None
+
+    def element(self, node):
+        """
+        closure reading an element of an array
+        """
+        spec, slot, frame = self.array_access(node.name)
+        index = self.array_index(node)
+        low, high = spec.low, spec.high
+        if self.in_bounds(node.index, spec):
+            i = self.index_slot(node.index)
+            if frame is None and i is not None:
+                # the most common case: a[i] in a FOR i loop
+                return lambda current: current[slot][current[i] - low]
+            if frame is None:
+                return lambda current: current[slot][index(current) - low]
+            return lambda current: frame[slot][index(current) - low]
+        name = node.name
+
+        def element(current):
+            i = index(current)
+            if not low <= i <= high:
+                raise PascalError("Index {} out of bounds of {}".format(i, name))
+            return (current if frame is None else frame)[slot][i - low]
+        return element
+
+    def store_element(self, node):
+        """
+        closure of the assignment to an element of an array
+        """
+        spec, slot, frame = self.array_access(node.name)
+        index = self.array_index(node)
+        value = self.expression(node.value)
+        self.check_type(node.value, spec.element, 'array ' + node.name)
+        low, high = spec.low, spec.high
+        if self.in_bounds(node.index, spec):
+            i = self.index_slot(node.index)
+            if frame is None and i is not None:
+                def assign(current):
+                    current[slot][current[i] - low] = value(current)
+            elif frame is None:
+                def assign(current):
+                    current[slot][index(current) - low] = value(current)
+            else:
+                def assign(current):
+                    frame[slot][index(current) - low] = value(current)
+            return assign
+        name = node.name
+
+        def assign(current):
+            i = index(current)
+            if not low <= i <= high:
+                raise PascalError("Index {} out of bounds of {}".format(i, name))
+            (current if frame is None else frame)[slot][i - low] = value(current)
+        return assign
+
+    @staticmethod
+    def const(value):
+        function = lambda frame: value
+        function.constant = True
+        return function
+
+    def expression(self, node):
+        if isinstance(node, Num):
+            return self.const(node.value)
+        if isinstance(node, Var):
+            if node.name in self.routines:
+                return self.call(Call(node.name, []), expression=True)
+            return self.lookup(node.name)[0]
+        if isinstance(node, Call):
+            return self.call(node, expression=True)
+        if isinstance(node, Index):
+            return self.element(node)
+        if isinstance(node, (BinOp, Compare)):
+            return self.operation(node)
+        raise PascalError("Cannot compile {!r}".format(node))
+
+    def operation(self, node):
+        left = self.expression(node.left)
+        right = self.expression(node.right)
+        if node.op == 'DIV':
+            # checks the types of the operands
+            self.value_type(node)
+        function = OPERATIONS[node.op](left, right)
+        if getattr(left, 'constant', False) and getattr(right, 'constant', False):
+            try:
+                return self.const(function(None))
+            except (ArithmeticError, TypeError):
+                # raised at run time
+                return function
+        # local slot <op> constant
+        if (isinstance(node.left, Var) and getattr(right, 'constant', False)
+                and node.op in SLOT_OPERATIONS):
+            slot = self.lookup(node.left.name)[1] if node.left.name not in self.routines else None
+            if slot is not None:
+                return SLOT_OPERATIONS[node.op](slot, right(None))
+        return function
+
+    def call(self, node, expression=False):
+        if node.name in BUILTINS and not expression:
+            return self.write(node)
+        routine = self.routines.get(node.name)
+        if routine is None:
+            raise PascalError("Unknown routine " + node.name)
+        if expression and not routine.is_function:
+            raise PascalError("Procedure {} has no value".format(node.name))
+        if len(node.args) != routine.nparams:
+            raise PascalError("{} takes {} arguments".format(
+                node.name, routine.nparams))
+        args = []
+        # the parameters are the first slots of the frame
+        for arg, initial in zip(node.args, routine.template):
+            type = _type_of(initial)
+            self.check_type(arg, type, 'parameter of ' + node.name)
+            args.append(self.converted(self.expression(arg), arg, type))
+        return make_call(routine, args, self.program)
+
+    def write(self, node):
+        args = [self.expression(arg) for arg in node.args]
+        end = '\n' if node.name == 'WRITELN' else ''
+        program = self.program
+
+        def write(frame):
+            program.output.write(''.join(
+                int_to_str(value) if isinstance(value, int) else str(value)
+                for value in (arg(frame) for arg in args)) + end)
+        return write
+
+    def statement(self, node):
+        if isinstance(node, Compound):
+            statements = [self.statement(s) for s in node.statements]
+            if len(statements) == 1:
+                return statements[0]
+
+            def compound(frame):
+                for statement in statements:
+                    statement(frame)
+            return compound
+        if isinstance(node, Assign):
+            value = self.expression(node.value)
+            store = self.store(node.name, node.value)
+            return lambda frame: store(frame, value(frame))
+        if isinstance(node, AssignIndex):
+            return self.store_element(node)
+        if isinstance(node, Call):
+            return self.call(node)
+        if isinstance(node, If):
+            condition = self.expression(node.condition)
+            then = self.statement(node.then)
+            if node.otherwise is None:
+                def if_then(frame):
+                    if condition(frame):
+                        then(frame)
+                return if_then
+            otherwise = self.statement(node.otherwise)
+
+            def if_then_else(frame):
+                if condition(frame):
+                    then(frame)
+                else:
+                    otherwise(frame)
+            return if_then_else
+        if isinstance(node, While):
+            condition = self.expression(node.condition)
+            body = self.statement(node.body)
+
+            def while_loop(frame):
+                while condition(frame):
+                    body(frame)
+            return while_loop
+        if isinstance(node, For):
+            return self.for_loop(node)
+        raise PascalError("Cannot compile {!r}".format(node))
+
+    def for_loop(self, node):
+        start = self.expression(node.start)
+        stop = self.expression(node.stop)
+        store = self.store(node.name, node.start, node.stop)
+        # (the loop counts with range(): the variable is an INTEGER)
+        if node.name not in self.routines and _type_of(self.lookup_value(node.name)) != INTEGER:
+            raise PascalError("The FOR variable {} must be INTEGER".format(node.name))
+        step = node.step
+        bounds = self.loop_range(node, start, stop)
+        outer = self.loop_ranges.get(node.name)
+        if bounds is not None:
+            self.loop_ranges[node.name] = bounds
+        try:
+            body = self.statement(node.body)
+        finally:
+            if outer is not None:
+                self.loop_ranges[node.name] = outer
+            else:
+                self.loop_ranges.pop(node.name, None)
+        routine = self.routine
+        slot = None
+        if routine is not None and node.name in routine.slots:
+            slot = routine.slots[node.name]
+        elif routine is None and node.name in self.globals:
+            slot = self.globals[node.name]
+        if slot is not None:
+            # the loop variable is in the current frame
+            def for_loop(frame):
+                for value in range(start(frame), stop(frame) + step, step):
+                    frame[slot] = value
+                    body(frame)
+            return for_loop
+
+        def for_loop(frame):
+            for value in range(start(frame), stop(frame) + step, step):
+                store(frame, value)
+                body(frame)
+        return for_loop
+
+    def loop_range(self, node, start, stop):
+        """
+        (min, max) of the loop variable in the body of the loop, if the
+        limits are constant and the body cannot change the variable
+        """
+        if not (getattr(start, 'constant', False) and getattr(stop, 'constant', False)):
+            return None
+        first, last = start(None), stop(None)
+        if not isinstance(first, int) or not isinstance(last, int):
+            return None
+        local = self.routine is not None and node.name in self.routine.slots
+        for child in _nodes(node.body):
+            if isinstance(child, (Assign, For)) and child.name == node.name:
+                return None
+            # a routine can assign the global variables
+            if isinstance(child, Call) and not local and child.name not in BUILTINS:
+                return None
+            if isinstance(child, Var) and child.name in self.routines and not local:
+                return None
+        return (first, last) if node.step == 1 else (last, first)
+
+
+def _nodes(node):
+    """
+    all the nodes of a statement or expression
+    """
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if node is None or isinstance(node, (str, int, float)):
+            continue
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        yield node
+        if isinstance(node, BinOp):
+            stack.extend([node.left, node.right])
+        elif hasattr(node, '__dict__'):
+            stack.extend(vars(node).values())
+
+
+def make_call(routine, args, program):
+    """
+    closure calling the routine, with the arguments evaluated in the
+    caller's frame. The callee's frame is taken from routine.pool
+    """
+    pool = routine.pool
+    template = routine.template
+    result_slot = routine.result_slot
+    depth = program.depth
+    nargs = len(args)
+    # the local arrays get new zeroed arrays in each call
+    arrays = routine.arrays
+
+    def call(frame):
+        values = [arg(frame) for arg in args]
+        if pool:
+            callee = pool.pop()
+            callee[:] = template
+        else:
+            callee = template[:]
+        for slot, spec in arrays:
+            callee[slot] = spec.zeros()
+        callee[:nargs] = values
+        depth[0] += 1
+        if program.max_depth is not None and depth[0] > program.max_depth:
+            depth[0] = 0
+            raise PascalError("Maximum call depth ({}) exceeded in {}".format(
+                program.max_depth, routine.name))
+        routine.body(callee)
+        depth[0] -= 1
+        result = callee[result_slot]
+        pool.append(callee)
+        return result
+
+    if nargs == 1:
+        arg, = args
+
+        def call(frame):
+            value = arg(frame)
+            if pool:
+                callee = pool.pop()
+                callee[:] = template
+            else:
+                callee = template[:]
+            for slot, spec in arrays:
+                callee[slot] = spec.zeros()
+            callee[0] = value
+            depth[0] += 1
+            if program.max_depth is not None and depth[0] > program.max_depth:
+                depth[0] = 0
+                raise PascalError("Maximum call depth ({}) exceeded in {}".format(
+                    program.max_depth, routine.name))
+            routine.body(callee)
+            depth[0] -= 1
+            result = callee[result_slot]
+            pool.append(callee)
+            return result
+    return call
+
+
+def compile_program(source, output=None, max_depth=None, hoist_bounds=True):
+    """
+    parses and compiles a program. Returns a Program. With
+    hoist_bounds=False, every array access checks the bounds
+    """
+    declarations, body = PascalParser(PascalLexer(source)).program()
+    program = Program(None, [], output, max_depth)
+    return Compiler(program, hoist_bounds).compile(declarations, body)
+
+
+def run(source, output=None, max_depth=None):
+    return compile_program(source, output, max_depth).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="runs a Pascal program")
+    parser.add_argument('source')
+    parser.add_argument('--max-depth', type=int, default=None,
+                        help="maximum depth of the routine calls")
+    args = parser.parse_args()
+    with open(args.source) as source:
+        text = source.read()
+    try:
+        run(text, max_depth=args.max_depth)
+    except (SourceError, PascalError) as error:
+        sys.stderr.write('{}\n'.format(error))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
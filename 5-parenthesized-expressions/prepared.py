@@ -0,0 +1,114 @@
+"""
+Prepared expressions: parse once, evaluate many times with different
+values of the placeholders.
+
+    price = prepare('base * (100 + 2 * 10) / 100 + fee')
+    price.evaluate(base=250, fee=3)
+    price.evaluate(base=120, fee=0)
+
+prepare() parses the text into an AST (see tree.py), pre-evaluates
+every subtree that does not depend on the placeholders (partial
+evaluation: '(100 + 2 * 10)' above becomes 120), and compiles
+what is left into nested closures. Each call of evaluate() then only
+does the arithmetic that depends on the placeholders.
+Subtrees are never reassociated (e.g. 'x + 1 + 2' is '(x + 1) + 2'),
+so that the results are the same as with the Interpreter.
+"""
+import operator
+
+from calc5 import Lexer, int_div
+from tree import Parser, Num, Var, BinOp, placeholders
+
+# functions implementing the operators
+OPERATIONS = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '/': operator.truediv,
+    'DIV': int_div,
+}
+
+
+def fold(node):
+    """
+    partial evaluation: returns a tree where the subtrees without
+    placeholders are replaced by their value (a Num)
+    """
+    if not isinstance(node, BinOp):
+        return node
+    left = fold(node.left)
+    right = fold(node.right)
+    if isinstance(left, Num) and isinstance(right, Num):
+        try:
+            return Num(OPERATIONS[node.op](left.value, right.value))
+        except (ArithmeticError, TypeError):
+            # e.g. division by zero: the error is raised by evaluate()
+            pass
+    return BinOp(left, node.op, right)
+
+
+def compile_node(node):
+    """
+    compiles a (folded) tree into a function of the dict of the values
+    of the placeholders
+    """
+    if isinstance(node, Num):
+        value = node.value
+        return lambda params: value
+    if isinstance(node, Var):
+        name = node.name
+        return lambda params: params[name]
+    operation = OPERATIONS[node.op]
+    left, right = node.left, node.right
+    # the most common shapes are specialized, to save a call per leaf
+    if isinstance(left, Var) and isinstance(right, Num):
+        name, value = left.name, right.value
+        return lambda params: operation(params[name], value)
+    if isinstance(left, Num) and isinstance(right, Var):
+        value, name = left.value, right.name
+        return lambda params: operation(value, params[name])
+    if isinstance(left, Var) and isinstance(right, Var):
+        name, other = left.name, right.name
+        return lambda params: operation(params[name], params[other])
+    if isinstance(left, Num):
+        value, right = left.value, compile_node(right)
+        return lambda params: operation(value, right(params))
+    if isinstance(right, Num):
+        left, value = compile_node(left), right.value
+        return lambda params: operation(left(params), value)
+    left, right = compile_node(left), compile_node(right)
+    return lambda params: operation(left(params), right(params))
+
+
+class PreparedExpression(object):
+    """
+    an expression compiled by prepare()
+    """
+    def __init__(self, text):
+        self.text = text
+        tree = Parser(Lexer(text)).parse()
+        # names of the placeholders
+        self.params = frozenset(placeholders(tree))
+        # the tree after the partial evaluation
+        self.tree = fold(tree)
+        self.function = compile_node(self.tree)
+
+    def evaluate(self, **params):
+        """
+        value of the expression, with the placeholders replaced by the
+        given values. All the placeholders must be given, and nothing else
+        """
+        if params.keys() != self.params:
+            missing = sorted(self.params - params.keys())
+            if missing:
+                raise TypeError('missing values for: ' + ', '.join(missing))
+            unknown = sorted(params.keys() - self.params)
+            raise TypeError('unknown placeholders: ' + ', '.join(unknown))
+        return self.function(params)
+
+    def __repr__(self):
+        return 'PreparedExpression({!r})'.format(self.text)
+
+
+def prepare(text):
+    return PreparedExpression(text)
@@ -0,0 +1,218 @@
+"""
+Source-level profiler of the calc5 Interpreter.
+
+The phase totals (see memprofile.py) do not tell which parts of a long
+expression are expensive. ProfilingInterpreter times every invocation
+of the grammar methods expr(), m_expr() and paren(), and attributes it
+to the span of source text that the invocation parsed (from the offset
+of its first token to the end of its last token, from the spans that
+the Lexer records). For each span it collects:
+* calls: number of invocations (a span is usually parsed once)
+* total: time spent in the invocation, including the nested ones
+* self: total minus the time of the nested invocations
+* operations: arithmetic operations done by the invocation itself
+  (the '+'/'-' of an expr, the '*', '/' and DIV of an m_expr)
+The profile is deterministic: every invocation is measured (with
+time.perf_counter_ns), which slows the evaluation down a few times;
+the relative times are what matters.
+
+Profile.folded() gives the self times in the folded stack format of
+flamegraph.pl and speedscope (one line per stack of invocations, e.g.
+'expr@1:1;m_expr@1:1;paren@3:7 1520', with the line and column where
+each invocation starts, and the time in nanoseconds), and
+Profile.format_table() a text table of the hottest spans.
+
+Usage:
+    profile = profile_expression(text)
+    print(profile.result)
+    print(profile.format_table(top=20))
+    profile.folded()        # str, for flamegraph.pl
+
+or, on a file:
+    $ python3 profiler.py program.txt --top 20 --folded program.folded
+"""
+import argparse
+import sys
+import time
+
+from calc5 import Lexer, Interpreter, LineIndex, M_SIGN, S_SIGN
+
+
+class SpanStats(object):
+    """
+    measures of one grammar node (name) on the span [start, end) of the
+    source text
+    """
+    def __init__(self, name, start, end):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.calls = 0
+        self.total_ns = 0
+        self.self_ns = 0
+        self.operations = 0
+
+    def as_dict(self):
+        return {'name': self.name, 'start': self.start, 'end': self.end,
+                'calls': self.calls, 'total_ns': self.total_ns,
+                'self_ns': self.self_ns, 'operations': self.operations}
+
+    def __repr__(self):
+        return 'SpanStats({}, [{}, {}), calls={}, self={} ns)'.format(
+            self.name, self.start, self.end, self.calls, self.self_ns)
+
+
+class ProfilingInterpreter(Interpreter):
+    """
+    calc5 Interpreter that measures its expr(), m_expr() and paren()
+    invocations
+    """
+    def __init__(self, lexer, clock=time.perf_counter_ns):
+        self.clock = clock
+        # (name, start, end) -> SpanStats
+        self.spans = {}
+        # stack of invocations (name, start) -> self time
+        self.stacks = {}
+        # running invocations: [name, start, time of the nested
+        # invocations, operations]
+        self.frames = []
+        super().__init__(lexer)
+
+    def profiled(self, name, method):
+        start = self.lexer.starts[-1]
+        frame = [name, start, 0, 0]
+        self.frames.append(frame)
+        began = self.clock()
+        value = method()
+        elapsed = self.clock() - began
+        self.frames.pop()
+        # the current token follows the node: its last token is the
+        # one before
+        end = self.lexer.ends[-2]
+        own = elapsed - frame[2]
+        if self.frames:
+            self.frames[-1][2] += elapsed
+        stats = self.spans.get((name, start, end))
+        if stats is None:
+            stats = self.spans[name, start, end] = SpanStats(name, start, end)
+        stats.calls += 1
+        stats.total_ns += elapsed
+        stats.self_ns += own
+        stats.operations += frame[3]
+        stack = tuple((f[0], f[1]) for f in self.frames) + ((name, start),)
+        self.stacks[stack] = self.stacks.get(stack, 0) + own
+        return value
+
+    def eat(self, token_type, token_values=[]):
+        # an operator is eaten by the invocation that applies it
+        if token_type in (M_SIGN, S_SIGN) and self.current_token.type == token_type:
+            self.frames[-1][3] += 1
+        super().eat(token_type, token_values)
+
+    def paren(self):
+        return self.profiled('paren', super().paren)
+
+    def m_expr(self):
+        return self.profiled('m_expr', super().m_expr)
+
+    def expr(self):
+        return self.profiled('expr', super().expr)
+
+
+class Profile(object):
+    """
+    result of profile_expression(): the value of the expression, the
+    measures of its spans, and the self times of the invocation stacks
+    """
+    def __init__(self, text, result, spans, stacks, elapsed):
+        self.text = text
+        self.result = result
+        self.spans = spans
+        self.stacks = stacks
+        # nanoseconds, for the whole (profiled) evaluation
+        self.elapsed = elapsed
+        self.index = LineIndex(text)
+
+    def label(self, name, start):
+        line, column = self.index.position(start)
+        return '{}@{}:{}'.format(name, line, column)
+
+    def hottest(self, top=None, key='self_ns'):
+        """
+        the SpanStats sorted by decreasing key ('self_ns', 'total_ns' or
+        'operations'), the first top ones
+        """
+        spans = sorted(self.spans.values(), key=lambda stats: getattr(stats, key),
+                       reverse=True)
+        return spans if top is None else spans[:top]
+
+    def folded(self):
+        """
+        the self times in folded stack format (one line per stack)
+        """
+        lines = []
+        for stack, own in self.stacks.items():
+            lines.append('{} {}'.format(
+                ';'.join(self.label(name, start) for name, start in stack), own))
+        return '\n'.join(lines) + '\n'
+
+    def excerpt(self, stats, width=40):
+        """
+        the source text of a span, on one line, shortened to width
+        """
+        text = ' '.join(self.text[stats.start:stats.end].split())
+        if len(text) > width:
+            text = text[:width - 3] + '...'
+        return text
+
+    def format_table(self, top=20, key='self_ns'):
+        lines = ['{:>10}{:>10}{:>8}{:>8}{:>7}  {:<16}{}'.format(
+            'self ms', 'total ms', 'self %', 'calls', 'ops', 'node@line:col', 'source')]
+        for stats in self.hottest(top, key):
+            lines.append('{:>10.3f}{:>10.3f}{:>8.1%}{:>8}{:>7}  {:<16}{}'.format(
+                stats.self_ns / 1e6, stats.total_ns / 1e6,
+                stats.self_ns / self.elapsed if self.elapsed else 0.0,
+                stats.calls, stats.operations,
+                self.label(stats.name, stats.start), self.excerpt(stats)))
+        return '\n'.join(lines)
+
+    def as_dict(self):
+        return {'elapsed_ns': self.elapsed,
+                'spans': [stats.as_dict() for stats in self.hottest()]}
+
+
+def profile_expression(text, clock=time.perf_counter_ns):
+    """
+    evaluates text with the ProfilingInterpreter. Returns a Profile
+    """
+    interpreter = ProfilingInterpreter(Lexer(text), clock)
+    began = clock()
+    result = interpreter.expr()
+    elapsed = clock() - began
+    return Profile(text, result, interpreter.spans, interpreter.stacks, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="profile the evaluation of an expression, by source span")
+    parser.add_argument('file', help="file containing the expression")
+    parser.add_argument('--top', type=int, default=20,
+                        help="number of spans in the table (default: 20)")
+    parser.add_argument('--sort', choices=['self_ns', 'total_ns', 'operations'],
+                        default='self_ns')
+    parser.add_argument('--folded', metavar='OUTPUT',
+                        help="write the folded stacks to OUTPUT (for flamegraph.pl)")
+    args = parser.parse_args()
+    with open(args.file) as source:
+        text = source.read()
+    profile = profile_expression(text)
+    print(profile.format_table(args.top, args.sort))
+    print('{} spans, {:.3f} ms'.format(len(profile.spans), profile.elapsed / 1e6),
+          file=sys.stderr)
+    if args.folded:
+        with open(args.folded, 'w') as output:
+            output.write(profile.folded())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Reentrant evaluation of calc5 expressions.
+
+The calc5 Lexer and Interpreter keep the parsing state in their
+attributes (pos, current_char, current_token), so an instance cannot
+be shared between threads. evaluate() keeps all its state in local
+variables: it can be called from any number of threads at the same
+time, with nothing to lock. The tokens come from a compiled regular
+expression (safe to share), and the grammar is parsed without
+recursion, with a stack of the pending operations of each open
+parenthesis (like events.py).
+
+The results and the error positions are the calc5 Interpreter's for
+the well-formed expressions. Like calc5.evaluate(), it stops at the end
+of the first complete expression; a closing parenthesis must match an
+opening one.
+
+Usage:
+    evaluate('3 * (1 + 2)')         # 9, from any thread
+"""
+import re
+
+from calc5 import LexingError, ParsingError, int_div
+from bigint import str_to_int
+
+# one token per match (the last group catches the invalid characters)
+_TOKEN = re.compile(r'\s*(?:(\d+\.\d+)|(\d+)|([^\W\d]\w*)|([-+*/()])|(\S))')
+_MULTIPLICATIONS = {'*', '/', 'DIV'}
+
+
+def evaluate(text):
+    """
+    value of the expression, computed like calc5.evaluate()
+    """
+    matches = _TOKEN.finditer(text)
+    # pending [sum value, sum operator, product value, product operator]
+    # of each level (the top level, and each open parenthesis)
+    levels = [[None, None, None, None]]
+    while True:
+        # an operand: a number, or an open parenthesis
+        match = next(matches, None)
+        if match is None:
+            raise ParsingError("Expecting either a number or an open parenthesis",
+                               text, len(text))
+        real, integer, name, symbol, invalid = match.groups()
+        if integer is not None:
+            value = str_to_int(text, match.start(2), match.end(2))
+        elif real is not None:
+            value = float(real)
+        elif symbol == '(':
+            levels.append([None, None, None, None])
+            continue
+        elif invalid is not None:
+            raise LexingError("Invalid character", text, match.start(5))
+        elif name is not None and name.upper() not in _MULTIPLICATIONS:
+            raise ParsingError("Placeholder '{}' has no value".format(name),
+                               text, match.start(3))
+        else:
+            raise ParsingError("Expecting either a number or an open parenthesis",
+                               text, match.start(match.lastindex))
+        # after an operand: the operations that it closes
+        while True:
+            # the next token is read before computing (like the
+            # Interpreter, which eats a token before using its value)
+            match = next(matches, None)
+            if match is None:
+                token, offset = None, len(text)
+            else:
+                token = match.group(match.lastindex)
+                offset = match.start(match.lastindex)
+                if match.lastindex == 5:
+                    raise LexingError("Invalid character", text, offset)
+                if match.lastindex == 3:
+                    token = token.upper()
+            level = levels[-1]
+            if level[3] is not None:
+                op, left = level[3], level[2]
+                if op == '*':
+                    value = left * value
+                elif op == '/':
+                    value = left / value
+                else:
+                    value = int_div(left, value)
+                level[3] = None
+            if token in _MULTIPLICATIONS:
+                level[2], level[3] = value, token
+                break
+            if level[1] is not None:
+                if level[1] == '+':
+                    value = level[0] + value
+                else:
+                    value = level[0] - value
+                level[1] = None
+            if token == '+' or token == '-':
+                level[0], level[1] = value, token
+                break
+            # end of an expr: of a parenthesis, or of the whole text
+            if len(levels) == 1:
+                return value
+            if token != ')':
+                raise ParsingError("Invalid syntax", text, offset)
+            levels.pop()
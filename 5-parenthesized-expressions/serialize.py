@@ -0,0 +1,238 @@
+"""
+Compact binary encoding of calc5 parse trees (see tree.py).
+
+To move a parsed expression to another process, the source text can be
+sent and parsed again, or the tree pickled (pickle writes the class of
+each node and recurses on the nesting). dumps() writes the tree in a
+versioned binary format instead, in postfix order (the operands before
+their operation):
+
+    magic       b'C5T'
+    version     1 byte (VERSION)
+    flags       1 byte: ONE_BYTE_CODES if each code below takes 1 byte
+    pool size   varint, followed by the pool entries:
+                  INT:   varint length, then the integer in two's
+                         complement, little-endian (any size)
+                  REAL:  8 bytes, IEEE 754 double, little-endian
+                  NAME:  varint length, then the name in UTF-8
+    node count  varint, followed by one varint code per node:
+                  0-4:       an operation (OPERATORS), on the two
+                             values below it
+                  5 + 2 * i: the pool entry i (a Num or a Var)
+                  6 + 2 * n: the INTEGER n (0 <= n < 2 ** 56), inline
+
+The varints are unsigned LEB128: 7 bits per byte, the high bit set on
+all the bytes but the last one. The pool holds each big integer, real
+and name once.
+
+Most expressions only have small codes (operations, small integers and
+the first pool entries) and then the codes are the bytes of the
+payload: dumps() converts the list of codes with one bytes() call, and
+loads() iterates over the bytes directly, without decoding varints.
+
+Usage:
+    data = dumps(parse('3 * (x + 2)'))
+    tree = loads(data)
+"""
+import struct
+
+from tree import Num, Var, BinOp
+
+MAGIC = b'C5T'
+VERSION = 1
+# flags
+ONE_BYTE_CODES = 1
+# kinds of pool entries
+INT, REAL, NAME = range(3)
+# operation codes
+OPERATORS = ('+', '-', '*', '/', 'DIV')
+OP_CODES = {op: code for code, op in enumerate(OPERATORS)}
+FIRST_LEAF = len(OPERATORS)
+INLINE_LIMIT = 2 ** 56
+
+_DOUBLE = struct.Struct('<d')
+
+
+def write_varint(output, value):
+    """
+    appends the LEB128 encoding of value (>= 0) to the bytearray output
+    """
+    while value >= 0x80:
+        output.append(value & 0x7f | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def read_varint(data, pos):
+    """
+    (value, position after it) of the varint at data[pos]
+    """
+    value = shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise ValueError('truncated varint at offset {}'.format(pos)) from None
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def postfix(node):
+    """
+    the nodes of the tree in postfix order (without recursion)
+    """
+    # a pre-order walk visiting the right operand first gives the
+    # reversed postfix order
+    order, stack = [], [node]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if type(node) is BinOp:
+            stack.append(node.left)
+            stack.append(node.right)
+    order.reverse()
+    return order
+
+
+def dumps(node):
+    """
+    binary encoding of the tree node (bytes)
+    """
+    codes = []
+    pool = []
+    # (kind, value) -> index in the pool (type in the key: 1 and 1.0
+    # are different entries; the REALs are keyed by their bytes, as
+    # 0.0 == -0.0, and nan != nan)
+    indexes = {}
+    append = codes.append
+    for node in postfix(node):
+        kind = type(node)
+        if kind is BinOp:
+            append(OP_CODES[node.op])
+            continue
+        if kind is Num:
+            value = node.value
+            if type(value) is int and 0 <= value < INLINE_LIMIT:
+                append(FIRST_LEAF + 1 + 2 * value)
+                continue
+            if type(value) is int:
+                entry = key = (INT, value)
+            else:
+                entry, key = (REAL, value), (REAL, _DOUBLE.pack(value))
+        elif kind is Var:
+            entry = key = (NAME, node.name)
+        else:
+            raise TypeError('cannot encode {!r}'.format(node))
+        index = indexes.get(key)
+        if index is None:
+            index = indexes[key] = len(pool)
+            pool.append(entry)
+        append(FIRST_LEAF + 2 * index)
+
+    output = bytearray(MAGIC)
+    one_byte = max(codes) < 0x80
+    output.append(VERSION)
+    output.append(ONE_BYTE_CODES if one_byte else 0)
+    write_varint(output, len(pool))
+    for kind, value in pool:
+        output.append(kind)
+        if kind == INT:
+            # two's complement, with room for the sign bit
+            encoded = value.to_bytes(value.bit_length() // 8 + 1, 'little', signed=True)
+            write_varint(output, len(encoded))
+            output += encoded
+        elif kind == REAL:
+            output += _DOUBLE.pack(value)
+        else:
+            encoded = value.encode('utf-8')
+            write_varint(output, len(encoded))
+            output += encoded
+    write_varint(output, len(codes))
+    if one_byte:
+        output += bytes(codes)
+    else:
+        for code in codes:
+            write_varint(output, code)
+    return bytes(output)
+
+
+def _read_pool(data, pos):
+    """
+    (node classes and values of the pool entries, position after them)
+    """
+    count, pos = read_varint(data, pos)
+    pool = []
+    for _ in range(count):
+        if pos >= len(data):
+            raise ValueError('truncated pool')
+        kind = data[pos]
+        pos += 1
+        if kind == REAL:
+            if pos + 8 > len(data):
+                raise ValueError('truncated pool')
+            pool.append((Num, _DOUBLE.unpack_from(data, pos)[0]))
+            pos += 8
+            continue
+        length, pos = read_varint(data, pos)
+        if pos + length > len(data):
+            raise ValueError('truncated pool')
+        encoded = bytes(data[pos:pos + length])
+        pos += length
+        if kind == INT:
+            pool.append((Num, int.from_bytes(encoded, 'little', signed=True)))
+        elif kind == NAME:
+            pool.append((Var, encoded.decode('utf-8')))
+        else:
+            raise ValueError('unknown pool entry kind {}'.format(kind))
+    return pool, pos
+
+
+def loads(data):
+    """
+    tree decoded from the bytes-like data (see dumps())
+    """
+    if bytes(data[:len(MAGIC)]) != MAGIC:
+        raise ValueError('not an encoded calc5 tree')
+    if len(data) < len(MAGIC) + 2:
+        raise ValueError('truncated header')
+    version, flags = data[len(MAGIC)], data[len(MAGIC) + 1]
+    if version != VERSION:
+        raise ValueError('unsupported version {}'.format(version))
+    pool, pos = _read_pool(data, len(MAGIC) + 2)
+    count, pos = read_varint(data, pos)
+    if flags & ONE_BYTE_CODES:
+        codes = data[pos:pos + count]
+        end = pos + count
+    else:
+        codes = []
+        end = pos
+        for _ in range(count):
+            code, end = read_varint(data, end)
+            codes.append(code)
+    if len(codes) != count or end != len(data):
+        raise ValueError('{} bytes of codes, expected {} codes'.format(
+            len(data) - pos, count))
+
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    try:
+        for code in codes:
+            if code < FIRST_LEAF:
+                right = pop()
+                stack[-1] = BinOp(stack[-1], OPERATORS[code], right)
+                continue
+            code -= FIRST_LEAF
+            if code & 1:
+                push(Num(code >> 1))
+            else:
+                kind, value = pool[code >> 1]
+                push(kind(value))
+    except IndexError:
+        raise ValueError('invalid code sequence') from None
+    if len(stack) != 1:
+        raise ValueError('invalid code sequence')
+    return stack[0]
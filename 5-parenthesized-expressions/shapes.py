@@ -0,0 +1,166 @@
+"""
+Compilation cache keyed by the shape of the expressions.
+
+The shape of an expression is its text with every integer literal
+replaced by a '#' slot (and every real literal by a '%' slot), and
+without the whitespace around the symbols: 'a + b * (c - d)' with any
+four integers has the shape '#+#*(#-#)'. The first expression of each
+shape is parsed (see tree.py), typed and compiled (see typecheck.py)
+into a Python function with one argument per slot; the following
+expressions with the same shape only need their literals extracted,
+and are evaluated by calling the compiled function on the literal
+vector.
+
+Expressions that cannot be compiled (syntax errors, placeholders, too
+deep nesting) are evaluated with the calc5 Interpreter, so the results
+and the errors are always the same as with the Interpreter.
+
+Usage:
+    cache = ShapeCache()
+    cache.evaluate('12 + 7 * (3 - 1)')
+    print(cache.format_report())
+
+or, to measure the hit rates on some files of expressions:
+    $ python3 shapes.py corpus1.txt corpus2.txt
+"""
+import argparse
+import re
+import threading
+from collections import OrderedDict
+
+from calc5 import Lexer, Interpreter
+from tree import parse
+from typecheck import compile_typed
+
+# literals (integer or real), and whitespace
+_LITERAL = re.compile(r'\d+(?:\.\d+)?')
+_INTEGER = re.compile(r'\d+')
+_REAL = re.compile(r'\d+\.\d+')
+_WHITESPACE = re.compile(r'\s+')
+_AROUND_SYMBOLS = re.compile(r' ?([-+*/()]) ?')
+
+
+def shape_of(text):
+    """
+    (shape, literal strings) of the expression text. The whitespace is
+    kept (as a single space) where it separates two words or numbers,
+    so that e.g. '7 DIV 2' and '7 DIV2' have different shapes
+    """
+    literals = _LITERAL.findall(text)
+    shape = text
+    if '.' in shape:
+        shape = _REAL.sub('%', shape)
+    shape = _INTEGER.sub('#', shape)
+    shape = _AROUND_SYMBOLS.sub(r'\1', _WHITESPACE.sub(' ', shape)).strip()
+    return shape, literals
+
+
+def compile_shape(text):
+    """
+    compiles the shape of text into a Python function of its literal
+    strings (converted inside the function). Returns None if the text
+    cannot be compiled
+    """
+    slots = []
+
+    def slot(node):
+        name = 'a{}'.format(len(slots))
+        slots.append(name)
+        if isinstance(node.value, int):
+            return 'int({})'.format(name)
+        return 'float({})'.format(name)
+
+    try:
+        function, _ = compile_typed(parse(text), slot, slots)
+    except Exception:
+        return None
+    return function
+
+
+class ShapeCache(object):
+    """
+    LRU cache of compiled shapes (at most max_shapes). A cache can be
+    shared by several threads: its updates are made under a lock
+    """
+    def __init__(self, max_shapes=10000):
+        self.max_shapes = max_shapes
+        self.lock = threading.Lock()
+        # shape -> compiled function (None for the shapes that are
+        # evaluated by the Interpreter)
+        self.functions = OrderedDict()
+        self.shapes_seen = set()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text):
+        """
+        (compiled function or None, literal strings) for text
+        """
+        shape, literals = shape_of(text)
+        with self.lock:
+            function = self.functions.get(shape, self)
+            if function is not self:
+                self.hits += 1
+                self.functions.move_to_end(shape)
+                return function, literals
+            self.misses += 1
+            self.shapes_seen.add(shape)
+        # compiled outside the lock: two threads can compile the same
+        # new shape, the second one replaces the first one's function
+        function = compile_shape(text)
+        with self.lock:
+            self.functions[shape] = function
+            if len(self.functions) > self.max_shapes:
+                self.functions.popitem(last=False)
+        return function, literals
+
+    def evaluate(self, text):
+        function, literals = self.lookup(text)
+        if function is not None:
+            try:
+                return function(*literals)
+            except ValueError:
+                # int() refuses literals above the str digits limit:
+                # the Interpreter can read them
+                pass
+        return Interpreter(Lexer(text)).expr()
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def report(self):
+        return {'distinct_shapes': len(self.shapes_seen),
+                'cached_shapes': len(self.functions),
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hit_rate()}
+
+    def format_report(self):
+        return ('{distinct_shapes} distinct shapes, {hits} hits, '
+                '{misses} misses ({rate:.1%})').format(
+                    rate=self.hit_rate(), **self.report())
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="hit rates of the shape cache on files of expressions")
+    parser.add_argument('corpora', nargs='+', metavar='FILE')
+    parser.add_argument('--max-shapes', type=int, default=10000)
+    args = parser.parse_args()
+    for path in args.corpora:
+        cache = ShapeCache(args.max_shapes)
+        errors = 0
+        with open(path) as corpus:
+            for line in corpus:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    cache.evaluate(line)
+                except Exception:
+                    errors += 1
+        print('{}: {} ({} errors)'.format(path, cache.format_report(), errors))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+"""
+Abstract syntax tree (AST) for the calc5 grammar.
+
+The calc5 Interpreter computes the result while it parses. The Parser
+in this module follows the same grammar, but builds a tree instead, so
+that an expression can be analysed, transformed or evaluated many
+times after being parsed once:
+* Num: a number, int or float (leaf)
+* Var: a named placeholder (leaf)
+* BinOp: a binary operation, with its operator ('+', '-', '*', '/', 'DIV')
+  and its two operands
+
+Usage:
+    tree = parse('3 * (x + 2)')
+"""
+from calc5 import Lexer, Interpreter, INTEGER, REAL, ID, PAR, S_SIGN, M_SIGN, EOF
+
+
+class Num(object):
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __repr__(self):
+        return 'Num({!r})'.format(self.value)
+
+
+class Var(object):
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return 'Var({!r})'.format(self.name)
+
+
+class BinOp(object):
+    __slots__ = ('left', 'op', 'right')
+
+    def __init__(self, left, op, right):
+        self.left = left
+        self.op = op
+        self.right = right
+
+    def __repr__(self):
+        return 'BinOp({!r}, {!r}, {!r})'.format(self.left, self.op, self.right)
+
+
+class Parser(Interpreter):
+    """
+    parser for the calc5 grammar. It reuses the token handling of the
+    Interpreter (eat(), error()), but each grammar method returns a
+    node of the AST instead of a value
+    """
+    def parse(self):
+        """
+        parses the whole text. Returns the root of the AST
+        """
+        node = self.expr()
+        if self.current_token.type != EOF:
+            self.error()
+        return node
+
+    def factor(self):
+        token = self.current_token
+        if token.type == ID:
+            self.eat(ID)
+            return Var(token.value)
+        if token.type == REAL:
+            self.eat(REAL)
+            return Num(token.value)
+        self.eat(INTEGER)
+        return Num(token.value)
+
+    def paren(self):
+        if self.current_token.value != '(':
+            self.error()
+        self.eat(PAR)
+        node = self.expr()
+        if self.current_token.value != ')':
+            self.error()
+        self.eat(PAR)
+        return node
+
+    def m_expr(self):
+        node = self.p_term()
+        while self.current_token.type == M_SIGN:
+            op = self.current_token.value
+            self.eat(M_SIGN)
+            node = BinOp(node, op, self.p_term())
+        return node
+
+    def expr(self):
+        node = self.m_expr()
+        while self.current_token.type == S_SIGN:
+            op = self.current_token.value
+            self.eat(S_SIGN)
+            node = BinOp(node, op, self.m_expr())
+        return node
+
+
+def parse(text):
+    """
+    AST of text
+    """
+    return Parser(Lexer(text)).parse()
+
+
+def placeholders(node):
+    """
+    set of the names of the placeholders in the tree
+    """
+    names = set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, BinOp):
+            stack.append(node.left)
+            stack.append(node.right)
+        elif isinstance(node, Var):
+            names.add(node.name)
+    return names
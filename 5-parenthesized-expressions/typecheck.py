@@ -0,0 +1,126 @@
+"""
+Static INTEGER/REAL types for the calc5 AST, and compilation of the
+typed tree into specialized Python code.
+
+Typing rules (as in Pascal):
+* a number is INTEGER or REAL, depending on how it is written
+* '+', '-', '*' are INTEGER between INTEGERs, REAL otherwise
+* '/' is always REAL
+* DIV is only allowed between INTEGERs, and is INTEGER
+The types are checked once, before the evaluation: a DIV with a REAL
+operand is a TypeCheckError, raised even if the operation would never
+be evaluated.
+
+compile_typed() turns the typed tree into the source of a Python
+function: each operation is chosen at compile time from the types (no
+comparison of operator strings, no isinstance() check at run time),
+and the INTEGER operands of the REAL operations are converted with an
+explicit float(), so that every arithmetic instruction only ever sees
+ints, or only floats.
+
+Usage:
+    typeof(parse('7 DIV 2 + 1.5'))      # 'REAL'
+    function, type = compile_typed(parse('7 DIV 2 + 1.5'))
+    function()                           # 4.5
+"""
+from calc5 import INTEGER, REAL, trunc_div
+from tree import Num, Var
+
+
+class TypeCheckError(Exception):
+    pass
+
+
+def typeof(node, types=None):
+    """
+    static type of the tree (INTEGER or REAL). types maps the names of
+    the placeholders to their types
+    """
+    if isinstance(node, Num):
+        return INTEGER if isinstance(node.value, int) else REAL
+    if isinstance(node, Var):
+        return _placeholder_type(node, types)
+    return _operation_type(node.op, typeof(node.left, types), typeof(node.right, types))
+
+
+def _placeholder_type(node, types):
+    if not types or node.name not in types:
+        raise TypeCheckError("Placeholder '{}' has no type".format(node.name))
+    return types[node.name]
+
+
+def _operation_type(op, left_type, right_type):
+    if op == 'DIV':
+        if left_type != INTEGER or right_type != INTEGER:
+            raise TypeCheckError("DIV needs INTEGER operands")
+        return INTEGER
+    if op != '/' and left_type == right_type == INTEGER:
+        return INTEGER
+    return REAL
+
+
+def generate(node, literal=None, types=None, constants=None):
+    """
+    (Python source, type) of the tree. literal(node) gives the source of
+    a number; by default the number is bound to a name (_c0, _c1, ...)
+    whose value is appended to the list constants (the source of a
+    huge int, or of an inf, would not compile). The source uses
+    trunc_div() (calc5.py: DIV without a run time check of the operands)
+    for the DIV operations
+    """
+    bound = literal is None
+    if constants is None:
+        constants = []
+
+    def constant(value):
+        constants.append(value)
+        return '_c{}'.format(len(constants) - 1)
+
+    def to_real(node, source):
+        # the INTEGER literals are converted at compile time
+        if bound and isinstance(node, Num):
+            try:
+                return constant(float(node.value))
+            except OverflowError:
+                pass
+        return 'float({})'.format(source)
+
+    def walk(node):
+        if isinstance(node, Num):
+            source = constant(node.value) if bound else literal(node)
+            return source, INTEGER if isinstance(node.value, int) else REAL
+        if isinstance(node, Var):
+            return node.name, _placeholder_type(node, types)
+        left, left_type = walk(node.left)
+        right, right_type = walk(node.right)
+        type = _operation_type(node.op, left_type, right_type)
+        if node.op == 'DIV':
+            return 'trunc_div({}, {})'.format(left, right), type
+        if type == INTEGER or left_type == right_type == INTEGER:
+            # (int / int is correctly rounded, float(a) / float(b) is
+            # not, for numbers above 2**53: the Interpreter's semantics
+            # are kept)
+            return '({} {} {})'.format(left, node.op, right), type
+        # REAL operation: the INTEGER side is converted
+        if left_type == INTEGER:
+            left = to_real(node.left, left)
+        if right_type == INTEGER:
+            right = to_real(node.right, right)
+        return '({} {} {})'.format(left, node.op, right), REAL
+
+    return walk(node)
+
+
+def compile_typed(node, literal=None, args=(), types=None):
+    """
+    compiles the tree into a Python function with the given argument
+    names (e.g. the placeholders, or the slots used by literal()).
+    Returns (function, type of the result)
+    """
+    constants = []
+    body, type = generate(node, literal, types, constants)
+    source = 'def evaluate({}):\n    return {}\n'.format(', '.join(args), body)
+    namespace = {'trunc_div': trunc_div}
+    namespace.update(('_c{}'.format(i), value) for i, value in enumerate(constants))
+    exec(compile(source, '<typed>', 'exec'), namespace)
+    return namespace['evaluate'], type
@@ -0,0 +1,73 @@
+"""
+Visitors of the calc5 AST (see tree.py) with cached dispatch.
+
+The usual visitor finds the method for each node with
+getattr(self, 'visit_' + type(node).__name__): a string concatenation
+and an attribute lookup by name for every node visited. NodeVisitor
+resolves the method once per node class, on the first visit of a node
+of that class, and keeps it in a dispatch table (a dict of the visitor
+class, keyed by node class): the following visits cost one dict lookup.
+
+A subclass defines visit_<NodeClass> methods (e.g. visit_BinOp); the
+method of the nearest base class is used for a subclass of a node
+class, and generic_visit() if there is none.
+
+Usage:
+    Evaluator({'x': 2}).visit(parse('3 * (x + 2)'))      # 12
+"""
+from prepared import OPERATIONS
+
+
+class NodeVisitor(object):
+    """
+    base of the visitors, with a dispatch table per visitor class
+    """
+    # node class -> visit function (NodeVisitor's own, every subclass
+    # gets a new one)
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # node class -> visit function, filled on the first visits
+        cls._dispatch = {}
+
+    def visit(self, node):
+        try:
+            method = self._dispatch[node.__class__]
+        except KeyError:
+            method = self._resolve(node.__class__)
+        return method(self, node)
+
+    @classmethod
+    def _resolve(cls, node_class):
+        for base in node_class.__mro__:
+            method = getattr(cls, 'visit_' + base.__name__, None)
+            if method is not None:
+                break
+        else:
+            method = cls.generic_visit
+        cls._dispatch[node_class] = method
+        return method
+
+    def generic_visit(self, node):
+        raise TypeError('No visit_{} method'.format(type(node).__name__))
+
+
+class Evaluator(NodeVisitor):
+    """
+    value of a tree, computed like the calc5 Interpreter does, with the
+    placeholders replaced by their values in params
+    """
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def visit_Num(self, node):
+        return node.value
+
+    def visit_Var(self, node):
+        if node.name not in self.params:
+            raise TypeError('missing value for: ' + node.name)
+        return self.params[node.name]
+
+    def visit_BinOp(self, node):
+        return OPERATIONS[node.op](self.visit(node.left), self.visit(node.right))
@@ -0,0 +1,214 @@
+"""
+Stress suite: pathological inputs for the lexers and parsers of all the
+calculators (calc1 to calc5).
+
+Each class of input is generated at increasing sizes (doubling), and
+evaluated with the evaluate() function of each calculator. The growth
+of the running time is fitted with a power law (time ~ size ** k, least
+squares on the log-log points), and classified:
+* linear:      k below 1.3
+* superlinear: k between 1.3 and 1.8
+* quadratic:   k from 1.8 on
+* too fast:    less than 3 sizes took a millisecond or more (e.g. calc1
+               only reads the first three tokens)
+* crash:       an exception at some size (e.g. RecursionError, or the
+               ValueError of int() above 4300 digits), after the
+               smaller sizes worked
+* unsupported: the calculator rejects even the smallest input (e.g.
+               parentheses before calc5)
+
+The suite fails (exit status 1) if a class crashes on a calculator, or
+is worse than linear, except for the long numbers, where k up to 1.6 is
+accepted: converting n digits to an int cannot be done in linear time
+(calc5 does it in about n ** 1.58 operations, see bigint.py). A summary
+of the failures is printed at the end.
+
+Usage:
+    $ python3 stress.py
+    $ python3 stress.py --calculators calc5 --classes nesting --steps 12
+"""
+import argparse
+import importlib.util
+import math
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CALCULATORS = {
+    'calc1': '1-calculator/calc1.py',
+    'calc2': '2-extended-calculator/calc2.py',
+    'calc3': '3-extended-calculator-multiplication/calc3.py',
+    'calc4': '4-context-free-grammar/calc4.py',
+    'calc5': '5-parenthesized-expressions/calc5.py',
+}
+
+# pathological classes of input: (generator of the input of size n,
+# first size)
+CLASSES = {
+    # megabytes of whitespace (skip_whitespace)
+    'whitespace': (lambda n: '1 +' + ' ' * n + '2', 1 << 14),
+    # very long numbers (parse_integer)
+    'long number': (lambda n: '7' * n + ' + 1', 1 << 10),
+    # deep nesting (paren)
+    'nesting': (lambda n: '(' * n + '1' + ')' * n, 1 << 5),
+    # long chains of divisions, whose results are floats
+    'division chain': (lambda n: '1000000' + ' / 3' * n, 1 << 10),
+    # long chains of sums (the baseline: one token after the other)
+    'sum chain': (lambda n: '1' + ' + 1' * n, 1 << 10),
+}
+
+# highest accepted exponent, by class
+ACCEPTED = {'long number': 1.6}
+LINEAR = 1.3
+QUADRATIC = 1.8
+
+
+def load(name):
+    """
+    imports a calculator from its directory (which is put on sys.path,
+    for its own imports)
+    """
+    path = os.path.join(ROOT, CALCULATORS[name])
+    directory = os.path.dirname(path)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def time_once(evaluate, text, repeat):
+    best = None
+    # some calculators print their intermediate results
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            evaluate(text)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def fit_exponent(points):
+    """
+    slope of the least squares line through the (log size, log time)
+    points
+    """
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(max(seconds, 1e-9)) for _, seconds in points]
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    variance = sum((x - mean_x) ** 2 for x in xs)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / variance
+
+
+class Result(object):
+    """
+    measures of one class of input on one calculator
+    """
+    def __init__(self, calculator, input_class):
+        self.calculator = calculator
+        self.input_class = input_class
+        # (size, seconds)
+        self.points = []
+        self.error = None
+        self.error_size = None
+        self.exponent = None
+
+    def classification(self):
+        if not self.points:
+            return 'unsupported'
+        if self.error is not None:
+            return 'crash'
+        if self.exponent is None:
+            return 'too fast'
+        if self.exponent < LINEAR:
+            return 'linear'
+        if self.exponent < QUADRATIC:
+            return 'superlinear'
+        return 'quadratic'
+
+    def failed(self):
+        # a crash is the worst growth of all
+        if self.error is not None:
+            return True
+        if self.exponent is None:
+            return False
+        return self.exponent >= ACCEPTED.get(self.input_class, LINEAR)
+
+    def format(self):
+        kind = self.classification()
+        text = '{:<7} {:<15} {:<12}'.format(self.calculator, self.input_class, kind)
+        if self.exponent is not None:
+            text += ' k = {:.2f}'.format(self.exponent)
+        if self.points:
+            size, seconds = self.points[-1]
+            text += '  ({:,} chars in {:.3f} s)'.format(size, seconds)
+        if kind == 'crash':
+            text += '  {} at {:,}'.format(type(self.error).__name__, self.error_size)
+        if self.failed():
+            text += '  FAIL'
+        return text
+
+
+def measure(calculator, evaluate, input_class, steps, repeat, max_seconds):
+    generate, size = CLASSES[input_class]
+    result = Result(calculator, input_class)
+    for _ in range(steps):
+        text = generate(size)
+        try:
+            seconds = time_once(evaluate, text, repeat)
+        except Exception as error:
+            if result.points:
+                result.error, result.error_size = error, len(text)
+            break
+        result.points.append((len(text), seconds))
+        if seconds > max_seconds:
+            break
+        size *= 2
+    # the sizes measured in less than a millisecond are mostly noise
+    points = [point for point in result.points if point[1] >= 1e-3]
+    if len(points) >= 3:
+        result.exponent = fit_exponent(points)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--calculators', nargs='+', default=list(CALCULATORS),
+                        choices=list(CALCULATORS))
+    parser.add_argument('--classes', nargs='+', default=list(CLASSES),
+                        choices=list(CLASSES))
+    parser.add_argument('--steps', type=int, default=10,
+                        help="number of sizes (each one twice the previous)")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="runs per size (the fastest one is kept)")
+    parser.add_argument('--max-seconds', type=float, default=2.0,
+                        help="stop growing a class after a run this long")
+    args = parser.parse_args()
+
+    failures = []
+    for name in args.calculators:
+        evaluate = load(name).evaluate
+        for input_class in args.classes:
+            result = measure(name, evaluate, input_class, args.steps,
+                             args.repeat, args.max_seconds)
+            print(result.format(), flush=True)
+            if result.failed():
+                failures.append(result)
+    if not failures:
+        print('no failure')
+        return 0
+    crashes = sum(result.classification() == 'crash' for result in failures)
+    print('{} failures: {} crashes, {} worse than linear'.format(
+        len(failures), crashes, len(failures) - crashes))
+    for result in failures:
+        print('  {} {}: {}'.format(result.calculator, result.input_class,
+                                   result.classification()))
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())